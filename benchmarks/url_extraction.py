@@ -0,0 +1,65 @@
+'''
+Benchmark of finding urls in chat messages, comparing URL.get_urls to the single regex it used to run
+over every message, on throughput and on correctness against the expected urls of the corpus.
+
+    python benchmarks/url_extraction.py
+'''
+import os
+import re
+import sys
+import timeit
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(here, '..'))
+
+from pyfibot.url.extract import extract_urls  # noqa: E402
+
+
+# The regex URL.get_urls used to run with re.findall.
+OLD_URL_REGEX = re.compile(
+    r'(?:(?:https?|ftp)://)(?:\S+(?::\S*)?@)?(?:(?:[1-9]\d?|1\d\d|2[01]\d|22[0-3])' +
+    r'(?:\.(?:1?\d{1,2}|2[0-4]\d|25[0-5])){2}(?:\.(?:[1-9]\d?|1\d\d|2[0-4]\d|25[0-4]))|' +
+    r'(?:(?:[a-z\u00a1-\uffff0-9]+-?)*[a-z\u00a1-\uffff0-9]+)(?:\.(?:[a-z\u00a1-\uffff0-9]+-?)' +
+    r'*[a-z\u00a1-\uffff0-9]+)*(?:\.(?:[a-z\u00a1-\uffff]{2,})))(?::\d{2,5})?(?:/[^\s]*)?'
+)
+
+
+def old_extract_urls(string):
+    return OLD_URL_REGEX.findall(string)
+
+
+def load_corpus():
+    corpus = []
+    with open(os.path.join(here, 'chat_corpus.txt'), encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('#') or not line.strip():
+                continue
+            message, _, expected = line.rstrip('\n').partition('\t')
+            corpus.append((message, expected.split()))
+    return corpus
+
+
+def main():
+    corpus = load_corpus()
+    messages = [message for message, _ in corpus]
+
+    print('%-10s %15s %15s %10s' % ('', 'per line (us)', 'no urls (us)', 'correct'))
+    for name, extract in [('old regex', old_extract_urls), ('extract', extract_urls)]:
+        number = 200
+        total = timeit.timeit(lambda: [extract(message) for message in messages], number=number)
+        plain = [message for message, expected in corpus if not expected]
+        without = timeit.timeit(lambda: [extract(message) for message in plain], number=number)
+        correct = sum(1 for message, expected in corpus if extract(message) == expected)
+        print('%-10s %15.2f %15.2f %6i/%i' % (
+            name, total * 1e6 / (number * len(messages)), without * 1e6 / (number * len(plain)), correct, len(corpus)
+        ))
+
+    print('\nLines the old regex gets wrong:')
+    for message, expected in corpus:
+        found = old_extract_urls(message)
+        if found != expected:
+            print('  %r: %r' % (message, found))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+'''
+Microbenchmark of finding the URL handler for a url, comparing the domain index
+to trying every handler in turn, with different numbers of registered handlers.
+
+    python benchmarks/url_handlers.py
+'''
+import os
+import re
+import sys
+import timeit
+from fnmatch import fnmatch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyfibot.url import urlhandler  # noqa: E402
+from pyfibot.url.dispatch import HandlerIndex  # noqa: E402
+
+
+def make_handlers(count):
+    ''' Make handlers, mixing fnmatch and regex matchers like the real handlers do. '''
+    handlers = []
+    for i in range(count):
+        if i % 2:
+            matcher = 'site%i.example.com/*' % i
+        else:
+            matcher = re.compile(r'site%i\.example\.org/(?P<id>\d+)' % i)
+        handlers.append(urlhandler(matcher)(lambda bot, url, match=None: None))
+    return handlers
+
+
+def linear_find(handlers, clean_url):
+    ''' How URL.get_title used to look for a handler. '''
+    for handler in handlers:
+        if handler._is_regex:
+            match = handler._url_matcher.match(clean_url)
+            if match:
+                return handler, match
+        elif fnmatch(clean_url, handler._url_matcher):
+            return handler, None
+    return None, None
+
+
+URLS = [
+    'site3.example.com/some/page',
+    'site4.example.org/12345',
+    'unknown.example.net/no/handler',
+    'youtube.com/watch?v=dQw4w9WgXcQ',
+]
+
+
+def main():
+    print('%10s %15s %15s' % ('handlers', 'linear (us)', 'indexed (us)'))
+    for count in (5, 50, 500):
+        handlers = make_handlers(count)
+        index = HandlerIndex()
+        for handler in handlers:
+            index.add(handler)
+
+        number = 2000
+        linear = timeit.timeit(lambda: [linear_find(handlers, url) for url in URLS], number=number)
+        indexed = timeit.timeit(lambda: [index.find(url) for url in URLS], number=number)
+        per_url = 1e6 / (number * len(URLS))
+        print('%10i %15.2f %15.2f' % (count, linear * per_url, indexed * per_url))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import re
+import functools
+
+
+def mask_to_regex(mask):
+    ''' Translate mask to regex, where * matches any number of characters and ? matches a single character. '''
+    return ''.join(
+        '.*' if character == '*' else '.' if character == '?' else re.escape(character)
+        for character in str(mask)
+    )
+
+
+class HostmaskMatcher(object):
+    '''
+    Matches identities against a list of masks, compiled into a single case-insensitive regex.
+
+        matcher = HostmaskMatcher(['*!*@example.com', 'nick!user@host'])
+        matcher.match('someone!user@example.com')
+    '''
+    def __init__(self, masks):
+        self.masks = [str(mask) for mask in masks]
+        self.regex = None
+        if self.masks:
+            self.regex = re.compile(r'(?:%s)\Z' % '|'.join(mask_to_regex(mask) for mask in self.masks), re.IGNORECASE | re.DOTALL)
+
+    def match(self, identity):
+        if not self.regex or identity is None:
+            return False
+        return self.regex.match(identity) is not None
+
+
+class Authorization(object):
+    '''
+    Decides whether identities (nick!user@host in IRC, user ID in Telegram) are admins or ignored.
+
+    Decisions are cached per identity, so a new Authorization is to be created whenever the
+    configuration is reloaded. Admins are never ignored.
+    '''
+    def __init__(self, admins, ignores, cache_size=4096):
+        self.admins = HostmaskMatcher(admins)
+        self.ignores = HostmaskMatcher(ignores)
+
+        self.is_admin = functools.lru_cache(maxsize=cache_size)(self._is_admin)
+        self.is_ignored = functools.lru_cache(maxsize=cache_size)(self._is_ignored)
+
+    def _is_admin(self, identity):
+        return self.admins.match(identity)
+
+    def _is_ignored(self, identity):
+        return self.ignores.match(identity) and not self.is_admin(identity)
@@ -1,7 +1,9 @@
-import time
-import random
+import re
 import logging
+from collections import OrderedDict
+from pyfibot.auth import Authorization
 from pyfibot.plugin import Plugin
+from pyfibot.executor import BoundedExecutor
 
 
 class Bot(object):
@@ -13,6 +15,7 @@ class Bot(object):
         self.name = name
         self.callbacks = {}
         self.plugins = {}
+        self.executor = None
 
         self.load_configuration()
 
@@ -44,6 +47,14 @@ class Bot(object):
             else configuration.get('command_char')
 
         self.admins = self.core.admins + configuration.get('admins', [])
+        self.ignores = self.core.ignores + configuration.get('ignore', [])
+        self.authorization = Authorization(self.admins, self.ignores)
+
+        # Executor for the commands built in to the bot, plugins have their own.
+        if self.executor:
+            self.executor.shutdown()
+        self.executor = BoundedExecutor.from_configuration(self.core.loop, self.name, configuration, on_busy=self.respond_busy)
+
         self.load_plugins()
 
     def load_plugins(self):
@@ -54,18 +65,28 @@ class Bot(object):
             plugin.name: plugin
             for plugin in Plugin.discover_plugins(self)
         }
+        self.compile_listener_prefilters()
 
-    def init_callbacks(self):
+    def unload_plugins(self):
+        ''' Call teardowns of all plugins and stop their periodic tasks and executors. '''
         for plugin in self.plugins.values():
             plugin.teardown()
             for periodic_task in plugin._periodic_tasks:
                 periodic_task.stop()
+            plugin.executor.shutdown()
+        self.plugins = {}
+
+    def init_callbacks(self):
+        self.unload_plugins()
 
         self.callbacks = {
             'commands': self._get_builtin_commands(),
+            # Listeners in registration order, with their compiled prefilters.
             'listeners': [],
             'handlers': {},
         }
+        self.listener_prefilter = None
+        self.unfiltered_listeners = []
 
     @property
     def commands(self):
@@ -73,31 +94,32 @@ class Bot(object):
 
     @property
     def listeners(self):
-        return self.callbacks.get('listeners', [])
+        return [listener for _, listener in self.callbacks.get('listeners', [])]
 
     @property
     def handlers(self):
         return self.callbacks.get('handlers', {})
 
+    def get_identity(self, raw_message):
+        ''' Get identity of the sender of the message, to match against admin and ignore masks. '''
+        return None
+
+    def is_own_nick(self, nick):
+        ''' Check if nick is the nickname of the bot. '''
+        return nick == self.nickname
+
     def is_admin(self, raw_message):
         ''' Get users admin status. '''
-        return False
+        return self.authorization.is_admin(self.get_identity(raw_message))
+
+    def is_ignored(self, raw_message):
+        ''' Check if messages from the user should be ignored. '''
+        return self.authorization.is_ignored(self.get_identity(raw_message))
 
     def connect(self):
         ''' Connect to server. '''
         raise NotImplementedError
 
-    def reconnect(self, fn=None):
-        sleep_time = random.randrange(5, 15, 1)
-        if not fn:
-            self.log.warning('%s disconnected. Reconnecting in %i seconds.' % (self.nickname, sleep_time))
-        else:
-            if not fn.exception():
-                return
-            self.log.warning('%s disconnected (%s). Reconnecting in %i seconds.' % (self.nickname, fn.exception(), sleep_time))
-        time.sleep(sleep_time)
-        self.connect()
-
     def cleanup_response(self, response):
         return response.strip()
 
@@ -105,6 +127,10 @@ class Bot(object):
         ''' Respond to message sent to the bot. '''
         raise NotImplementedError
 
+    def respond_busy(self, raw_message):
+        ''' Respond to a command rejected because its plugin is overloaded. '''
+        self.respond('Busy, try again later.', raw_message)
+
     def get_command(self, message):
         '''
         Gets command from message.
@@ -117,11 +143,15 @@ class Bot(object):
     def handle_message(self, sender, message, raw_message={}):
         ''' Message handler, calling all listeners, parsing and running commands if found. '''
         # Don't react to own messages.
-        if sender == self.nickname:
+        if self.is_own_nick(sender):
             return
 
-        for listener in self.listeners:
-            self.core.loop.run_in_executor(None, listener, sender, message, raw_message)
+        # Drop messages from ignored users before doing anything else.
+        if self.is_ignored(raw_message):
+            return
+
+        for listener in self.get_listeners(message):
+            self.run_callback(listener, sender, message, raw_message)
 
         if message.startswith(self.command_char):
             command, message_without_command = self.get_command(message)
@@ -132,7 +162,7 @@ class Bot(object):
             if command in self.commands.keys():
                 if getattr(self.commands[command], '_is_admin_command', False) is True and not self.is_admin(raw_message):
                     return self.respond('This command is only for admins.', raw_message)
-                self.core.loop.run_in_executor(None, self.commands[command], sender, message_without_command, raw_message)
+                self.run_callback(self.commands[command], sender, message_without_command, raw_message, raw_message=raw_message)
 
     def _get_builtin_commands(self):
         ''' Gets commands built in to the bot. '''
@@ -188,7 +218,43 @@ class Bot(object):
 
     def register_listener(self, function_handle):
         ''' Registers listener to the bot. '''
-        self.callbacks['listeners'].append(function_handle)
+        prefilters = []
+        for pattern in getattr(function_handle, '_prefilters', []):
+            try:
+                prefilters.append(re.compile(pattern))
+            except re.error as e:
+                self.log.error('Prefilter "%s" of listener "%s" is invalid (%s) -> ignoring listener.' % (pattern, function_handle.__name__, e))
+                return
+        self.callbacks['listeners'].append((prefilters, function_handle))
+        # Checked one by one until compiled again.
+        self.listener_prefilter = None
+
+    def compile_listener_prefilters(self):
+        '''
+        Compiles prefilters of all filtered listeners into a single regex.
+        Messages not matching it can skip checking the listeners one by one.
+        Prefilters with global flags or groups would break the single regex, with them the listeners are always checked.
+        '''
+        self.listener_prefilter = None
+        self.unfiltered_listeners = [listener for prefilters, listener in self.callbacks['listeners'] if not prefilters]
+        patterns = []
+        for prefilters, _ in self.callbacks['listeners']:
+            for prefilter in prefilters:
+                if prefilter.flags != re.UNICODE or prefilter.groups:
+                    return
+                patterns.append('(?:%s)' % prefilter.pattern)
+        if patterns:
+            self.listener_prefilter = re.compile('|'.join(patterns))
+
+    def get_listeners(self, message):
+        ''' Get listeners interested in the message, in the order they were registered. '''
+        if self.listener_prefilter and not self.listener_prefilter.search(message):
+            return self.unfiltered_listeners
+        return [
+            listener
+            for prefilters, listener in self.callbacks['listeners']
+            if not prefilters or any(prefilter.search(message) for prefilter in prefilters)
+        ]
 
     def register_handler(self, message, function_handle):
         if message not in self.callbacks['handlers']:
@@ -197,4 +263,34 @@ class Bot(object):
 
     def run_handlers(self, message, raw_message):
         for handler in self.handlers.get(message, []):
-            self.core.loop.run_in_executor(None, handler, raw_message)
+            self.run_callback(handler, raw_message)
+
+    def run_callback(self, callback, *args, raw_message=None):
+        '''
+        Schedules a plugin callback to be run in the executor of its plugin.
+        Coroutines are run as tasks in the event loop, regular functions in the executor's threads.
+
+        If raw_message is given, the sender is told when the plugin is too busy to run the callback.
+        '''
+        executor = getattr(getattr(callback, '__self__', None), 'executor', None) or self.executor
+        return executor.submit(callback, *args, raw_message=raw_message)
+
+    def get_connection_stats(self):
+        ''' Get statistics of the connection to the server. '''
+        raise NotImplementedError
+
+    def get_stats(self):
+        ''' Get runtime statistics of the bot, grouped by section. '''
+        executors = OrderedDict([(self.name, self.executor.get_stats())])
+        for name in sorted(self.plugins.keys()):
+            executors[name] = self.plugins[name].executor.get_stats()
+
+        stats = OrderedDict([
+            ('connection', self.get_connection_stats()),
+            ('executors', executors),
+        ])
+        for name in sorted(self.plugins.keys()):
+            plugin_stats = self.plugins[name].get_stats()
+            if plugin_stats:
+                stats[name] = plugin_stats
+        return stats
@@ -1,9 +1,34 @@
+import sys
+import math
 import bottom
+import functools
+from collections import OrderedDict
 from pyfibot.bot import Bot
+from pyfibot.bot.sendqueue import IRCSendQueue
+from pyfibot.bot.reconnect import ReconnectSupervisor
+from pyfibot.bot.ircv3 import ircv3_handler, CapabilityNegotiation, WhoScheduler
+
+
+# IRCv3 capabilities used when supported by the server.
+CAPABILITIES = ['multi-prefix', 'userhost-in-names', 'extended-join', 'away-notify', 'account-tag', 'server-time', 'batch']
+
+# RFC1459 considers []\~ to be uppercase versions of {}|^.
+IRC_CASEFOLD = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ[]\\~', 'abcdefghijklmnopqrstuvwxyz{}|^')
+
+
+def irc_casefold(name):
+    ''' Casefold nick or channel name for comparisons, following RFC1459 case mapping. '''
+    return name.translate(IRC_CASEFOLD)
 
 
 class IRCbot(Bot):
-    ''' Bot implementing IRC protocol. '''
+    '''
+    Bot implementing IRC protocol.
+
+    Channels can be spread over several connections to the same server, to stay under the per-connection
+    channel and send queue limits of the server. The number of connections is set with `connections`,
+    or derived from `channels_per_connection`. Plugins still see a single bot.
+    '''
     def __init__(self, core, name):
         super(IRCbot, self).__init__(core, name)
         configuration = self.configuration
@@ -11,10 +36,26 @@ class IRCbot(Bot):
         self.server = configuration['server']
         self.port = int(configuration.get('port', '6667'))
         self.realname = configuration.get('realname') or self.core.realname
-        self.channels = [
+        self.channels = {}
+        self.users = {}
+        # User mode prefixes in NAMES replies, updated from ISUPPORT PREFIX.
+        self.user_prefixes = '~&@%+'
+
+        channels = [
             IRCChannel(self, channel) if not isinstance(channel, list) else IRCChannel(self, *channel)
             for channel in configuration.get('channels', [])
         ]
+        self.channels_per_connection = configuration.get('channels_per_connection')
+        connections = max(1, int(configuration.get('connections', 1)))
+        if self.channels_per_connection:
+            connections = max(connections, math.ceil(len(channels) / int(self.channels_per_connection)))
+
+        self.started = False
+        self.connections = []
+        for index in range(connections):
+            self.connections.append(IRCConnection(self, index, self.get_connection_nickname(index)))
+        for channel in channels:
+            self.add_channel(channel)
 
     def _get_builtin_commands(self):
         commands = super(IRCbot, self)._get_builtin_commands()
@@ -23,29 +64,313 @@ class IRCbot(Bot):
         })
         return commands
 
-    def is_admin(self, raw_message):
-        identifier = '%s!%s@%s' % (
+    def get_identity(self, raw_message):
+        return '%s!%s@%s' % (
             raw_message.get('nick'),
             raw_message.get('user'),
             raw_message.get('host')
         )
-        return any([admin == identifier for admin in self.admins])
 
-    def connect(self, future=None):
-        bot = bottom.Client(host=self.server, port=self.port, ssl=False, loop=self.core.loop)
+    def get_connection_nickname(self, index):
+        ''' Get nickname for the connection, the first connection uses the bot nickname and others number it. '''
+        if index == 0:
+            return self.nickname
+        return '%s%i' % (self.nickname, index + 1)
+
+    def is_own_nick(self, nick):
+        if not nick:
+            return False
+        return any(irc_casefold(nick) == irc_casefold(connection.nickname) for connection in self.connections)
+
+    def connect(self):
+        ''' Connect all connections, a few seconds apart to not trigger connection throttling on the server. '''
+        self.started = True
+        interval = float(self.configuration.get('connection_interval', 2))
+        for connection in self.connections:
+            self.core.loop.call_later(connection.index * interval, connection.connect)
+
+    def add_connection(self):
+        ''' Add a new connection, connecting it right away if the bot is already running. '''
+        connection = IRCConnection(self, len(self.connections), self.get_connection_nickname(len(self.connections)))
+        self.connections.append(connection)
+        self.log.info('Adding connection %s.' % connection.nickname)
+        if self.started:
+            connection.connect()
+        return connection
+
+    def get_connection(self, target):
+        ''' Get connection to send messages to target with: the one on the channel, or the one with target as nickname. '''
+        if target:
+            channel = self.find_channel(target)
+            if channel:
+                return channel.connection
+            for connection in self.connections:
+                if irc_casefold(target) == irc_casefold(connection.nickname):
+                    return connection
+        return self.connections[0]
+
+    def get_connection_stats(self):
+        return OrderedDict(
+            (connection.nickname, connection.get_stats())
+            for connection in self.connections
+        )
+
+    def get_stats(self):
+        stats = super(IRCbot, self).get_stats()
+        stats['sendq'] = OrderedDict(
+            (connection.nickname, connection.send_queue.get_stats())
+            for connection in self.connections if connection.send_queue
+        )
+        return stats
+
+    def find_channel(self, name):
+        ''' Find channel from bot channels. '''
+        if not name:
+            return None
+        return self.channels.get(irc_casefold(name))
+
+    def add_channel(self, channel):
+        ''' Add channel to bot channels, assigning it to the least busy connection with room for it. '''
+        self.channels[channel.key] = channel
+        if channel.connection:
+            return
+
+        limit = self.channels_per_connection
+        connections = [
+            connection
+            for connection in self.connections if not limit or len(connection.channels) < int(limit)
+        ] or [self.add_connection()]
+        connection = min(connections, key=lambda connection: len(connection.channels))
+        connection.channels[channel.key] = channel
+        channel.connection = connection
+
+    def parse_names_entry(self, entry):
+        '''
+        Parse user from a NAMES reply entry. With multi-prefix, entries can have several mode prefixes
+        and with userhost-in-names, the full nick!user@host.
+        '''
+        nick = entry.lstrip(self.user_prefixes)
+        if not nick:
+            return None
+
+        user = {'hg_code': entry[:len(entry) - len(nick)]}
+        if '!' in nick and '@' in nick:
+            nick, user['user'] = nick.split('!', 1)
+            user['user'], user['host'] = user['user'].split('@', 1)
+        user['nick'] = nick
+        return user
+
+    def find_user(self, nick):
+        ''' Find user from users seen on bot channels. '''
+        if not nick:
+            return None
+        return self.users.get(irc_casefold(nick))
+
+    def add_channel_user(self, channel, raw_message):
+        ''' Add user to channel, creating or updating the user in the index. '''
+        nick = raw_message.get('nick')
+        if not nick:
+            return None
+
+        key = irc_casefold(nick)
+        user = self.users.get(key)
+        if not user:
+            user = self.users[key] = IRCUser(self, **raw_message)
+        else:
+            user.update_information(**raw_message)
+
+        user.channels.add(channel.key)
+        channel.users[key] = user
+        return user
+
+    def remove_channel_user(self, channel, nick):
+        ''' Remove user from channel, forgetting the user if it's not seen on any other channel. '''
+        key = irc_casefold(nick)
+        user = channel.users.pop(key, None)
+        if not user:
+            return
+
+        user.channels.discard(channel.key)
+        user.channel_modes.pop(channel.key, None)
+        if not user.channels:
+            self.users.pop(key, None)
+
+    def remove_user(self, nick):
+        ''' Remove user from all channels. Returns True, if the user was known. '''
+        if not nick:
+            return False
+
+        key = irc_casefold(nick)
+        user = self.users.pop(key, None)
+        if not user:
+            return False
+
+        for channel_key in user.channels:
+            channel = self.channels.get(channel_key)
+            if channel:
+                channel.users.pop(key, None)
+        return True
+
+    def rename_user(self, nick, new_nick):
+        ''' Update user index after user has changed nick. Returns True, if the user was known. '''
+        if not nick or not new_nick:
+            return False
+
+        key = irc_casefold(nick)
+        user = self.users.pop(key, None)
+        if not user:
+            return False
+
+        new_key = irc_casefold(new_nick)
+        user.nick = new_nick
+        self.users[new_key] = user
+        for channel_key in user.channels:
+            channel = self.channels.get(channel_key)
+            if channel:
+                channel.users.pop(key, None)
+                channel.users[new_key] = user
+        return True
+
+    def clear_channel_users(self, channel):
+        ''' Remove all users from channel. '''
+        for user in list(channel.users.values()):
+            self.remove_channel_user(channel, user.nick)
+
+    def clear_users(self, connection=None):
+        ''' Forget all users, or the ones on channels of the connection, for example after reconnecting. '''
+        if connection is None:
+            self.users.clear()
+            for channel in self.channels.values():
+                channel.users.clear()
+            return
+
+        for channel in connection.channels.values():
+            self.clear_channel_users(channel)
+
+    async def command_join(self, sender, message, raw_message):
+        ''' Command to join IRC channels. '''
+        if not self.is_admin(raw_message):
+            return
+
+        existing_channel = self.find_channel(message.split(' ')[0])
+        if existing_channel:
+            existing_channel.join()
+            return
+
+        channel = IRCChannel(self, *message.split(' '))
+        self.add_channel(channel)
+        channel.join()
+    # Set join as admin command.
+    command_join._is_admin_command = True
+
+    def respond(self, message, raw_message):
+        # Responses may come from plugins running in executor threads, so pass them to the event loop.
+        self.core.loop.call_soon_threadsafe(functools.partial(
+            self.send_response, self.cleanup_response(message), raw_message
+        ))
+
+    def send_response(self, message, raw_message):
+        ''' Send response through the connection the message came from. '''
+        nick = raw_message.get('nick')
+        target = raw_message.get('target')
+
+        # Don't react to own messages
+        if self.is_own_nick(nick):
+            return
+
+        connection = self.get_connection(target)
+        if not connection.send_queue:
+            self.log.warning('Connection %s not connected, dropping response.' % connection.nickname)
+            return
+        if target and irc_casefold(target) == irc_casefold(connection.nickname):
+            target = nick
+        connection.send_queue.send_message(target, message)
+
+
+class IRCConnection(object):
+    '''
+    A single client connection of an IRC bot, with its own nickname, send queue and reconnect supervisor.
+    Channels and users are tracked by the bot, the connection only knows which channels it's responsible for.
+    '''
+    def __init__(self, irc_instance, index, nickname):
+        self.irc_instance = irc_instance
+        self.index = index
+        self.nickname = nickname
+        # Channels joined through this connection, by casefolded name.
+        self.channels = {}
+
+        self.client = None
+        self.registered = False
+        self.send_queue = None
+        self.capabilities = None
+        self.who_scheduler = None
+        self.supervisor = ReconnectSupervisor.from_configuration(
+            irc_instance.core.loop, self.connect, self.log, irc_instance.configuration
+        )
+
+    def __repr__(self):
+        return '<IRCConnection %s>' % self.nickname
+
+    @property
+    def log(self):
+        return self.irc_instance.log.getChild('connection%i' % (self.index + 1))
+
+    def is_own_nick(self, nick):
+        ''' Check if nick is the nickname of this connection, in any case. '''
+        return bool(nick) and irc_casefold(nick) == irc_casefold(self.nickname)
+
+    def connect(self):
+        irc = self.irc_instance
+        configuration = irc.configuration
+        loop = irc.core.loop
+
+        self.supervisor.connecting()
+        self.registered = False
+        bot = bottom.Client(host=irc.server, port=irc.port, ssl=False, loop=loop)
+        # Replace bottom's parser with one understanding message tags and IRCv3 commands.
+        bot.raw_handlers = [ircv3_handler(bot)]
+
+        if self.send_queue:
+            self.send_queue.clear()
+            self.who_scheduler.clear()
+        self.send_queue = IRCSendQueue.from_configuration(bot, loop, self.nickname, configuration)
+        self.who_scheduler = WhoScheduler(self.send_queue, loop, interval=configuration.get('who_interval', 2))
+        self.capabilities = CapabilityNegotiation(bot, configuration.get('capabilities', CAPABILITIES))
 
         @bot.on('CLIENT_CONNECT')
         def on_connect(**kwargs):
+            self.supervisor.connected()
+            irc.clear_users(self)
+            self.capabilities.start()
             bot.send('NICK', nick=self.nickname)
-            bot.send('USER', user=self.nickname, realname=self.realname)
-            for channel in self.channels:
+            bot.send('USER', user=self.nickname, realname=irc.realname)
+            irc.run_handlers('CLIENT_CONNECT', kwargs)
+
+        @bot.on('CAP')
+        def on_cap(**raw_message):
+            self.capabilities.handle(**raw_message)
+
+        @bot.on('RPL_WELCOME')
+        def on_welcome(**raw_message):
+            # Channels can only be joined after registration has completed.
+            self.registered = True
+            for channel in self.channels.values():
                 channel.join()
-            self.run_handlers('CLIENT_CONNECT', kwargs)
+
+        @bot.on('RPL_BOUNCE')
+        def on_isupport(info, **raw_message):
+            for token in info:
+                if token == 'WHOX':
+                    self.who_scheduler.whox = True
+                if token.startswith('PREFIX=') and ')' in token:
+                    irc.user_prefixes = token.split(')', 1)[1]
 
         @bot.on('CLIENT_DISCONNECT')
         def on_disconnect(**kwargs):
-            self.reconnect()
-            self.run_handlers('CLIENT_DISCONNECT', kwargs)
+            self.registered = False
+            self.send_queue.clear()
+            self.supervisor.disconnected()
+            irc.run_handlers('CLIENT_DISCONNECT', kwargs)
 
         @bot.on('PING')
         def on_ping(message, **kwargs):
@@ -55,101 +380,138 @@ class IRCbot(Bot):
         def on_privmsg(**raw_message):
             sender = raw_message.get('nick')
             message = raw_message.get('message')
-            self.handle_message(sender, message, raw_message=raw_message)
-
-        @bot.on('response')
-        def on_respose(message, raw_message):
-            nick = raw_message.get('nick')
-            target = raw_message.get('target')
-
-            # Don't react to own messages
-            if nick == self.nickname:
-                return
-            if target == self.nickname:
-                bot.send('PRIVMSG', target=nick, message=message)
-                return
-            bot.send('PRIVMSG', target=target, message=message)
+            irc.handle_message(sender, message, raw_message=raw_message)
 
         @bot.on('JOIN')
         def on_join(**raw_message):
-            channel = self.find_channel(raw_message.get('channel'))
+            channel = irc.find_channel(raw_message.get('channel'))
             if not channel:
                 return
 
-            nick = raw_message.get('nick')
-            if nick == self.nickname:
+            if self.is_own_nick(raw_message.get('nick')):
                 channel.on_bot_join(**raw_message)
                 return
 
             channel.on_user_join(**raw_message)
-            self.run_handlers('JOIN', raw_message)
+            irc.run_handlers('JOIN', raw_message)
 
         @bot.on('PART')
         def on_part(**raw_message):
-            channel = self.find_channel(raw_message.get('channel'))
+            channel = irc.find_channel(raw_message.get('channel'))
             if not channel:
                 return
 
-            nick = raw_message.get('nick')
-            if nick == self.nickname:
+            if self.is_own_nick(raw_message.get('nick')):
                 channel.on_bot_part(**raw_message)
                 return
 
             channel.on_user_part(**raw_message)
-            self.run_handlers('PART', raw_message)
+            irc.run_handlers('PART', raw_message)
 
         @bot.on('RPL_WHOREPLY')
         def on_rpl_who(**raw_message):
-            channel = self.find_channel(raw_message.get('channel'))
+            channel = irc.find_channel(raw_message.get('channel'))
             if not channel:
                 return
 
-            user = channel.find_user(nick=raw_message.get('nick'))
-            if not user:
-                channel.users.append(IRCUser(self, **raw_message))
+            irc.add_channel_user(channel, raw_message)
+            irc.run_handlers('RPL_WHOREPLY', raw_message)
+
+        @bot.on('RPL_WHOSPCRPL')
+        def on_rpl_whox(params, **raw_message):
+            if len(params) < 8 or params[0] != WhoScheduler.WHOX_TOKEN:
                 return
 
-            user.update_information(**raw_message)
-            self.run_handlers('RPL_WHOREPLY', raw_message)
+            _, channel_name, user, host, nick, flags, account, real_name = params[:8]
+            channel = irc.find_channel(channel_name)
+            if not channel:
+                return
 
-        @bot.on('QUIT')
-        def on_quit(**raw_message):
-            nick = raw_message.get('nick')
+            irc.add_channel_user(channel, {
+                'channel': channel_name,
+                'nick': nick,
+                'user': user,
+                'host': host,
+                'hg_code': flags,
+                'account': account,
+                'real_name': real_name,
+            })
+
+        @bot.on('RPL_ENDOFWHO')
+        def on_rpl_endofwho(name, **raw_message):
+            self.who_scheduler.done(irc_casefold(name))
+
+        @bot.on('RPL_NAMREPLY')
+        def on_rpl_names(users, **raw_message):
+            channel = irc.find_channel(raw_message.get('channel'))
+            if not channel:
+                return
 
-            for channel in self.channels:
-                channel.on_user_quit(nick)
-            self.run_handlers('QUIT', raw_message)
+            for entry in users:
+                user = irc.parse_names_entry(entry)
+                if user:
+                    user['channel'] = channel.name
+                    irc.add_channel_user(channel, user)
 
-        self._bot = bot
+        @bot.on('RPL_ENDOFNAMES')
+        def on_rpl_endofnames(**raw_message):
+            channel = irc.find_channel(raw_message.get('channel'))
+            if not channel:
+                return
 
-        task = bot.loop.create_task(self._bot.connect())
-        task.add_done_callback(self.reconnect)
+            # With userhost-in-names, NAMES already gave everything WHO would.
+            if 'userhost-in-names' not in self.capabilities.enabled:
+                self.who_scheduler.request(channel.key, channel.name)
 
-    def find_channel(self, name):
-        ''' Find channel from bot channels. '''
-        for channel in self.channels:
-            if channel.name == name:
-                return channel
-        return None
+        @bot.on('AWAY')
+        def on_away(**raw_message):
+            user = irc.find_user(raw_message.get('nick'))
+            if user:
+                user.away = raw_message.get('message') is not None
 
-    def command_join(self, sender, message, raw_message):
-        ''' Command to join IRC channels. '''
-        if not self.is_admin(raw_message):
-            return
+        @bot.on('KICK')
+        def on_kick(**raw_message):
+            channel = irc.find_channel(raw_message.get('channel'))
+            if not channel:
+                return
 
-        existing_channel = self.find_channel(message.split(' ')[0])
-        if existing_channel:
-            existing_channel.join()
-            return
+            if self.is_own_nick(raw_message.get('target')):
+                channel.on_bot_part(**raw_message)
+                return
 
-        channel = IRCChannel(self, *message.split(' '))
-        channel.join()
-        self.channels.append(channel)
-    # Set join as admin command.
-    command_join._is_admin_command = True
+            irc.remove_channel_user(channel, raw_message.get('target'))
+            irc.run_handlers('KICK', raw_message)
 
-    def respond(self, message, raw_message):
-        self._bot.trigger('response', message=self.cleanup_response(message), raw_message=raw_message)
+        @bot.on('QUIT')
+        def on_quit(**raw_message):
+            # Every connection sharing a channel with the user sees the quit, only the first one to
+            # remove the user from the bot runs the handlers.
+            if irc.remove_user(raw_message.get('nick')):
+                irc.run_handlers('QUIT', raw_message)
+
+        @bot.on('NICK')
+        def on_nick(**raw_message):
+            nick = raw_message.get('nick')
+            new_nick = raw_message.get('new_nick')
+            if self.is_own_nick(nick):
+                self.nickname = new_nick
+                self.send_queue.nickname = new_nick
+                if self.index == 0:
+                    irc.nickname = new_nick
+
+            # Like quits, only the first connection to see the nick change runs the handlers.
+            if irc.rename_user(nick, new_nick):
+                irc.run_handlers('NICK', raw_message)
+
+        self.client = bot
+
+        task = loop.create_task(bot.connect())
+        task.add_done_callback(self.supervisor.connect_done)
+
+    def get_stats(self):
+        stats = self.supervisor.get_stats()
+        stats['channels'] = len(self.channels)
+        return stats
 
 
 class IRCChannel(object):
@@ -157,63 +519,66 @@ class IRCChannel(object):
     def __init__(self, irc_instance, name, password=None):
         self.irc_instance = irc_instance
         self.name = name
+        self.key = irc_casefold(name)
         self.password = password
+        # Connection the channel is joined through, assigned by the bot.
+        self.connection = None
 
-        self.users = []
+        # Users on channel by casefolded nick, the user objects are shared with the bot user index.
+        self.users = {}
 
     def join(self):
         ''' Join this channel. '''
+        if not self.connection.registered:
+            # Joined once the connection has registered.
+            return
+        send_queue = self.connection.send_queue
         if self.password:
-            self.irc_instance._bot.send('JOIN', channel=self.name, key=self.password)
+            send_queue.send_command('JOIN', channel=self.name, key=self.password)
         else:
-            self.irc_instance._bot.send('JOIN', channel=self.name)
+            send_queue.send_command('JOIN', channel=self.name)
 
     def on_bot_join(self, **raw_message):
-        ''' Callback to call when bot has joined the channel. '''
+        ''' Callback to call when bot has joined the channel. Users are filled in from the NAMES reply following the join. '''
         self.irc_instance.log.info('Joined %s' % (raw_message.get('channel')))
-        self.irc_instance._bot.send('WHO', mask=self.name)
 
     def on_user_join(self, **raw_message):
         ''' Callback to call when an user has joined the channel. '''
-        nick = raw_message.get('nick')
-
-        if not nick or self.find_user(nick):
-            return
-
-        self.users.append(IRCUser(self.irc_instance, **raw_message))
+        self.irc_instance.add_channel_user(self, raw_message)
 
     def on_bot_part(self, **raw_message):
         ''' Callback to call when bot parts the channel. '''
         self.irc_instance.log.info('Parted %s' % (raw_message.get('channel')))
+        self.irc_instance.clear_channel_users(self)
 
     def on_user_part(self, **raw_message):
         ''' Callback to call when an user parts the channel. '''
         nick = raw_message.get('nick')
-        user = self.find_user(nick)
-        if not nick or not user:
-            return
-
-        self.users.remove(user)
-
-    def on_user_quit(self, nick):
-        ''' Callback to call when an user quits. '''
-        user = self.find_user(nick)
-        if not user:
+        if not nick:
             return
 
-        self.users.remove(user)
+        self.irc_instance.remove_channel_user(self, nick)
 
     def find_user(self, nick):
         ''' Find user in channel. '''
-        for user in self.users:
-            if user.nick == nick:
-                return user
-        return None
+        if not nick:
+            return None
+        return self.users.get(irc_casefold(nick))
 
 
 class IRCUser(object):
-    ''' Object to hold information of an IRC user. '''
+    ''' Object to hold information of an IRC user, shared between all channels the user is seen on. '''
+    __slots__ = ('nick', 'user', 'host', 'real_name', 'account', 'away', 'channels', 'channel_modes')
+
     def __init__(self, irc_instance, **raw_message):
+        self.nick = None
+        self.user = None
+        self.host = None
+        self.real_name = None
+        self.account = None
+        self.away = False
+        # Casefolded names of the channels the user is on, and the user's modes on them.
+        self.channels = set()
         self.channel_modes = {}
         self.update_information(**raw_message)
 
@@ -226,19 +591,31 @@ class IRCUser(object):
 
     def update_information(self, **raw_message):
         ''' Update user information from channel activities. '''
-        self.nick = raw_message.get('nick')
+        self.nick = raw_message.get('nick') or self.nick
+        self.real_name = raw_message.get('real_name') or self.real_name
+        self.user = raw_message.get('user') or self.user
+
+        # Account is reported as * or 0 for users not logged in.
+        account = raw_message.get('account')
+        if account:
+            self.account = None if account in ('*', '0') else account
+
+        # WHO flags start with H (here) or G (gone).
+        if raw_message.get('hg_code', '').startswith(('H', 'G')):
+            self.away = raw_message['hg_code'].startswith('G')
 
-        self.real_name = raw_message.get('real_name')
-        self.user = raw_message.get('user')
-        self.host = raw_message.get('host')
+        # Lots of users share the same hosts, so intern them to save memory.
+        host = raw_message.get('host')
+        if host:
+            self.host = sys.intern(host)
 
         channel = raw_message.get('channel')
-        if channel:
-            self.channel_modes[channel] = list(raw_message.get('hg_code', ''))
+        if channel and 'hg_code' in raw_message:
+            self.channel_modes[irc_casefold(channel)] = list(raw_message.get('hg_code', ''))
 
     def is_op(self, channel):
         ''' Check if user is op in channel. '''
         try:
-            return '@' in self.channel_modes[channel]
+            return '@' in self.channel_modes[irc_casefold(channel)]
         except KeyError:
             return False
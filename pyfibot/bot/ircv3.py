@@ -0,0 +1,217 @@
+''' IRCv3 support missing from bottom: message tags, capability negotiation and WHOX. '''
+import logging
+from collections import OrderedDict
+from bottom.unpack import split_line, synonym, nickmask, unpack_command
+
+
+TAG_ESCAPES = {
+    ':': ';',
+    's': ' ',
+    'r': '\r',
+    'n': '\n',
+    '\\': '\\',
+}
+
+
+def unescape_tag_value(value):
+    ''' Unescape message tag value, see https://ircv3.net/specs/extensions/message-tags '''
+    unescaped = []
+    characters = iter(value)
+    for character in characters:
+        if character == '\\':
+            character = TAG_ESCAPES.get(next(characters, ''), '')
+        unescaped.append(character)
+    return ''.join(unescaped)
+
+
+def split_tags(message):
+    ''' Split message tags from the line, returning tags as a dict and the rest of the line. '''
+    if not message.startswith('@'):
+        return {}, message
+
+    tags_string, _, line = message[1:].partition(' ')
+    tags = {}
+    for tag in tags_string.split(';'):
+        key, _, value = tag.partition('=')
+        if key:
+            tags[key] = unescape_tag_value(value)
+    return tags, line.lstrip()
+
+
+def unpack_message(message):
+    '''
+    Unpack line to event and kwargs, like bottom.unpack.unpack_command.
+    In addition to what bottom supports, handles message tags, extended JOIN and
+    CAP, WHOX (RPL_WHOSPCRPL), AWAY, KICK and BATCH commands, and fixes RPL_ENDOFWHO.
+    '''
+    tags, line = split_tags(message.strip())
+    prefix, command, params = split_line(line)
+    command = synonym(command)
+    kwargs = {}
+
+    if command == 'CAP':
+        kwargs['target'] = params[0]
+        kwargs['subcommand'] = params[1].upper()
+        kwargs['more'] = len(params) > 3 and params[2] == '*'
+        kwargs['capabilities'] = params[-1].split() if len(params) > 2 else []
+
+    elif command == '354':
+        command = 'RPL_WHOSPCRPL'
+        kwargs['target'] = params[0]
+        kwargs['params'] = params[1:]
+
+    elif command == 'RPL_ENDOFWHO':
+        # bottom takes the name from the wrong parameter.
+        kwargs['target'] = params[0]
+        kwargs['name'] = params[1]
+        kwargs['message'] = params[-1]
+
+    elif command == 'AWAY':
+        nickmask(prefix, kwargs)
+        kwargs['message'] = params[0] if params else None
+
+    elif command == 'KICK':
+        nickmask(prefix, kwargs)
+        kwargs['channel'] = params[0]
+        kwargs['target'] = params[1]
+        kwargs['message'] = params[2] if len(params) > 2 else ''
+
+    elif command == 'BATCH':
+        kwargs['reference'] = params[0]
+        kwargs['params'] = params[1:]
+
+    elif command == 'JOIN' and len(params) > 2:
+        # extended-join: JOIN <channel> <account> :<realname>
+        nickmask(prefix, kwargs)
+        kwargs['channel'] = params[0]
+        kwargs['account'] = params[1]
+        kwargs['real_name'] = params[2]
+
+    else:
+        command, kwargs = unpack_command(line)
+
+    if tags:
+        kwargs['tags'] = tags
+    return command, kwargs
+
+
+def ircv3_handler(client):
+    '''
+    Raw handler for bottom.Client, to be used in place of bottom's rfc2812_handler.
+    Lines that can't be parsed are passed on to the next handler.
+    '''
+    async def handler(next_handler, message):
+        try:
+            event, kwargs = unpack_message(message)
+        except (ValueError, IndexError):
+            await next_handler(message)
+            return
+        client.trigger(event, **kwargs)
+    return handler
+
+
+class CapabilityNegotiation(object):
+    '''
+    Negotiates IRCv3 capabilities when connecting, see https://ircv3.net/specs/extensions/capability-negotiation
+
+    Registration is suspended until CAP END is sent, which happens once the wanted capabilities
+    the server supports have been acknowledged or rejected.
+    '''
+    def __init__(self, client, wanted):
+        self.client = client
+        self.wanted = set(wanted)
+        self.available = set()
+        self.enabled = set()
+        self.finished = False
+
+    def start(self):
+        self.client.send_raw('CAP LS 302')
+
+    def handle(self, subcommand, capabilities, more=False, **kwargs):
+        if subcommand == 'LS':
+            # Capabilities may have values (sasl=PLAIN,EXTERNAL), which are not needed here.
+            self.available.update(capability.split('=')[0] for capability in capabilities)
+            if more:
+                return
+
+            requested = sorted(self.wanted & self.available)
+            if not requested:
+                return self.finish()
+            self.client.send_raw('CAP REQ :%s' % ' '.join(requested))
+
+        elif subcommand == 'ACK':
+            self.enabled.update(capability for capability in capabilities if not capability.startswith('-'))
+            self.finish()
+
+        elif subcommand == 'NAK':
+            self.finish()
+
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        self.client.send_raw('CAP END')
+
+
+class WhoScheduler(object):
+    '''
+    Sends WHO requests for channels one at a time, waiting `interval` seconds between requests.
+    Uses WHOX to only fetch the needed fields when the server supports it.
+    '''
+    WHOX_FIELDS = 'tcuhnfar'
+    WHOX_TOKEN = '152'
+
+    def __init__(self, send_queue, loop, interval=2, timeout=60):
+        self.send_queue = send_queue
+        self.loop = loop
+        self.interval = float(interval)
+        self.timeout = float(timeout)
+        self.whox = False
+
+        self._pending = OrderedDict()
+        self._current = None
+        self._handle = None
+
+    @property
+    def log(self):
+        return logging.getLogger(self.__class__.__name__)
+
+    def request(self, key, channel):
+        ''' Request WHO for channel, identified by its casefolded name. '''
+        if key == self._current or key in self._pending:
+            return
+        self._pending[key] = channel
+        if not self._current and not self._handle:
+            self._next()
+
+    def done(self, key):
+        ''' Call when WHO for the channel has been completed. '''
+        if key != self._current:
+            return
+        self._current = None
+        self._cancel()
+        self._handle = self.loop.call_later(self.interval, self._next)
+
+    def _next(self):
+        self._handle = None
+        self._current = None
+        if not self._pending:
+            return
+
+        self._current, channel = self._pending.popitem(last=False)
+        if self.whox:
+            self.send_queue.send_raw('WHO %s %%%s,%s' % (channel, self.WHOX_FIELDS, self.WHOX_TOKEN))
+        else:
+            self.send_queue.send_command('WHO', mask=channel)
+        # Don't wait forever if the server never ends the reply.
+        self._handle = self.loop.call_later(self.timeout, self._next)
+
+    def _cancel(self):
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+
+    def clear(self):
+        self._pending.clear()
+        self._current = None
+        self._cancel()
@@ -0,0 +1,107 @@
+import time
+import random
+from pyfibot.utils import get_duration_string
+
+
+class ReconnectSupervisor(object):
+    '''
+    Keeps track of the connection state of a bot, reconnecting it without blocking the event loop.
+
+    Reconnects are delayed with exponential backoff with jitter, starting from `delay` seconds and
+    doubling on every failed attempt up to `max_delay`. Attempts are reset after the connection has
+    stayed up for `stable_time` seconds. Disconnects while a reconnect is already pending are ignored,
+    so the same disconnect reported twice only causes one reconnect.
+    '''
+    def __init__(self, loop, connect, log, delay=5, max_delay=300, stable_time=60):
+        self.loop = loop
+        self.connect = connect
+        self.log = log
+        self.delay = float(delay)
+        self.max_delay = float(max_delay)
+        self.stable_time = float(stable_time)
+
+        self.state = 'disconnected'
+        self.attempts = 0
+        self.reconnects = 0
+        self.connected_at = None
+        self.last_error = None
+
+        self._reconnect_handle = None
+        self._stable_handle = None
+
+    @classmethod
+    def from_configuration(cls, loop, connect, log, configuration):
+        return cls(
+            loop,
+            connect,
+            log,
+            delay=configuration.get('reconnect_delay', 5),
+            max_delay=configuration.get('reconnect_max_delay', 300),
+            stable_time=configuration.get('reconnect_stable_time', 60),
+        )
+
+    def get_delay(self):
+        ''' Get delay before the next reconnect attempt. '''
+        delay = min(self.max_delay, self.delay * 2 ** self.attempts)
+        return random.uniform(delay / 2, delay)
+
+    def connecting(self):
+        ''' Call when starting to connect. '''
+        self.state = 'connecting'
+
+    def connected(self):
+        ''' Call when the connection has been established. '''
+        self.state = 'connected'
+        self.connected_at = time.time()
+        self._cancel(self._stable_handle)
+        self._stable_handle = self.loop.call_later(self.stable_time, self._stable)
+
+    def disconnected(self, error=None):
+        ''' Call when the connection has been lost or connecting failed, to schedule a reconnect. '''
+        if self.state == 'waiting':
+            return
+
+        self._cancel(self._stable_handle)
+        self.state = 'waiting'
+        self.connected_at = None
+        self.last_error = error
+
+        delay = self.get_delay()
+        self.attempts += 1
+        if error:
+            self.log.warning('Disconnected (%s). Reconnecting in %.1f seconds.' % (error, delay))
+        else:
+            self.log.warning('Disconnected. Reconnecting in %.1f seconds.' % delay)
+        self._reconnect_handle = self.loop.call_later(delay, self._reconnect)
+
+    def connect_done(self, future):
+        ''' Done callback for the connecting task, scheduling a reconnect only if connecting failed. '''
+        if future.cancelled() or not future.exception():
+            return
+        self.disconnected(future.exception())
+
+    def _reconnect(self):
+        self._reconnect_handle = None
+        self.reconnects += 1
+        self.connecting()
+        self.connect()
+
+    def _stable(self):
+        self._stable_handle = None
+        self.attempts = 0
+
+    def _cancel(self, handle):
+        if handle:
+            handle.cancel()
+
+    def get_stats(self):
+        stats = {
+            'state': self.state,
+            'attempts': self.attempts,
+            'reconnects': self.reconnects,
+        }
+        if self.connected_at:
+            stats['uptime'] = get_duration_string(time.time() - self.connected_at) or '0s'
+        if self.last_error:
+            stats['last_error'] = self.last_error
+        return stats
@@ -0,0 +1,207 @@
+import time
+import logging
+from collections import deque, OrderedDict
+
+
+# Maximum length of an IRC line, including the trailing CRLF.
+MAX_LINE_BYTES = 512
+# Maximum lengths of username and hostname, used to reserve room for the prefix
+# the server adds when relaying our messages to others.
+MAX_USER_BYTES = 10
+MAX_HOST_BYTES = 63
+
+
+def split_message(message, max_bytes, encoding='utf-8'):
+    '''
+    Split message to lines of at most max_bytes when encoded.
+    Lines are split on whitespace when possible, and never in the middle of a character.
+    Newlines always split the message, as they cannot be sent within an IRC message.
+    '''
+    lines = []
+    for line in message.splitlines():
+        encoded = line.strip().encode(encoding)
+        while len(encoded) > max_bytes:
+            cut = max_bytes
+            # Don't split multibyte UTF-8 characters, continuation bytes are 0b10xxxxxx.
+            while cut > 0 and encoded[cut] & 0xC0 == 0x80:
+                cut -= 1
+
+            # Prefer splitting at a space, unless it would leave the line very short.
+            space = encoded.rfind(b' ', 0, cut + 1)
+            if space > max_bytes // 2:
+                cut = space
+
+            lines.append(encoded[:cut].strip().decode(encoding))
+            encoded = encoded[cut:].strip()
+
+        if encoded:
+            lines.append(encoded.decode(encoding))
+    return lines
+
+
+class TokenBucket(object):
+    ''' Token bucket allowing `burst` lines at once, refilling `rate` lines per second. '''
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated = self.clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, cost=1):
+        ''' Get seconds to wait until cost can be consumed. '''
+        self._refill()
+        cost = min(cost, self.burst)
+        if self.tokens >= cost:
+            return 0
+        return (cost - self.tokens) / self.rate
+
+    def consume(self, cost=1):
+        ''' Consume tokens, returning False if there aren't enough. '''
+        if self.delay(cost) > 0:
+            return False
+        self.tokens -= min(cost, self.burst)
+        return True
+
+
+class IRCSendQueue(object):
+    '''
+    Outgoing message queue for an IRC connection.
+
+    Lines are sent through a token bucket flood limiter, allowing `flood_burst` lines at once
+    and `flood_rate` lines per second after that. Commands (JOIN, WHO...) are sent before
+    messages, and messages to different targets are interleaved line by line.
+
+    Messages are split to fit the 512 byte protocol limit. Messages identical to one already
+    pending for the same target are dropped, as are the oldest pending messages when more than
+    `sendq_limit` messages are waiting for a target.
+    '''
+    def __init__(self, client, loop, nickname, flood_rate=0.5, flood_burst=5, sendq_limit=10, clock=time.monotonic):
+        self.client = client
+        self.loop = loop
+        self.nickname = nickname
+        self.sendq_limit = max(1, int(sendq_limit))
+        self.bucket = TokenBucket(flood_rate, flood_burst, clock=clock)
+
+        self._commands = deque()
+        self._messages = OrderedDict()
+        self._handle = None
+
+        self.sent = 0
+        self.dropped = 0
+
+    @classmethod
+    def from_configuration(cls, client, loop, nickname, configuration):
+        return cls(
+            client,
+            loop,
+            nickname,
+            flood_rate=configuration.get('flood_rate', 0.5),
+            flood_burst=configuration.get('flood_burst', 5),
+            sendq_limit=configuration.get('sendq_limit', 10),
+        )
+
+    @property
+    def log(self):
+        return logging.getLogger(self.__class__.__name__)
+
+    @property
+    def pending(self):
+        return len(self._commands) + sum(len(messages) for messages in self._messages.values())
+
+    def max_message_bytes(self, target):
+        ''' Get maximum length of message to target, leaving room for the prefix added by the server. '''
+        overhead = ':%s!%s@%s PRIVMSG %s :\r\n' % (self.nickname, 'u' * MAX_USER_BYTES, 'h' * MAX_HOST_BYTES, target)
+        return MAX_LINE_BYTES - len(overhead.encode('utf-8'))
+
+    def send_command(self, command, **kwargs):
+        ''' Queue command to be sent before any pending messages. '''
+        self._commands.append((command, kwargs))
+        self._schedule()
+
+    def send_raw(self, line):
+        ''' Queue raw line, for commands bottom can't pack, to be sent before any pending messages. '''
+        self._commands.append((None, {'line': line}))
+        self._schedule()
+
+    def send_message(self, target, message):
+        ''' Queue message to target. '''
+        lines = split_message(message, self.max_message_bytes(target))
+        if not lines:
+            return
+
+        messages = self._messages.setdefault(target, deque())
+        if any(pending == message for pending, _, _ in messages):
+            self.log.debug('Dropping duplicate message to %s.' % target)
+            self.dropped += 1
+            return
+
+        messages.append((message, deque(lines), len(lines)))
+        # Drop the oldest messages, except one already partially sent.
+        while len(messages) > self.sendq_limit:
+            _, pending_lines, total_lines = messages[0]
+            del messages[1 if len(pending_lines) < total_lines else 0]
+            self.dropped += 1
+        self._schedule()
+
+    def clear(self):
+        ''' Drop everything pending, for example when disconnected. '''
+        self._commands.clear()
+        self._messages.clear()
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+
+    def _schedule(self, delay=0):
+        if self._handle:
+            return
+        self._handle = self.loop.call_later(delay, self._drain)
+
+    def _pop(self):
+        ''' Get next command to send, commands first and then messages round-robin between targets. '''
+        if self._commands:
+            return self._commands.popleft()
+
+        target, messages = next(iter(self._messages.items()))
+        _, lines, _ = messages[0]
+        line = lines.popleft()
+        if not lines:
+            messages.popleft()
+
+        # Move target to the end of the line, to let other targets have their turn.
+        del self._messages[target]
+        if messages:
+            self._messages[target] = messages
+        return 'PRIVMSG', {'target': target, 'message': line}
+
+    def _drain(self):
+        self._handle = None
+        while self._commands or self._messages:
+            delay = self.bucket.delay()
+            if delay > 0:
+                return self._schedule(delay)
+
+            self.bucket.consume()
+            command, kwargs = self._pop()
+            try:
+                if command is None:
+                    self.client.send_raw(kwargs['line'])
+                else:
+                    self.client.send(command, **kwargs)
+            except RuntimeError:
+                self.log.warning('Not connected, dropping %i pending messages.' % (self.pending + 1))
+                return self.clear()
+            self.sent += 1
+
+    def get_stats(self):
+        return {
+            'pending': self.pending,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'tokens': '%.1f/%i' % (self.bucket.tokens, self.bucket.burst),
+        }
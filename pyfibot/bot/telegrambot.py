@@ -1,5 +1,6 @@
 import aiotg
 from pyfibot.bot import Bot
+from pyfibot.bot.reconnect import ReconnectSupervisor
 from pyfibot.utils import datetime_fromtimestamp, get_duration_string
 
 
@@ -13,6 +14,8 @@ class TelegramBot(Bot):
         if not self.api_token:
             raise AttributeError('TelegramBot API key not found!')
 
+        self.supervisor = ReconnectSupervisor.from_configuration(self.core.loop, self.connect, self.log, self.configuration)
+
     def _get_builtin_commands(self):
         commands = super(TelegramBot, self)._get_builtin_commands()
         commands.update({
@@ -20,16 +23,14 @@ class TelegramBot(Bot):
         })
         return commands
 
-    def is_admin(self, raw_message):
-        for admin in self.admins:
-            try:
-                if raw_message['chat'].sender.get('id', '-1') == int(admin):
-                    return True
-            except:
-                continue
-        return False
+    def get_identity(self, raw_message):
+        chat = raw_message.get('chat')
+        if not chat or chat.sender.get('id') is None:
+            return None
+        return str(chat.sender.get('id'))
 
     def connect(self):
+        self.supervisor.connecting()
         bot = aiotg.Bot(api_token=self.api_token)
 
         @bot.command(r'(.+)')
@@ -51,7 +52,13 @@ class TelegramBot(Bot):
 
         self._bot = bot
         task = self.core.loop.create_task(self._bot.loop())
-        task.add_done_callback(self.reconnect)
+        # Reconnect if polling fails.
+        task.add_done_callback(self.supervisor.connect_done)
+        # Telegram is polled over HTTP, there's no separate event for being connected.
+        self.supervisor.connected()
+
+    def get_connection_stats(self):
+        return self.supervisor.get_stats()
 
     def respond(self, message, raw_message):
         chat = raw_message.get('chat')
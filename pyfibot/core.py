@@ -5,6 +5,7 @@ import yaml
 import asyncio
 import logging
 from pyfibot import coloredlogger
+from pyfibot.url import URL
 
 
 class Core(object):
@@ -13,8 +14,11 @@ class Core(object):
     def __init__(self, configuration_file='~/.config/pyfibot/pyfibot.yml', log_level='info', daemonize=False):
         self.loop = asyncio.get_event_loop()
         self.bots = {}
+        # Database connections shared by the bots, by file, see pyfibot.database.
+        self.databases = {}
         self.configuration = {}
         self.admins = []
+        self.ignores = []
         self.command_char = '.'
         self.configuration_file = os.path.abspath(os.path.expanduser(configuration_file))
 
@@ -28,8 +32,16 @@ class Core(object):
     def run(self):
         ''' Run bot. '''
         self.connect_bots()
-        self.loop.run_forever()
-        self.loop.close()
+        try:
+            self.loop.run_forever()
+        finally:
+            # Let plugins write out what they have buffered before the connections close.
+            for bot in self.bots.values():
+                bot.unload_plugins()
+            self.loop.run_until_complete(URL.http.close_async())
+            for database in self.databases.values():
+                database.close()
+            self.loop.close()
 
     @property
     def log(self):
@@ -100,7 +112,9 @@ class Core(object):
         self.log.info('Reloading core configuration.')
 
         self.admins = self.configuration.get('admins', [])
+        self.ignores = self.configuration.get('ignore', [])
         self.command_char = self.configuration.get('command_char', '.')
+        URL.configure(self.configuration, self.configuration_path)
         for name, bot in self.bots.items():
             bot.load_configuration()
 
@@ -1,7 +1,55 @@
 import os
-# import time
-# import random
-import dataset
+import logging
+import threading
+import collections
+import collections.abc
+
+# dataset 1.0.8 imports the ABC aliases removed from collections in Python 3.10.
+if not hasattr(collections, 'Sequence'):
+    collections.Sequence = collections.abc.Sequence
+
+import dataset  # noqa: E402
+from sqlalchemy import event
+
+
+class DatabaseConnection(object):
+    '''
+    Long-lived dataset connection to an SQLite database file, shared by everything using the file.
+
+    The database is in WAL mode, so reads don't wait for writes, and SQLite waits `busy_timeout`
+    milliseconds for locks held by other connections instead of failing right away.
+    New databases are created with incremental auto vacuum, so space freed by deleting rows
+    can be returned to the file system a bit at a time with `PRAGMA incremental_vacuum`.
+    Within the process, `with Database(bot)` blocks are serialized with `lock`.
+    '''
+    def __init__(self, path, busy_timeout=5000):
+        self.path = path
+        self.busy_timeout = int(busy_timeout)
+        self.lock = threading.RLock()
+
+        # Connections are used from the plugin executor threads.
+        self.db = dataset.connect(
+            'sqlite:///%s' % path,
+            engine_kwargs={'connect_args': {'check_same_thread': False}},
+        )
+        event.listen(self.db.engine, 'connect', self._configure)
+
+    @property
+    def log(self):
+        return logging.getLogger(self.__class__.__name__)
+
+    def _configure(self, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # Only has an effect before the first table is created.
+        cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA busy_timeout=%i' % self.busy_timeout)
+        cursor.close()
+
+    def close(self):
+        with self.lock:
+            self.db.engine.dispose()
 
 
 class Database(object):
@@ -16,29 +64,47 @@ class Database(object):
     Provides a dataset-interface to the SQLite3 database.
     See: https://dataset.readthedocs.io/en/latest/
 
+    All bots of the core share one connection to the database, see DatabaseConnection.
+    The connection is configured with the `database` section of the core configuration.
+
+    Other database files in the configuration directory can be used by name, for example
+    `Database(bot, 'archive')` for `archive.sqlite3`.
     '''
+    # Guards creating the shared connections.
+    _connections_lock = threading.Lock()
 
-    def __init__(self, bot):
+    def __init__(self, bot, name='database'):
         self._core = bot.core
-        self._database_file = os.path.join(self._core.configuration_path, 'database.sqlite3')
-        self._database_lock_file = os.path.join(self._core.configuration_path, 'database.lock')
+        self._database_file = os.path.join(self._core.configuration_path, '%s.sqlite3' % name)
+        self._connection = None
 
-        self._database_instance = None
+    @property
+    def log(self):
+        return logging.getLogger(self.__class__.__name__)
 
-    def __enter__(self, *args, **kwargs):
-        # Wait for lockfile to release
-        while os.path.exists(self._database_lock_file):
-            pass
-            # # Sleep for random time between 1 and 10 milliseconds
-            # time.sleep(random.randrange(1, 10) / 1000)
+    def get_connection(self):
+        ''' Get the connection to the database file shared by the core, connecting on first use. '''
+        with self._connections_lock:
+            connection = self._core.databases.get(self._database_file)
+            if connection is None:
+                self._remove_lock_file()
+                configuration = self._core.configuration.get('database', {})
+                connection = DatabaseConnection(self._database_file, busy_timeout=configuration.get('busy_timeout', 5000))
+                self._core.databases[self._database_file] = connection
+            return connection
 
-        # Create lockfile
-        with open(self._database_lock_file, 'w'):
-            pass
+    def _remove_lock_file(self):
+        # Older versions locked the database with a file, which was left behind if the bot died while writing.
+        lock_file = os.path.join(self._core.configuration_path, 'database.lock')
+        if os.path.exists(lock_file):
+            self.log.info('Removing old database lock file "%s".' % lock_file)
+            os.unlink(lock_file)
 
-        # Initialize database instance
-        self._database_instance = dataset.connect('sqlite:///%s' % self._database_file)
-        return self._database_instance
+    def __enter__(self, *args, **kwargs):
+        self._connection = self.get_connection()
+        self._connection.lock.acquire()
+        return self._connection.db
 
     def __exit__(self, *args, **kwargs):
-        os.unlink(self._database_lock_file)
+        self._connection.lock.release()
+        self._connection = None
@@ -0,0 +1,116 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BoundedExecutor(object):
+    '''
+    Runs callbacks with bounded concurrency and a bounded queue.
+
+    At most `max_concurrency` callbacks run at once, coroutines as tasks in the event loop
+    and regular functions in the executor's own thread pool. Additional callbacks are queued
+    up to `queue_limit`, after which `policy` decides what happens:
+        - drop: the new callback is rejected
+        - drop_oldest: the oldest queued callback is rejected to make room for the new one
+        - busy: the new callback is rejected and `on_busy` is called with its raw_message
+
+    All methods are to be called from the event loop.
+    '''
+    POLICIES = ('drop', 'drop_oldest', 'busy')
+
+    def __init__(self, loop, name, max_concurrency=4, queue_limit=16, policy='drop', on_busy=None):
+        if policy not in self.POLICIES:
+            raise ValueError('Unknown overload policy "%s".' % policy)
+
+        self.loop = loop
+        self.name = name
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.queue_limit = max(0, int(queue_limit))
+        self.policy = policy
+        self.on_busy = on_busy
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix=name)
+        self._queue = deque()
+        self._closed = False
+
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_configuration(cls, loop, name, configuration, on_busy=None):
+        ''' Create executor using `max_concurrency`, `queue_limit` and `overload_policy` from configuration. '''
+        return cls(
+            loop,
+            name,
+            max_concurrency=configuration.get('max_concurrency', 4),
+            queue_limit=configuration.get('queue_limit', 16),
+            policy=configuration.get('overload_policy', 'drop'),
+            on_busy=on_busy,
+        )
+
+    @property
+    def queued(self):
+        return len(self._queue)
+
+    def submit(self, callback, *args, raw_message=None, on_rejected=None):
+        '''
+        Submit callback to be run with args.
+        Returns future of the callback if it was started right away, None if it was queued or rejected.
+        on_rejected is called if the callback is rejected, right away or when dropped from the queue later.
+        '''
+        if self._closed:
+            return None
+
+        self.submitted += 1
+        job = (callback, args, raw_message, on_rejected)
+
+        if self.running < self.max_concurrency:
+            return self._start(job)
+
+        if len(self._queue) < self.queue_limit:
+            self._queue.append(job)
+            return None
+
+        if self.policy == 'drop_oldest' and self._queue:
+            # Queue the new callback, rejecting the oldest one instead.
+            self._queue.append(job)
+            job = self._queue.popleft()
+        elif self.policy == 'busy' and raw_message is not None and self.on_busy:
+            self.on_busy(raw_message)
+        self.rejected += 1
+        _, _, _, on_rejected = job
+        if on_rejected:
+            on_rejected()
+        return None
+
+    def _start(self, job):
+        callback, args, _, _ = job
+        self.running += 1
+        if asyncio.iscoroutinefunction(callback):
+            future = self.loop.create_task(callback(*args))
+        else:
+            future = self.loop.run_in_executor(self._executor, callback, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        self.running -= 1
+        self.completed += 1
+        if self._queue and not self._closed:
+            self._start(self._queue.popleft())
+
+    def shutdown(self):
+        ''' Drop queued callbacks and release the thread pool, letting running callbacks finish. '''
+        self._closed = True
+        self._queue.clear()
+        self._executor.shutdown(wait=False)
+
+    def get_stats(self):
+        return {
+            'running': '%i/%i' % (self.running, self.max_concurrency),
+            'queued': '%i/%i' % (self.queued, self.queue_limit),
+            'completed': self.completed,
+            'rejected': self.rejected,
+        }
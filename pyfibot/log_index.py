@@ -0,0 +1,189 @@
+def quote_terms(terms):
+    '''
+    Build FTS5 query matching all of the words in terms, without letting users write FTS5 syntax:
+    'foo bar*' -> '"foo" "bar"*'. A trailing * matches words starting with the term.
+    '''
+    query = []
+    for term in terms.split():
+        prefix = term.endswith('*')
+        term = term.rstrip('*')
+        if not term:
+            continue
+        query.append('"%s"%s' % (term.replace('"', '""'), '*' if prefix else ''))
+    return ' '.join(query)
+
+
+def quote_literal(value):
+    return "'%s'" % value.replace("'", "''")
+
+
+class LogIndex(object):
+    '''
+    SQLite FTS5 index over the channel log tables written by the logger plugin, for searching
+    messages by words and senders in all channels at once.
+
+    New rows are indexed by triggers on the log tables, in the same transaction they're written in.
+    Rows written before the trigger was added are indexed in chunks by backfill(), one table at a time,
+    with progress kept in a table, so it can be stopped and continued at any point.
+
+    Each log table gets its own range of index rowids, so rows can be removed from the index
+    by their ids without scanning it, see delete().
+
+    All methods take a dataset database, which is used as is, without locking or transactions.
+    '''
+    INDEX_TABLE = 'log_search'
+    PROGRESS_TABLE = 'log_search_progress'
+    # Index rowids reserved for each log table.
+    ROWID_SPAN = 2 ** 40
+
+    def __init__(self, bot_name):
+        self.bot_name = bot_name
+        # Sources known to have triggers, to skip checking them.
+        self.sources = set()
+        self.created = False
+
+    def create(self, db):
+        ''' Create the index tables, if they don't exist. '''
+        if self.created:
+            return
+        # Diacritics are kept, as ä and ö are letters of their own in Finnish.
+        db.query(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5('
+            'message, sender, bot UNINDEXED, target UNINDEXED, time UNINDEXED, source UNINDEXED, source_id UNINDEXED, '
+            "tokenize='unicode61 remove_diacritics 0')" % self.INDEX_TABLE
+        )
+        db.query(
+            'CREATE TABLE IF NOT EXISTS %s ('
+            'number INTEGER PRIMARY KEY, source TEXT UNIQUE, bot TEXT, indexed_id INTEGER, last_id INTEGER)'
+            % self.PROGRESS_TABLE
+        )
+        self.created = True
+
+    def add_source(self, db, source):
+        '''
+        Index log table source: new rows with a trigger, the ones already in it with backfill().
+        The table must have its columns. Returns True, if source has rows waiting for backfill().
+        '''
+        if source in self.sources:
+            return False
+        self.create(db)
+        # Rows up to the current last one were there before the trigger.
+        db.query(
+            'INSERT OR IGNORE INTO %s (source, bot, indexed_id, last_id) '
+            'SELECT :source, :bot, 0, COALESCE(MAX(id), 0) FROM "%s"' % (self.PROGRESS_TABLE, source),
+            source=source, bot=self.bot_name
+        )
+        db.query(
+            'CREATE TRIGGER IF NOT EXISTS "%(trigger)s" AFTER INSERT ON "%(source)s" BEGIN '
+            'INSERT INTO %(index)s (rowid, message, sender, bot, target, time, source, source_id) '
+            'VALUES (%(base)i + new.id, new.message, new.sender, %(bot)s, new.target, new.time, %(source_literal)s, new.id); END' % {
+                'trigger': '%s-search' % source,
+                'source': source,
+                'index': self.INDEX_TABLE,
+                'base': self.get_rowid_base(db, source),
+                'bot': quote_literal(self.bot_name),
+                'source_literal': quote_literal(source),
+            }
+        )
+        self.sources.add(source)
+        backlog = list(db.query(
+            'SELECT last_id - indexed_id AS backlog FROM %s WHERE source = :source' % self.PROGRESS_TABLE, source=source
+        ))
+        return backlog[0]['backlog'] > 0
+
+    def get_rowid_base(self, db, source):
+        ''' Get the first index rowid of source, None if it isn't indexed. '''
+        for row in db.query('SELECT number FROM %s WHERE source = :source' % self.PROGRESS_TABLE, source=source):
+            return row['number'] * self.ROWID_SPAN
+        return None
+
+    def add_sources(self, db, prefix):
+        ''' Index all existing log tables with names starting with prefix. '''
+        for source in db.tables:
+            if source.startswith(prefix) and source not in self.sources:
+                self.add_source(db, source)
+
+    def backfill(self, db, rows=1000):
+        ''' Index at most rows rows written before their table had a trigger. Returns the number of rows indexed. '''
+        self.create(db)
+        progress = list(db.query(
+            'SELECT number, source, indexed_id, last_id FROM %s WHERE bot = :bot AND indexed_id < last_id ORDER BY source LIMIT 1'
+            % self.PROGRESS_TABLE, bot=self.bot_name
+        ))
+        if not progress:
+            return 0
+
+        source, indexed_id, last_id = progress[0]['source'], progress[0]['indexed_id'], progress[0]['last_id']
+        end = min(last_id, indexed_id + rows)
+        db.query(
+            'INSERT INTO %s (rowid, message, sender, bot, target, time, source, source_id) '
+            'SELECT :base + id, message, sender, :bot, target, time, :source, id FROM "%s" WHERE id > :start AND id <= :end'
+            % (self.INDEX_TABLE, source),
+            base=progress[0]['number'] * self.ROWID_SPAN, bot=self.bot_name, source=source, start=indexed_id, end=end
+        )
+        db.query(
+            'UPDATE %s SET indexed_id = :end WHERE source = :source' % self.PROGRESS_TABLE,
+            end=end, source=source
+        )
+        return end - indexed_id
+
+    def delete(self, db, source, start_id, end_id):
+        ''' Remove rows of source with ids from start_id to end_id from the index. '''
+        self.create(db)
+        base = self.get_rowid_base(db, source)
+        if base is None:
+            return
+        db.query(
+            'DELETE FROM %s WHERE rowid >= :start AND rowid <= :end' % self.INDEX_TABLE,
+            start=base + start_id, end=base + end_id
+        )
+
+    def remove_source(self, db, source):
+        ''' Forget source, after its table has been dropped along with its trigger. '''
+        self.delete(db, source, 0, self.ROWID_SPAN - 1)
+        db.query('DELETE FROM %s WHERE source = :source' % self.PROGRESS_TABLE, source=source)
+        self.sources.discard(source)
+
+    def merge(self, db, pages=500):
+        ''' Merge index segments left by many small inserts and deletes, doing about pages pages of work. '''
+        self.create(db)
+        db.query("INSERT INTO %s (%s, rank) VALUES ('merge', :pages)" % (self.INDEX_TABLE, self.INDEX_TABLE), pages=pages)
+
+    def get_backlog(self, db):
+        ''' Get number of rows still to be backfilled. '''
+        self.create(db)
+        rows = list(db.query(
+            'SELECT COALESCE(SUM(last_id - indexed_id), 0) AS backlog FROM %s WHERE bot = :bot' % self.PROGRESS_TABLE,
+            bot=self.bot_name
+        ))
+        return rows[0]['backlog']
+
+    def search(self, db, terms, target=None, limit=3):
+        ''' Find messages with all the words in terms, best matches first. Returns rows with sender, target, time and message. '''
+        query = quote_terms(terms)
+        if not query:
+            return []
+        self.create(db)
+        return list(db.query(
+            'SELECT sender, target, time, message FROM %s WHERE %s MATCH :terms AND bot = :bot '
+            'AND (:target IS NULL OR target = :target) ORDER BY rank LIMIT :limit'
+            % (self.INDEX_TABLE, self.INDEX_TABLE),
+            terms='{message}: (%s)' % query, bot=self.bot_name, target=target, limit=limit
+        ))
+
+    def seen(self, db, nick, target=None):
+        ''' Find the last message from nick, None if there's none. '''
+        query = quote_terms(nick.replace('*', ''))
+        if not query:
+            return None
+        self.create(db)
+        # Matching the sender column also matches nicks made of the same words, filter them out.
+        for row in db.query(
+            'SELECT sender, target, time, message FROM %s WHERE %s MATCH :terms AND bot = :bot '
+            'AND (:target IS NULL OR target = :target) ORDER BY time DESC'
+            % (self.INDEX_TABLE, self.INDEX_TABLE),
+            terms='{sender}: (%s)' % query, bot=self.bot_name, target=target
+        ):
+            if row['sender'].lower() == nick.lower():
+                return row
+        return None
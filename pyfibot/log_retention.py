@@ -0,0 +1,115 @@
+import re
+
+
+# Monthly partitions of log tables end with their month: 'log-bot-channel-2016-01'.
+PARTITION_REGEX = re.compile(r'-(\d{4}-\d{2})$')
+
+
+def get_partition(dt):
+    ''' Get the monthly partition of datetime dt: '2016-01'. '''
+    return dt.strftime('%Y-%m')
+
+
+class LogRetention(object):
+    '''
+    Removes messages older than their retention time from the log tables starting with prefix,
+    a batch of at most `rows` rows at a time, and from the search index.
+
+    Messages are deleted, or copied to the same table in an archive database first.
+    Log tables are written in time order, so each batch is taken from the start of the table
+    and ends at the first message to keep, which needs no index on time.
+    Monthly partitions of past months are dropped once all of their messages are removed.
+
+    All methods take a dataset database, which is used as is, without locking or transactions.
+    '''
+    def __init__(self, index, prefix, rows=1000):
+        self.index = index
+        self.prefix = prefix
+        self.rows = rows
+        # Logged channels by table.
+        self.targets = {}
+
+    def get_sources(self, db):
+        ''' Get names of the log tables. '''
+        return [source for source in db.tables if source.startswith(self.prefix)]
+
+    def get_target(self, db, source):
+        ''' Get the channel logged to source, None if it's empty. '''
+        target = self.targets.get(source)
+        if target is None:
+            for row in db.query('SELECT target FROM "%s" ORDER BY id LIMIT 1' % source):
+                target = self.targets[source] = row['target']
+        return target
+
+    def prune(self, db, source, cutoff, archive=None):
+        '''
+        Remove messages logged before UTC datetime cutoff from source, copying them to archive database
+        first, if one is given. Returns the number of messages removed.
+        '''
+        cutoff = cutoff.strftime('%Y-%m-%d %H:%M:%S')
+        # Check the oldest message first, as usually there's nothing to remove.
+        oldest = list(db.query('SELECT time FROM "%s" ORDER BY id LIMIT 1' % source))
+        if not oldest or str(oldest[0]['time']) >= cutoff:
+            return 0
+
+        expired = []
+        for row in db.query(
+            'SELECT %s FROM "%s" ORDER BY id LIMIT :rows' % ('*' if archive is not None else 'id, time', source),
+            rows=self.rows
+        ):
+            if str(row['time']) >= cutoff:
+                break
+            expired.append(row)
+
+        if archive is not None:
+            self._archive(archive, source, expired)
+        start, end = expired[0]['id'], expired[-1]['id']
+        db.query('DELETE FROM "%s" WHERE id <= :end' % source, end=end)
+        self.index.delete(db, source, start, end)
+        return len(expired)
+
+    def _archive(self, archive, source, rows):
+        # Rows of a batch which failed to be deleted after archiving are archived again, skip them.
+        archived = 0
+        if source in archive.tables:
+            archived = list(archive.query('SELECT COALESCE(MAX(id), 0) AS id FROM "%s"' % source))[0]['id']
+        # dataset fails creating a table from rows with ids, so create it with id as the primary key first,
+        # and the other columns before the transaction, as dataset warns about schema changes in one.
+        table = archive.create_table(source, primary_id='id')
+        for column, value in rows[0].items():
+            table.create_column_by_example(column, value)
+        with archive:
+            table.insert_many([row for row in rows if row['id'] > archived])
+
+    def drop_partition(self, db, source, now):
+        ''' Drop source, if it's an empty monthly partition of a month before datetime now. Returns True, if it was dropped. '''
+        match = PARTITION_REGEX.search(source)
+        if not match or match.group(1) >= get_partition(now):
+            return False
+        if list(db.query('SELECT id FROM "%s" LIMIT 1' % source)):
+            return False
+
+        # Drops the search trigger too.
+        db[source].drop()
+        self.index.remove_source(db, source)
+        self.targets.pop(source, None)
+        return True
+
+    def maintain(self, db, vacuum_pages=1000):
+        '''
+        Do a bit of the upkeep needed after removing messages: merge search index segments,
+        return at most vacuum_pages free pages to the file system and update query planner statistics.
+        '''
+        self.index.merge(db)
+
+        # Databases created before incremental auto vacuum was enabled need a full VACUUM first.
+        if list(db.query('PRAGMA auto_vacuum'))[0]['auto_vacuum'] == 2:
+            # The statement frees a page per step, executescript steps it to the end.
+            connection = db.engine.raw_connection()
+            try:
+                connection.executescript('PRAGMA incremental_vacuum(%i);' % vacuum_pages)
+            finally:
+                connection.close()
+
+        # Runs ANALYZE on the tables which need it.
+        db.query('PRAGMA optimize')
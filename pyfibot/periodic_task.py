@@ -1,32 +1,56 @@
 import sys
+import asyncio
 
 
 # https://mail.python.org/pipermail/python-list/2013-November/661060.html
 # https://mail.python.org/pipermail/python-list/2013-November/661061.html
 class PeriodicTask(object):
-    def __init__(self, func, interval, bot):
+    ''' Runs func every interval seconds in executor, the BoundedExecutor of its plugin, without overlapping runs. '''
+    def __init__(self, func, interval, bot, executor):
         self._func = func
         self._interval = interval
         self._bot = bot
+        self._executor = executor
         self._loop = self._bot.core.loop
+        self._stopped = False
         self._set()
 
     @property
     def log(self):
-        return self._bot.core.logger.getChild(self.__class__.__name__)
+        return self._bot.log.getChild(self.__class__.__name__)
 
-    def _set(self):
-        self._handler = self._loop.call_later(
-            self._interval,
-            self._bot.core.loop.run_in_executor, None, self._run
-        )
+    def _set(self, *args):
+        if self._stopped:
+            return
+        self._handler = self._loop.call_later(self._interval, self._start)
+
+    def _start(self):
+        # The next run is scheduled only after this one is done, or rejected by the overloaded executor.
+        run = self._run_coroutine if asyncio.iscoroutinefunction(self._func) else self._run
+        self._executor.submit(run, on_rejected=self._rejected)
+
+    def _rejected(self):
+        self.log.warning('Plugin is busy, skipped running task.')
+        self._set()
 
     def _run(self):
         try:
             self._func()
         except:
             self.log.error('Error running task.', exc_info=sys.exc_info())
-        self._set()
+        finally:
+            self._loop.call_soon_threadsafe(self._set)
+
+    async def _run_coroutine(self):
+        try:
+            await self._func()
+        except asyncio.CancelledError:
+            raise
+        except:
+            self.log.error('Error running task.', exc_info=sys.exc_info())
+        finally:
+            self._set()
 
     def stop(self):
+        self._stopped = True
         self._handler.cancel()
@@ -1,17 +1,22 @@
 import os
+import re
 import sys
+import asyncio
 import logging
 from inspect import getmembers, isclass, ismethod
 from pluginbase import PluginBase
 from pyfibot.periodic_task import PeriodicTask
+from pyfibot.executor import BoundedExecutor
 
 
 class Plugin(object):
     def __init__(self, bot):
         self.name = self.__class__.__name__
         self.bot = bot
-        self.init()
+        # Set before init, so plugins can add their own tasks there.
         self._periodic_tasks = []
+        self.executor = BoundedExecutor.from_configuration(bot.core.loop, self.name, self.config, on_busy=bot.respond_busy)
+        self.init()
         self.__discover_methods()
         self.log.info('Loaded plugin "%s".' % self.name)
 
@@ -45,7 +50,7 @@ class Plugin(object):
                 continue
 
             if getattr(func, '_is_interval', False) is True:
-                self._periodic_tasks.append(PeriodicTask(func, func._interval, self.bot))
+                self._periodic_tasks.append(PeriodicTask(func, func._interval, self.bot, self.executor))
                 continue
 
             if getattr(func, '_is_handler', False) is True:
@@ -86,6 +91,10 @@ class Plugin(object):
     def teardown(self):
         pass
 
+    def get_stats(self):
+        ''' Get runtime statistics of the plugin, shown to admins in a section named after the plugin. '''
+        return None
+
     @property
     def config(self):
         return self.bot.core.configuration.get('plugin', {}).get(self.name.lower(), {})
@@ -98,17 +107,18 @@ class Plugin(object):
             @command('echo')
             def echo(bot, sender, message, raw_message):
                 bot.respond(message, raw_message)
+
+        Commands can also be coroutines, in which case they are run on the event loop:
+
+            @command('echo')
+            async def echo(bot, sender, message, raw_message):
+                bot.respond(message, raw_message)
         '''
         def __init__(self, command_name):
             self.command_name = command_name
 
         def __call__(self, func):
-            def command_wrapper(bot, sender, message, raw_message):
-                try:
-                    return func(bot, sender, message, raw_message)
-                except:
-                    bot.log.error('Error running command "%s".' % self.command_name, exc_info=sys.exc_info())
-
+            command_wrapper = wrap_callback(func, 'Error running command "%s".' % self.command_name)
             command_wrapper._command = self.command_name
             command_wrapper._is_command = True
             command_wrapper.__doc__ = func.__doc__
@@ -126,12 +136,7 @@ class Plugin(object):
             self.command_name = command_name
 
         def __call__(self, func):
-            def command_wrapper(bot, sender, message, raw_message):
-                try:
-                    return func(bot, sender, message, raw_message)
-                except:
-                    bot.log.error('Error running command "%s".' % self.command_name, exc_info=sys.exc_info())
-
+            command_wrapper = wrap_callback(func, 'Error running command "%s".' % self.command_name)
             command_wrapper._command = self.command_name
             command_wrapper._is_command = True
             command_wrapper._is_admin_command = True
@@ -142,18 +147,29 @@ class Plugin(object):
         '''
         Decorator to build listener listening all messages sent to the bot.
 
-        @listener
+        @listener()
         def print_all(bot, sender, message, raw_message):
             print(sender, message)
+
+        Listener can be limited to messages matching a regex `pattern` or containing any of the `keywords`,
+        in any case. Messages not passing the prefilter are not passed to the listener at all:
+
+        @listener(keywords=['://'])
+        def print_urls(bot, sender, message, raw_message):
+            print(sender, message)
         '''
-        def __call__(self, func):
-            def listener_wrapper(bot, sender, message, raw_message):
-                try:
-                    return func(bot, sender, message, raw_message)
-                except:
-                    bot.log.error('Error running listener.', exc_info=sys.exc_info())
+        def __init__(self, pattern=None, keywords=None):
+            # Kept apart, joining a pattern with global flags or backreferences to others would break it.
+            self.prefilters = []
+            if keywords:
+                self.prefilters.append('(?i:%s)' % '|'.join(re.escape(keyword) for keyword in keywords))
+            if pattern:
+                self.prefilters.append(pattern)
 
+        def __call__(self, func):
+            listener_wrapper = wrap_callback(func, 'Error running listener.')
             listener_wrapper._is_listener = True
+            listener_wrapper._prefilters = self.prefilters
             return listener_wrapper
 
     class handler(object):
@@ -164,17 +180,16 @@ class Plugin(object):
             self.message = message
 
         def __call__(self, func):
-            def handler_wrapper(bot, raw_message):
-                try:
-                    return func(bot, raw_message)
-                except:
-                    bot.log.error('Error running handler.', exc_info=sys.exc_info())
-
+            handler_wrapper = wrap_callback(func, 'Error running handler.')
             handler_wrapper._message = self.message
             handler_wrapper._is_handler = True
             return handler_wrapper
 
     class interval(object):
+        '''
+        Decorator to build functions run periodically, every `interval` seconds.
+        The function can either be a regular function or a coroutine.
+        '''
         def __init__(self, interval, run_on_init=False):
             self.interval = int(interval)
             self.run_on_init = run_on_init
@@ -184,3 +199,26 @@ class Plugin(object):
             func._interval = self.interval
             func._run_on_init = self.run_on_init
             return func
+
+
+def wrap_callback(func, error_message):
+    '''
+    Wrap plugin callback to log exceptions instead of raising them.
+    Coroutine functions are wrapped to coroutine functions, so the bot knows to run them on the event loop.
+    '''
+    if asyncio.iscoroutinefunction(func):
+        async def coroutine_wrapper(plugin, *args):
+            try:
+                return await func(plugin, *args)
+            except asyncio.CancelledError:
+                raise
+            except:
+                plugin.log.error(error_message, exc_info=sys.exc_info())
+        return coroutine_wrapper
+
+    def wrapper(plugin, *args):
+        try:
+            return func(plugin, *args)
+        except:
+            plugin.log.error(error_message, exc_info=sys.exc_info())
+    return wrapper
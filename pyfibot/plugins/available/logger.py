@@ -1,23 +1,283 @@
+import time
+import threading
+from datetime import timedelta
+from collections import OrderedDict
 from slugify import slugify
+from dateutil.tz import tzutc
 from pyfibot.plugin import Plugin
-from pyfibot.utils import get_utc_datetime
+from pyfibot.periodic_task import PeriodicTask
+from pyfibot.utils import get_utc_datetime, parse_datetime, get_relative_time_string
 from pyfibot.database import Database
+from pyfibot.log_index import LogIndex
+from pyfibot.log_retention import LogRetention, get_partition
 
 
 class Logger(Plugin):
+    '''
+    Logs all channel messages to the database, to a table per channel.
+
+    Messages are buffered and written in one transaction every `flush_interval` seconds, or as soon
+    as `flush_rows` messages are buffered, and when the plugin is unloaded. If writing fails,
+    the messages are kept for the next flush, up to `max_buffered` messages.
+
+    The logs are indexed for the search and seen commands, see LogIndex. Messages logged before
+    the index existed are indexed `backfill_rows` at a time, every `backfill_interval` seconds.
+
+    Messages are kept for `retention_days`, which can be set for each bot and channel,
+    or forever if it's not set. Every `retention_interval` seconds, at most `retention_rows`
+    expired messages are removed from each table, or moved to the log-archive database with `archive`.
+    With `partition: monthly`, each month is logged to a table of its own, which is dropped once emptied.
+    When nothing has been logged for `quiet_time` seconds, the database upkeep in LogRetention.maintain
+    is done, at most every `maintenance_interval` seconds.
+    '''
+    def init(self):
+        self.flush_interval = float(self.config.get('flush_interval', 1))
+        self.flush_rows = int(self.config.get('flush_rows', 100))
+        self.max_buffered = int(self.config.get('max_buffered', 10000))
+
+        # Tuples (target, row) not written yet.
+        self.buffer = []
+        self.buffer_lock = threading.Lock()
+        # Only one flush writes at a time, so rows are written in order.
+        self.flush_lock = threading.Lock()
+        # Table handles by target.
+        self.tables = {}
+
+        self.written = 0
+        self.flushes = 0
+        self.dropped = 0
+        self.flush_latency = None
+        self.max_flush_latency = 0
+
+        self.prefix = slugify('log-%s' % self.bot.name) + '-'
+        self.partition = self.config.get('partition')
+
+        self.index = LogIndex(self.bot.name)
+        self.backfill_rows = int(self.config.get('backfill_rows', 1000))
+        self.backfilled = 0
+        self.backfill_done = False
+        # Tables from before the plugin was loaded are added to the index by the first backfill.
+        self.sources_added = False
+        self.searches = 0
+
+        self.retention = LogRetention(self.index, self.prefix, int(self.config.get('retention_rows', 1000)))
+        self.archive = bool(self.config.get('archive', False))
+        self.quiet_time = float(self.config.get('quiet_time', 300))
+        self.maintenance_interval = float(self.config.get('maintenance_interval', 3600))
+        self.vacuum_pages = int(self.config.get('vacuum_pages', 1000))
+        self.last_logged = time.monotonic()
+        self.last_maintenance = None
+        self.pruned = 0
+        self.partitions_dropped = 0
+        self.maintenances = 0
+
+        self._periodic_tasks.append(PeriodicTask(self.flush, self.flush_interval, self.bot, self.executor))
+        self._periodic_tasks.append(PeriodicTask(self.backfill, float(self.config.get('backfill_interval', 1)), self.bot, self.executor))
+        self._periodic_tasks.append(PeriodicTask(self.retain, float(self.config.get('retention_interval', 10)), self.bot, self.executor))
+
+    def teardown(self):
+        self.flush()
+
+    def get_stats(self):
+        return {
+            'buffered': len(self.buffer),
+            'written': self.written,
+            'flushes': self.flushes,
+            'dropped': self.dropped,
+            'flush_latency': '%.1fms' % (self.flush_latency * 1000) if self.flush_latency is not None else '-',
+            'max_flush_latency': '%.1fms' % (self.max_flush_latency * 1000),
+            'backfilled': '%i%s' % (self.backfilled, '' if self.backfill_done else ' (in progress)'),
+            'searches': self.searches,
+            'pruned': self.pruned,
+            'partitions_dropped': self.partitions_dropped,
+            'maintenances': self.maintenances,
+        }
+
+    # A coroutine, as buffering the message is quicker than passing it to the executor.
     @Plugin.listener()
-    def save_message(self, sender, message, raw_message):
+    async def save_message(self, sender, message, raw_message):
         ''' Log all messages to database. '''
         target = raw_message.get('target')
         # Don't save, if target is not defined or this is a private message.
-        if not target or target == self.bot.nickname:
+        if not target or self.bot.is_own_nick(target):
             return
 
-        with Database(self.bot) as db:
-            table = db[slugify('log-%s-%s' % (self.bot.name, target))]
-            table.insert({
+        self.last_logged = time.monotonic()
+        with self.buffer_lock:
+            self.buffer.append((target, {
                 'time': get_utc_datetime(),
                 'sender': sender,
-                'target': raw_message.get('target', 'unknown'),
+                'target': target,
                 'message': message,
-            })
+            }))
+            buffered = len(self.buffer)
+
+        if buffered % self.flush_rows == 0:
+            self.executor.submit(self.flush)
+
+    def get_table(self, db, target, partition=None):
+        table = self.tables.get((target, partition))
+        if table is None:
+            name = 'log-%s-%s' % (self.bot.name, target)
+            if partition:
+                name += '-%s' % partition
+            table = db[slugify(name)]
+            # Create the columns before the first insert, so the search trigger gets the first rows too.
+            table.create_column('time', db.types.datetime)
+            for column in ('sender', 'target', 'message'):
+                table.create_column(column, db.types.text)
+            if self.index.add_source(db, table.name):
+                self.backfill_done = False
+            self.tables[(target, partition)] = table
+        return table
+
+    def flush(self):
+        ''' Write buffered messages to the database in one transaction. '''
+        with self.flush_lock:
+            with self.buffer_lock:
+                rows, self.buffer = self.buffer, []
+            if not rows:
+                return
+
+            rows_by_table = OrderedDict()
+            for target, row in rows:
+                partition = get_partition(row['time']) if self.partition == 'monthly' else None
+                rows_by_table.setdefault((target, partition), []).append(row)
+
+            started = time.monotonic()
+            try:
+                with Database(self.bot) as db:
+                    # New tables are created before the transaction, as dataset warns about schema changes in one.
+                    tables = [
+                        (self.get_table(db, target, partition), table_rows)
+                        for (target, partition), table_rows in rows_by_table.items()
+                    ]
+                    with db:
+                        for table, table_rows in tables:
+                            table.insert_many(table_rows)
+            except Exception:
+                self.log.error('Failed to write %i messages.' % len(rows), exc_info=True)
+                self._requeue(rows)
+                return
+
+            self.flush_latency = time.monotonic() - started
+            self.max_flush_latency = max(self.max_flush_latency, self.flush_latency)
+            self.flushes += 1
+            self.written += len(rows)
+
+    def _requeue(self, rows):
+        ''' Put rows failed to write back to the start of the buffer, dropping the oldest if it gets too long. '''
+        with self.buffer_lock:
+            self.buffer = rows + self.buffer
+            overflow = len(self.buffer) - self.max_buffered
+            if overflow > 0:
+                del self.buffer[:overflow]
+                self.dropped += overflow
+
+    def backfill(self):
+        ''' Index a chunk of the messages logged before the index existed. '''
+        if self.backfill_done:
+            return
+        with Database(self.bot) as db:
+            with db:
+                if not self.sources_added:
+                    self.index.add_sources(db, self.prefix)
+                    self.sources_added = True
+                indexed = self.index.backfill(db, self.backfill_rows)
+            self.backfilled += indexed
+            # Set while holding the database, as flush() clears it for tables it adds with rows to backfill.
+            if not indexed:
+                self.backfill_done = True
+        if not indexed:
+            self.log.info('Indexed %i old messages for search.' % self.backfilled)
+
+    def get_retention_days(self, target):
+        ''' Get days to keep messages logged on target for, None to keep them forever. '''
+        bot_config = self.config.get('retention', {}).get(self.bot.name, {})
+        days = bot_config.get('retention_days', self.config.get('retention_days'))
+        for channel, channel_days in bot_config.get('channels', {}).items():
+            if channel.lower() == target.lower():
+                days = channel_days
+        return days or None
+
+    def retain(self):
+        ''' Remove a batch of expired messages from each log table, and do database upkeep when the channels are quiet. '''
+        now = get_utc_datetime()
+        with Database(self.bot) as db:
+            sources = self.retention.get_sources(db)
+
+        # A transaction per table, to let flushes through in between.
+        for source in sources:
+            with Database(self.bot) as db:
+                with db:
+                    target = self.retention.get_target(db, source)
+                    days = self.get_retention_days(target) if target else None
+                    if days:
+                        self.pruned += self.prune(db, source, now - timedelta(days=float(days)))
+                # Outside the transaction, as dataset warns about schema changes in one.
+                if self.retention.drop_partition(db, source, now):
+                    self.tables = {key: table for key, table in self.tables.items() if table.name != source}
+                    self.partitions_dropped += 1
+
+        quiet = time.monotonic() - self.last_logged >= self.quiet_time
+        due = self.last_maintenance is None or time.monotonic() - self.last_maintenance >= self.maintenance_interval
+        if quiet and due:
+            with Database(self.bot) as db:
+                self.retention.maintain(db, self.vacuum_pages)
+            self.last_maintenance = time.monotonic()
+            self.maintenances += 1
+
+    def prune(self, db, source, cutoff):
+        if not self.archive:
+            return self.retention.prune(db, source, cutoff)
+        with Database(self.bot, 'log-archive') as archive:
+            return self.retention.prune(db, source, cutoff, archive)
+
+    def get_channel(self, raw_message):
+        ''' Get the channel the command was sent to, None for private messages. '''
+        target = raw_message.get('target')
+        if not target or self.bot.is_own_nick(target):
+            return None
+        return target
+
+    @Plugin.command('search')
+    def command_search(self, sender, message, raw_message):
+        ''' Search messages of the channel: .search <words>, word* matches the start of words. '''
+        channel = self.get_channel(raw_message)
+        if not channel:
+            return self.bot.respond('Search only works on channels.', raw_message)
+        if not message.strip():
+            return self.bot.respond('Usage: .search <words>', raw_message)
+
+        # Include messages not written yet.
+        self.flush()
+        self.searches += 1
+        with Database(self.bot) as db:
+            rows = self.index.search(db, message, target=channel)
+        if not rows:
+            return self.bot.respond('Nothing found.', raw_message)
+        self.bot.respond(' | '.join('%s <%s> %s' % (row['time'][:16], row['sender'], row['message']) for row in rows), raw_message)
+
+    @Plugin.command('seen')
+    def command_seen(self, sender, message, raw_message):
+        ''' Tell when nick last said something on the channel: .seen <nick> '''
+        channel = self.get_channel(raw_message)
+        nick = message.strip()
+        if not channel:
+            return self.bot.respond('Seen only works on channels.', raw_message)
+        if not nick:
+            return self.bot.respond('Usage: .seen <nick>', raw_message)
+
+        self.flush()
+        self.searches += 1
+        with Database(self.bot) as db:
+            row = self.index.seen(db, nick, target=channel)
+        if not row:
+            return self.bot.respond('%s has not been seen here.' % nick, raw_message)
+
+        seen = parse_datetime(row['time'])
+        if seen.tzinfo is None:
+            seen = seen.replace(tzinfo=tzutc())
+        self.bot.respond('%s was last seen %s: %s' % (
+            row['sender'], get_relative_time_string(seen) or 'just now', row['message']
+        ), raw_message)
@@ -5,7 +5,7 @@ from pyfibot.utils import get_timezone_datetime, parse_datetime
 
 class Skinfo(Plugin):
     def _fetch_restaurant(self, restaurant):
-        json = URL.get_json('http://skinfo.dy.fi/api/complete.json')
+        json = URL.get_json('http://skinfo.dy.fi/api/complete.json', cache_ttl=600)
         if not json:
             return 'Skinfo alhaalla?'
 
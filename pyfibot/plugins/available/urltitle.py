@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from pyfibot.url import URL
 from pyfibot.plugin import Plugin
 
@@ -6,22 +8,66 @@ class URLtitle(Plugin):
     def init(self):
         URL.discover_handlers()
         self.check_reduntant = self.config.get('check_reduntant', False)
+        # Messages with more urls than this are ignored.
+        self.max_urls = self.config.get('max_urls', 3)
+        # Titles sent per message, in the order the urls are in the message.
+        self.titles_per_message = self.config.get('titles_per_message', 1)
+        # Seconds to wait for all titles of a message, titles found after it are only cached.
+        self.timeout = self.config.get('timeout', 15)
+        # Titles are fetched in threads, unless the url has a coroutine handler, as handlers and youtube-dl block.
+        self.title_executor = ThreadPoolExecutor(max_workers=self.config.get('title_threads', 8), thread_name_prefix='urltitle')
 
-    @Plugin.listener()
-    def print_titles(self, sender, message, raw_message):
+    def teardown(self):
+        self.title_executor.shutdown(wait=False)
+
+    def get_stats(self):
+        return {
+            'title_cache': URL.title_cache.get_stats(),
+            'response_cache': URL.response_cache.get_stats(),
+            'domains': URL.http.breaker.get_stats(),
+            'video_info': URL.get_video_extractor().get_stats(),
+            'titles_in_flight': {
+                'calls': URL.title_flight.calls + URL.title_flight_async.calls,
+                'coalesced': URL.title_flight.coalesced + URL.title_flight_async.coalesced,
+            },
+            'json_in_flight': {
+                'calls': URL.json_flight.calls + URL.json_flight_async.calls,
+                'coalesced': URL.json_flight.coalesced + URL.json_flight_async.coalesced,
+            },
+        }
+
+    async def get_titles(self, urls):
+        ''' Get titles for urls concurrently, None for the ones not found before the timeout. '''
+        loop = self.bot.core.loop
+        futures = [
+            loop.create_task(url.get_title_async(self.bot, check_reduntant=self.check_reduntant, executor=self.title_executor))
+            for url in urls
+        ]
+        done, pending = await asyncio.wait(futures, timeout=self.timeout)
+        if pending:
+            self.log.debug('Titles for %i urls not found in time.' % len(pending))
+
+        titles = []
+        for url, future in zip(urls, futures):
+            if future in done and future.exception():
+                self.log.error('Failed to get title for %s.' % url.url, exc_info=future.exception())
+            titles.append(future.result() if future in done and not future.exception() else None)
+        return titles
+
+    @Plugin.listener(keywords=['://', 'www.'])
+    async def print_titles(self, sender, message, raw_message):
         urls = URL.get_urls(message)
-        if not urls or len(urls) > 3:
+        if not urls or len(urls) > self.max_urls:
             # Do nothing, if urls are not found or number of urls is large.
             return
 
-        for url in urls:
-            title = url.get_title(self.bot, check_reduntant=self.check_reduntant)
-
-            if title is False:
-                self.log.debug('Title returned as False -> not printing.')
-                return
+        results = await self.get_titles(urls)
+        if False in results:
+            self.log.debug('Title returned as False -> not printing.')
 
-            if isinstance(title, str):
-                return self.bot.respond('Title: %s' % title, raw_message)
+        titles = [title for title in results if isinstance(title, str) and title]
+        for title in titles[:self.titles_per_message]:
+            self.bot.respond('Title: %s' % title, raw_message)
 
-        return self.bot.respond('Detected %i urls.' % len(urls), raw_message)
+        if not titles and False not in results:
+            self.bot.respond('Detected %i urls.' % len(urls), raw_message)
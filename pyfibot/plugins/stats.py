@@ -0,0 +1,24 @@
+from pyfibot.plugin import Plugin
+
+
+class Stats(Plugin):
+    def format_stats(self, stats):
+        parts = []
+        for key, value in stats.items():
+            if isinstance(value, dict):
+                parts.append('%s (%s)' % (key, self.format_stats(value)))
+            else:
+                parts.append('%s=%s' % (key, value))
+        return ', '.join(parts)
+
+    @Plugin.admin_command('stats')
+    def stats(self, sender, message, raw_message):
+        ''' Show runtime statistics of the bot. Usage: stats [section]. Only for admins. '''
+        stats = self.bot.get_stats()
+        if message and message not in stats.keys():
+            return self.bot.respond('Unknown section "%s". Available sections are: %s' % (message, ', '.join(stats.keys())), raw_message)
+
+        for section, section_stats in stats.items():
+            if message and section != message:
+                continue
+            self.bot.respond('%s: %s' % (section, self.format_stats(section_stats)), raw_message)
@@ -0,0 +1,169 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class CircuitOpenError(Exception):
+    ''' Raised when requests to a domain are skipped, because it has failed too many times. '''
+
+
+class DomainBusyError(Exception):
+    ''' Raised when there are already too many requests in progress to a domain. '''
+
+
+class DomainState(object):
+    ''' Request statistics and circuit state of a domain. '''
+    __slots__ = ('semaphore', 'active', 'failures', 'opened_at', 'trial', 'requests', 'errors', 'rejected', 'latency')
+
+    def __init__(self, max_requests):
+        self.semaphore = threading.BoundedSemaphore(max_requests)
+        self.active = 0
+        # Consecutive failures, the circuit opens when they reach the threshold.
+        self.failures = 0
+        self.opened_at = None
+        # Whether a request is trying if the domain works again after the cool-down.
+        self.trial = False
+
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        # Moving average of the response time in seconds.
+        self.latency = None
+
+
+class CircuitBreaker(object):
+    '''
+    Keeps track of requests per domain, limiting them to `max_requests` at once.
+
+    After `failure_threshold` consecutive failures (connection errors, timeouts and 5xx responses),
+    the circuit of the domain opens and requests to it are rejected for `cooldown` seconds.
+    After that one request is let through to try it: if it succeeds the circuit closes again,
+    otherwise it stays open for another cool-down.
+    '''
+    # Weight of the latest response time in the moving average.
+    LATENCY_WEIGHT = 0.2
+
+    def __init__(self, max_requests=4, failure_threshold=5, cooldown=60, max_domains=1024, clock=time.monotonic):
+        self.max_requests = max(1, int(max_requests))
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown = float(cooldown)
+        self.max_domains = max(1, int(max_domains))
+        self.clock = clock
+
+        self._domains = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_state(self, domain):
+        state = self._domains.get(domain)
+        if state is None:
+            state = self._domains[domain] = DomainState(self.max_requests)
+            self._prune(keep=domain)
+        self._domains.move_to_end(domain)
+        return state
+
+    def _prune(self, keep):
+        ''' Forget the least recently used domains other than keep, unless they're in use or their circuit is open. '''
+        if len(self._domains) <= self.max_domains:
+            return
+        for domain, state in list(self._domains.items()):
+            if len(self._domains) <= self.max_domains:
+                return
+            if domain != keep and not state.active and state.opened_at is None:
+                del self._domains[domain]
+
+    def check(self, domain):
+        ''' Check if a request to domain can be made, raising CircuitOpenError if not. '''
+        with self._lock:
+            state = self._get_state(domain)
+            if state.opened_at is None:
+                return state
+
+            if state.trial or self.clock() - state.opened_at < self.cooldown:
+                state.rejected += 1
+                raise CircuitOpenError('Skipping %s after %i failures.' % (domain, state.failures))
+            state.trial = True
+            return state
+
+    def acquire(self, domain, timeout=None, limit=True):
+        '''
+        Reserve a request to domain, to be released with release() once done.
+        Raises CircuitOpenError if the circuit is open, and DomainBusyError if the domain has
+        too many requests in progress for longer than timeout.
+        Without limit, requests are only counted, for clients limiting them per host themselves.
+        '''
+        state = self.check(domain)
+        if limit and not state.semaphore.acquire(timeout=timeout):
+            with self._lock:
+                state.rejected += 1
+                state.trial = False
+            raise DomainBusyError('Too many requests to %s in progress.' % domain)
+        with self._lock:
+            state.active += 1
+
+    def release(self, domain, latency, failed, limit=True):
+        ''' Release request reserved with acquire(), recording its result. '''
+        with self._lock:
+            state = self._get_state(domain)
+            state.active -= 1
+        if limit:
+            state.semaphore.release()
+        self.record(domain, latency, failed)
+
+    def record(self, domain, latency, failed):
+        ''' Record result of a request to domain. '''
+        with self._lock:
+            state = self._get_state(domain)
+            state.requests += 1
+            state.trial = False
+            if state.latency is None:
+                state.latency = latency
+            else:
+                state.latency += self.LATENCY_WEIGHT * (latency - state.latency)
+
+            if not failed:
+                state.failures = 0
+                state.opened_at = None
+                return
+
+            state.errors += 1
+            state.failures += 1
+            if state.failures >= self.failure_threshold:
+                state.opened_at = self.clock()
+
+    def get_open_circuits(self):
+        ''' Get domains with open circuits, and seconds until they are tried again. '''
+        now = self.clock()
+        with self._lock:
+            return OrderedDict(
+                (domain, max(0, self.cooldown - (now - state.opened_at)))
+                for domain, state in self._domains.items() if state.opened_at is not None
+            )
+
+    def get_stats(self):
+        with self._lock:
+            states = list(self._domains.values())
+        stats = {
+            'domains': len(states),
+            'requests': sum(state.requests for state in states),
+            'errors': sum(state.errors for state in states),
+            'rejected': sum(state.rejected for state in states),
+        }
+        open_circuits = self.get_open_circuits()
+        if open_circuits:
+            stats['open'] = ' '.join('%s(%.0fs)' % (domain, remaining) for domain, remaining in open_circuits.items())
+        return stats
+
+    def get_domain_stats(self, domain):
+        ''' Get statistics of a single domain, None if it's not known. '''
+        with self._lock:
+            state = self._domains.get(domain)
+            if state is None:
+                return None
+            return {
+                'state': 'closed' if state.opened_at is None else 'open',
+                'active': state.active,
+                'requests': state.requests,
+                'errors': state.errors,
+                'rejected': state.rejected,
+                'latency': '%.0fms' % (state.latency * 1000) if state.latency is not None else '-',
+            }
@@ -0,0 +1,171 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+# Query parameters only used for tracking, which don't change the page.
+TRACKING_PARAMETERS = {'fbclid', 'gclid', 'dclid', 'igshid', 'mc_cid', 'mc_eid', 'yclid', '_hsenc', '_hsmi', 'si'}
+
+
+def normalize_url(url):
+    '''
+    Normalize url for use as a cache key: drop scheme, 'www.' and tracking parameters (utm_* etc.)
+    and lowercase the domain, so links to the same page pasted from different places match.
+    '''
+    components = urlsplit(url)
+    netloc = components.netloc.lower()
+    if netloc.startswith('www.'):
+        netloc = netloc[4:]
+
+    query = [
+        (key, value)
+        for key, value in parse_qsl(components.query, keep_blank_values=True)
+        if not key.startswith('utm_') and key not in TRACKING_PARAMETERS
+    ]
+    return urlunsplit(('', netloc, components.path, urlencode(query), components.fragment)).lstrip('/')
+
+
+class TitleCache(object):
+    '''
+    Cache for URL titles, with least recently used entries evicted after `max_entries`.
+
+    Titles are kept for `ttl` seconds. Negative results (None when no title was found,
+    False when the url shouldn't get a title) are cached for `negative_ttl` seconds.
+    When `path` is given, entries are also stored in an SQLite database to survive restarts.
+
+    Thread-safe, as titles are fetched in executor threads.
+    '''
+    # Expired entries are removed from the database after this many writes.
+    PRUNE_INTERVAL = 1000
+
+    def __init__(self, ttl=3600, negative_ttl=300, max_entries=1024, path=None, clock=time.time):
+        self.ttl = float(ttl)
+        self.negative_ttl = float(negative_ttl)
+        self.max_entries = max(1, int(max_entries))
+        self.path = path
+        self.clock = clock
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._writes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if path:
+            self._open()
+
+    @classmethod
+    def from_configuration(cls, configuration, path=None):
+        return cls(
+            ttl=configuration.get('ttl', 3600),
+            negative_ttl=configuration.get('negative_ttl', 300),
+            max_entries=configuration.get('max_entries', 1024),
+            path=path,
+        )
+
+    @property
+    def log(self):
+        return logging.getLogger(self.__class__.__name__)
+
+    def _open(self):
+        try:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute('CREATE TABLE IF NOT EXISTS titles (key TEXT PRIMARY KEY, title TEXT, expires REAL)')
+            self._connection.execute('DELETE FROM titles WHERE expires < ?', (self.clock(),))
+            self._connection.commit()
+        except sqlite3.Error as e:
+            self.log.error('Failed to open title cache "%s": %s' % (self.path, e))
+            self._connection = None
+
+    def get(self, url):
+        ''' Get cached title for url. Returns tuple (found, title). '''
+        key = normalize_url(url)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+
+            entry = self._get_disk(key, now)
+            if entry:
+                self._set_memory(key, entry)
+                self.disk_hits += 1
+                return True, entry[1]
+
+            self._entries.pop(key, None)
+            self.misses += 1
+            return False, None
+
+    def set(self, url, title):
+        ''' Cache title for url. '''
+        key = normalize_url(url)
+        ttl = self.ttl if title else self.negative_ttl
+        entry = (self.clock() + ttl, title)
+        with self._lock:
+            self._set_memory(key, entry)
+            self._set_disk(key, entry)
+
+    def _set_memory(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get_disk(self, key, now):
+        if not self._connection:
+            return None
+        try:
+            row = self._connection.execute('SELECT expires, title FROM titles WHERE key = ? AND expires > ?', (key, now)).fetchone()
+        except sqlite3.Error as e:
+            self.log.warning('Failed to read title cache: %s' % e)
+            return None
+        if not row:
+            return None
+        return row[0], json.loads(row[1])
+
+    def _set_disk(self, key, entry):
+        if not self._connection:
+            return
+        expires, title = entry
+        try:
+            self._connection.execute('INSERT OR REPLACE INTO titles (key, title, expires) VALUES (?, ?, ?)', (key, json.dumps(title), expires))
+            self._writes += 1
+            if self._writes % self.PRUNE_INTERVAL == 0:
+                self._connection.execute('DELETE FROM titles WHERE expires < ?', (self.clock(),))
+            self._connection.commit()
+        except sqlite3.Error as e:
+            self.log.warning('Failed to write title cache: %s' % e)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._connection:
+                self._connection.execute('DELETE FROM titles')
+                self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            if self._connection:
+                self._connection.close()
+                self._connection = None
+
+    def get_stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        stats = {
+            'entries': '%i/%i' % (len(self._entries), self.max_entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': '%.0f%%' % (100.0 * (self.hits + self.disk_hits) / lookups if lookups else 0),
+        }
+        if self.path:
+            stats['disk_hits'] = self.disk_hits
+        return stats
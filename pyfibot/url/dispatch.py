@@ -0,0 +1,127 @@
+import re
+from fnmatch import translate
+
+
+# Characters ending the literal domain prefix of a regex, like 'imdb\.com/...' -> 'imdb.com'.
+REGEX_SPECIAL = set('.^$*+?{}[]|()')
+
+
+def get_matcher_domains(matcher):
+    '''
+    Get domains the url matcher can match from its pattern, or None if they can't be known.
+
+    For patterns like 'github.com/*' and re.compile(r'imdb\\.com/title/...') the domain is
+    the literal start of the pattern. Patterns starting with '*.' match the subdomains of
+    the rest of the domain, returned with a leading dot: '*.example.com/*' -> '.example.com'.
+    '''
+    if isinstance(matcher, str):
+        domain = matcher.split('/', 1)[0]
+        if domain.startswith('*.'):
+            domain = domain[1:]
+        if not domain or any(character in domain for character in '*?[]'):
+            return None
+        if not domain.startswith('.') and '/' not in matcher:
+            # 'example.com*' could continue the domain.
+            return None
+        return [domain.lower()]
+
+    pattern = matcher.pattern
+    domain = []
+    index = 0
+    while index < len(pattern):
+        character = pattern[index]
+        if character == '\\' and index + 1 < len(pattern):
+            character = pattern[index + 1]
+            if character.isalnum():
+                # Escapes like \d or \S are character classes.
+                return None
+            index += 2
+            if character == '/':
+                break
+            domain.append(character)
+            continue
+        if character == '/':
+            break
+        if character in REGEX_SPECIAL:
+            return None
+        domain.append(character)
+        index += 1
+    else:
+        return None
+
+    if not domain or matcher.flags & re.IGNORECASE:
+        return None
+    return [''.join(domain).lower()]
+
+
+class HandlerIndex(object):
+    '''
+    Index of URL handlers by domain, so only the handlers for the domain of a url need to be matched.
+
+    Handlers are registered under their exact domains, or for matchers starting with '*.' under the parent
+    domain, which is looked up for all its subdomains. Handlers with unknown domains are tried for every url.
+    Candidates are tried in order of descending priority, and in registration order within the same priority.
+    '''
+    def __init__(self):
+        self.exact = {}
+        self.suffix = {}
+        self.generic = []
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def add(self, handler):
+        ''' Add handler built with the urlhandler decorator. '''
+        matcher = handler._url_matcher
+        if handler._is_regex:
+            compiled = matcher
+        else:
+            compiled = re.compile(translate(matcher))
+
+        # Sort key: highest priority first, then registration order.
+        entry = ((-handler._priority, self._count), compiled, handler)
+        self._count += 1
+
+        domains = handler._domains or get_matcher_domains(matcher)
+        if not domains:
+            self.generic.append(entry)
+            self.generic.sort(key=lambda entry: entry[0])
+            return
+
+        for domain in domains:
+            domain = domain.lower()
+            if domain.startswith('.'):
+                entries = self.suffix.setdefault(domain, [])
+            else:
+                entries = self.exact.setdefault(domain, [])
+            entries.append(entry)
+            entries.sort(key=lambda entry: entry[0])
+
+    def get_candidates(self, domain):
+        ''' Get handlers possibly matching urls on domain, in the order they should be tried. '''
+        domain = domain.lower()
+        sources = [self.exact.get(domain)]
+        # Walk up the domain for subdomain matchers: a.b.example.com -> .b.example.com, .example.com, .com
+        index = domain.find('.')
+        while index != -1:
+            sources.append(self.suffix.get(domain[index:]))
+            index = domain.find('.', index + 1)
+        sources.append(self.generic)
+
+        sources = [source for source in sources if source]
+        if len(sources) == 1:
+            return sources[0]
+        return sorted((entry for source in sources for entry in source), key=lambda entry: entry[0])
+
+    def find(self, clean_url):
+        '''
+        Find handler for url stripped of scheme and 'www.'.
+        Returns tuple (handler, match), match being None for fnmatch matchers, or (None, None) if no handler matches.
+        '''
+        domain = clean_url.split('/', 1)[0]
+        for _, compiled, handler in self.get_candidates(domain):
+            match = compiled.match(clean_url)
+            if match:
+                return handler, match if handler._is_regex else None
+        return None, None
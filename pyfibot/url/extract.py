@@ -0,0 +1,71 @@
+import re
+
+
+# http://stackoverflow.com/a/30408189, without the scheme, so it can also be used for 'www.' urls.
+# User info can't contain slashes, and hyphens in domain labels are matched without nested repetition,
+# which keeps the regex from backtracking exponentially on things like 'http://localhost'.
+URL_BODY = (
+    r'(?:[^\s/@]+(?::[^\s/@]*)?@)?(?:(?:[1-9]\d?|1\d\d|2[01]\d|22[0-3])' +
+    r'(?:\.(?:1?\d{1,2}|2[0-4]\d|25[0-5])){2}(?:\.(?:[1-9]\d?|1\d\d|2[0-4]\d|25[0-4]))|' +
+    r'(?:[a-z\u00a1-\uffff0-9]+(?:-[a-z\u00a1-\uffff0-9]+)*)(?:\.[a-z\u00a1-\uffff0-9]+' +
+    r'(?:-[a-z\u00a1-\uffff0-9]+)*)*(?:\.(?:[a-z\u00a1-\uffff]{2,})))(?::\d{2,5})?(?:/[^\s<>"]*)?'
+)
+URL_REGEX = re.compile(r'(?:(?:https?|ftp)://)' + URL_BODY, re.IGNORECASE)
+BARE_URL_REGEX = re.compile(URL_BODY, re.IGNORECASE)
+# Where urls can start, the full regex is only tried there.
+# 'www.' only starts a word, not 'foowww.', a path like 'example.com/www.foo' or an email address.
+URL_START_REGEX = re.compile(r'(?:https?|ftp)://|(?<![\w@./-])www\.', re.IGNORECASE)
+
+# Characters ending sentences rather than urls.
+TRAILING_PUNCTUATION = '.,;:!?\'"*'
+BRACKETS = {')': '(', ']': '[', '}': '{', '>': '<'}
+
+
+def has_urls(string):
+    ''' Cheap check if string can contain urls at all. '''
+    return '://' in string or 'www.' in string.lower()
+
+
+def trim_url(url):
+    '''
+    Strip punctuation from the end of url, along with closing brackets without opening ones in the url,
+    so '(see http://example.com/wiki/Foo_(bar)).' -> 'http://example.com/wiki/Foo_(bar)'.
+    '''
+    while url:
+        last = url[-1]
+        if last in TRAILING_PUNCTUATION:
+            url = url[:-1]
+        elif last in BRACKETS and url.count(last) > url.count(BRACKETS[last]):
+            url = url[:-1]
+        else:
+            break
+    return url
+
+
+def extract_urls(string):
+    ''' Get urls in string in the order they are in it, including duplicates. Urls starting with 'www.' get 'http://'. '''
+    if not has_urls(string):
+        return []
+
+    urls = []
+    position = 0
+    while True:
+        start = URL_START_REGEX.search(string, position)
+        if not start:
+            return urls
+
+        if start.group(0).lower() == 'www.':
+            match = BARE_URL_REGEX.match(string, start.start())
+            prefix = 'http://'
+        else:
+            match = URL_REGEX.match(string, start.start())
+            prefix = ''
+
+        if not match:
+            position = start.end()
+            continue
+
+        url = trim_url(match.group(0))
+        if url:
+            urls.append(prefix + url)
+        position = match.end()
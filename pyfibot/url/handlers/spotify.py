@@ -2,8 +2,8 @@ import re
 from pyfibot.url import URL, urlhandler
 
 
-@urlhandler(re.compile(r'((open|play)\.spotify\.com\/)(?P<item>album|artist|track|user[:\/]\S+[:\/]playlist)[:\/](?P<id>[a-zA-Z0-9]+)\/?.*'))
-def spotify(bot, url, match):
+@urlhandler(re.compile(r'((open|play)\.spotify\.com\/)(?P<item>album|artist|track|user[:\/]\S+[:\/]playlist)[:\/](?P<id>[a-zA-Z0-9]+)\/?.*'), domains=['open.spotify.com', 'play.spotify.com'])
+async def spotify(bot, url, match):
     spotify_id = match.group('id')
     item = match.group('item').replace(':', '/').split('/')
     item[0] += 's'
@@ -11,9 +11,9 @@ def spotify(bot, url, match):
         # All playlists seem to return 401 at the time, even the public ones
         return None
 
-    data = URL.get_json('https://api.spotify.com/v1/%s/%s' % ('/'.join(item), spotify_id))
+    data = await URL.get_json_async('https://api.spotify.com/v1/%s/%s' % ('/'.join(item), spotify_id))
     if not data:
-        bot.log.error('Failed to fetch Spotify ID "%s"' & spotify_id)
+        bot.log.error('Failed to fetch Spotify ID "%s"' % spotify_id)
         return
 
     title = '[Spotify] '
@@ -32,7 +32,7 @@ def spotify(bot, url, match):
         if genres_n > 0:
             genitive = 's' if genres_n > 1 else ''
             genres = data['genres'][0:4]
-            more = ' +%s more' % genres_n - 5 if genres_n > 4 else ''
+            more = ' +%s more' % (genres_n - 4) if genres_n > 4 else ''
 
             title += ' (Genre%s: %s%s)' % (genitive, ', '.join(genres), more)
 
@@ -1,11 +1,12 @@
 import re
+import asyncio
 from pyfibot.url import URL, urlhandler
 from datetime import timedelta
 from pyfibot.utils import get_utc_datetime, parse_datetime, get_duration_string, get_relative_time_string
 
 
 @urlhandler('areena.yle.fi/*')
-def yle_areena(bot, url):
+async def yle_areena(bot, url):
     """http://areena.yle.fi/*"""
     def _parse_publication_events(data):
         '''
@@ -76,14 +77,14 @@ def yle_areena(bot, url):
         secs += int(match_groups[9])
         return secs
 
-    def get_episode(identifier):
+    async def get_episode(identifier):
         ''' Gets episode information from Areena '''
         api_url = 'https://external.api.yle.fi/v1/programs/items/%s.json' % (identifier)
         params = {
             'app_id': bot.core_configuration.get('urltitle', {}).get('areena', {}).get('app_id', 'cd556936'),
             'app_key': bot.core_configuration.get('urltitle', {}).get('areena', {}).get('app_key', '25a08bbaa8101cca1bf0d1879bb13012'),
         }
-        data = URL.get_json(api_url, params=params)
+        data = await URL.get_json_async(api_url, params=params)
         if not data:
             return
 
@@ -120,7 +121,7 @@ def yle_areena(bot, url):
             title_data.append('not available')
         return '%s [%s]' % (title, ' - '.join(title_data))
 
-    def get_series(identifier):
+    async def get_series(identifier):
         ''' Gets series information from Areena '''
         api_url = 'https://external.api.yle.fi/v1/programs/items.json'
         params = {
@@ -130,10 +131,10 @@ def yle_areena(bot, url):
             'order': 'publication.starttime:desc',
             'availability': 'ondemand',
             'type': 'program',
-            'limit': 100,
+            'limit': '100',
         }
 
-        data = URL.get_json(api_url, params=params)
+        data = await URL.get_json_async(api_url, params=params)
         if not data:
             return
 
@@ -160,7 +161,7 @@ def yle_areena(bot, url):
 
     # There's still no endpoint to fetch the currently playing shows via API :(
     if 'suora' in url.url:
-        bs = URL.get_bs(url.url)
+        bs = await URL.get_bs_async(url.url)
         if not bs:
             return
         container = bs.find('div', {'class': 'selected'})
@@ -181,5 +182,6 @@ def yle_areena(bot, url):
         bot.log.debug('Areena identifier could not be found.')
         return
 
-    # Try to get the episode (preferred) or series information from Areena
-    return get_episode(identifier) or get_series(identifier)
+    # Try to get the episode (preferred) or series information from Areena, both at once.
+    episode, series = await asyncio.gather(get_episode(identifier), get_series(identifier))
+    return episode or series
@@ -0,0 +1,271 @@
+import time
+import asyncio
+import logging
+import threading
+import requests
+import urllib3
+import aiohttp
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from pyfibot.url.breaker import CircuitBreaker
+from pyfibot.url.response_cache import build_response
+
+
+# Fake user agent, as some sites don't respond well to bots...
+USER_AGENT = 'Mozilla/5.0 (Windows NT 6.1; WOW64; rv:43.0) Gecko/20100101 Firefox/43.0'
+# Bytes read at a time from async bodies with a size limit.
+CHUNK_SIZE = 65536
+
+
+def get_domain(url):
+    ''' Get domain of url, for limiting requests per domain. '''
+    try:
+        return (urlsplit(url).hostname or '').lower()
+    except ValueError:
+        return ''
+
+
+class ReservedResponse(requests.Response):
+    '''
+    Streamed response keeping its request to the domain reserved in the circuit breaker until the body
+    has been read or the response is closed, so slow bodies count towards the limit of requests per domain
+    and errors reading them count as failures.
+    '''
+    def reserve(self, breaker, domain, started, failed):
+        self._breaker = breaker
+        self._domain = domain
+        self._started = started
+        self._failed = failed
+        self._released = False
+        self._release_lock = threading.Lock()
+
+    def release(self, failed=False):
+        with self._release_lock:
+            if self._released:
+                return
+            self._released = True
+        self._breaker.release(self._domain, time.monotonic() - self._started, self._failed or failed)
+
+    def iter_content(self, *args, **kwargs):
+        # Reading content, text and json go through here too.
+        failed = False
+        try:
+            yield from super().iter_content(*args, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError):
+            failed = True
+            raise
+        finally:
+            self.release(failed)
+
+    def iter_content_until(self, chunk_size, deadline):
+        '''
+        Iterate the body in chunks of at most chunk_size bytes, stopping at monotonic time deadline. Every read takes
+        what has arrived, waiting at most until the deadline, so a server sending a byte now and then can't stretch it.
+        '''
+        sock = getattr(self.raw.connection, 'sock', None)
+        read_timeout = sock.gettimeout() if sock is not None else None
+        failed = False
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                # The connection is released once the whole body has been read. Otherwise cap the read at the
+                # deadline, urllib3 sets the read timeout again for the next request on the connection.
+                sock = getattr(self.raw.connection, 'sock', None)
+                if sock is not None:
+                    sock.settimeout(min(remaining, read_timeout or remaining))
+                chunk = self.raw.read1(chunk_size, decode_content=True)
+                if not chunk:
+                    return
+                yield chunk
+        except urllib3.exceptions.ReadTimeoutError as e:
+            # Reaching the deadline isn't a failure, the read timeout is.
+            if time.monotonic() < deadline:
+                failed = True
+                raise requests.exceptions.ConnectionError(e)
+        except urllib3.exceptions.HTTPError as e:
+            failed = True
+            raise requests.exceptions.ConnectionError(e)
+        finally:
+            self.release(failed)
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.release()
+
+    def __del__(self):
+        # Responses dropped without reading or closing them.
+        if not getattr(self, '_released', True):
+            self.release()
+
+
+class HTTPClient(object):
+    '''
+    Process-wide HTTP client, reusing connections between requests.
+
+    Synchronous requests go through a single requests session, keeping up to `max_connections_per_host`
+    keep-alive connections for each of `max_hosts` most recently used hosts. Coroutines use an aiohttp
+    session with the same limits, created on first use in the event loop. At most `max_connections`
+    requests are in flight at once, and every request has `connect_timeout` and `read_timeout` unless
+    the caller gives its own `timeout`.
+
+    Requests are also limited to `max_connections_per_host` per domain, and domains failing
+    `failure_threshold` times in a row are skipped for `cooldown` seconds, see CircuitBreaker.
+    Streamed responses hold their domain until read or closed, see ReservedResponse.
+    '''
+    def __init__(self, max_connections=32, max_connections_per_host=8, max_hosts=64, connect_timeout=5, read_timeout=15,
+                 user_agent=USER_AGENT, failure_threshold=5, cooldown=60):
+        self.max_connections = max(1, int(max_connections))
+        self.max_connections_per_host = max(1, int(max_connections_per_host))
+        self.max_hosts = max(1, int(max_hosts))
+        self.timeout = (float(connect_timeout), float(read_timeout))
+        self.user_agent = user_agent
+
+        self.breaker = CircuitBreaker(max_requests=self.max_connections_per_host, failure_threshold=failure_threshold, cooldown=cooldown)
+
+        self._semaphore = threading.BoundedSemaphore(self.max_connections)
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._async_session = None
+        self._async_loop = None
+
+    @classmethod
+    def from_configuration(cls, configuration):
+        return cls(
+            max_connections=configuration.get('max_connections', 32),
+            max_connections_per_host=configuration.get('max_connections_per_host', 8),
+            max_hosts=configuration.get('max_hosts', 64),
+            connect_timeout=configuration.get('connect_timeout', 5),
+            read_timeout=configuration.get('read_timeout', 15),
+            user_agent=configuration.get('user_agent', USER_AGENT),
+            failure_threshold=configuration.get('failure_threshold', 5),
+            cooldown=configuration.get('cooldown', 60),
+        )
+
+    @property
+    def log(self):
+        return logging.getLogger(self.__class__.__name__)
+
+    @property
+    def session(self):
+        ''' Get the shared requests session, creating it on first use. '''
+        with self._session_lock:
+            if self._session is None:
+                session = requests.Session()
+                session.headers.update({'User-Agent': self.user_agent})
+                adapter = HTTPAdapter(pool_connections=self.max_hosts, pool_maxsize=self.max_connections_per_host)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
+    def get(self, url, **kwargs):
+        '''
+        GET url, with the same arguments and exceptions as requests.get. The response is streamed by default,
+        and must be read or closed to release the domain for other requests.
+        Raises CircuitOpenError or DomainBusyError if the domain is skipped or has too many requests in progress.
+        '''
+        kwargs.setdefault('timeout', self.timeout)
+        kwargs.setdefault('stream', True)
+
+        domain = get_domain(url)
+        self.breaker.acquire(domain, timeout=self.timeout[0])
+        started = time.monotonic()
+        try:
+            with self._semaphore:
+                response = self.session.get(url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            self.breaker.release(domain, time.monotonic() - started, True)
+            raise
+        except:
+            self.breaker.release(domain, time.monotonic() - started, False)
+            raise
+
+        failed = response.status_code >= 500
+        if not kwargs['stream']:
+            self.breaker.release(domain, time.monotonic() - started, failed)
+            return response
+        response.__class__ = ReservedResponse
+        response.reserve(self.breaker, domain, started, failed)
+        return response
+
+    def get_async_session(self):
+        ''' Get the shared aiohttp session, to be called from the event loop. '''
+        if self._async_session is None or self._async_session.closed:
+            # The session can only be closed on this loop.
+            self._async_loop = asyncio.get_event_loop()
+            self._async_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_connections_per_host),
+                timeout=aiohttp.ClientTimeout(sock_connect=self.timeout[0], sock_read=self.timeout[1]),
+                headers={'User-Agent': self.user_agent},
+            )
+        return self._async_session
+
+    async def get_async(self, url, max_bytes=None, **kwargs):
+        '''
+        GET url with aiohttp, with the same arguments as aiohttp.ClientSession.get.
+        Returns requests response with the body already read, releasing the connection back to the pool,
+        or None if the body is larger than max_bytes, reading no more than that of it.
+        Raises CircuitOpenError if the domain is skipped; requests per domain are limited by aiohttp itself.
+        '''
+        domain = get_domain(url)
+        self.breaker.acquire(domain, limit=False)
+        started = time.monotonic()
+        failed = False
+        try:
+            async with self.get_async_session().get(url, **kwargs) as response:
+                failed = response.status >= 500
+                if max_bytes is None:
+                    return build_response(str(response.url), response.status, response.headers, await response.read())
+                if (response.content_length or 0) > max_bytes:
+                    return None
+                # Content-Length may be missing or wrong, stop reading once past max_bytes.
+                content = bytearray()
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    content += chunk
+                    if len(content) > max_bytes:
+                        return None
+                return build_response(str(response.url), response.status, response.headers, bytes(content))
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            failed = True
+            raise
+        finally:
+            self.breaker.release(domain, time.monotonic() - started, failed, limit=False)
+
+    def close(self):
+        ''' Close the synchronous session, dropping pooled connections. '''
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def close_later(self):
+        '''
+        Close both sessions from any thread, the aiohttp one on the event loop it was created on,
+        for replacing the client.
+        '''
+        self.close()
+        session, self._async_session = self._async_session, None
+        loop = self._async_loop
+        if session is None or session.closed or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            loop.create_task(session.close())
+        elif loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        else:
+            loop.run_until_complete(session.close())
+
+    async def close_async(self):
+        ''' Close both sessions, to be called from the event loop. '''
+        self.close()
+        if self._async_session is not None:
+            await self._async_session.close()
+            self._async_session = None
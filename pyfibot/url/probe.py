@@ -0,0 +1,138 @@
+import struct
+from urllib.parse import urlsplit
+from pyfibot.utils import get_size_string
+
+
+# Content types titled from their headers instead of their content.
+MEDIA_CONTENT_TYPES = ('image/', 'video/', 'audio/', 'application/pdf', 'application/zip', 'application/octet-stream')
+# File extensions of urls fetched with a ranged request, as they're likely to be large.
+MEDIA_EXTENSIONS = {
+    'jpg', 'jpeg', 'png', 'gif', 'webp', 'bmp', 'mp4', 'webm', 'mkv', 'mov', 'avi', 'mp3', 'ogg', 'flac', 'wav', 'pdf', 'zip'
+}
+# Bytes read from the start of media files, enough to find image dimensions even after EXIF data in most JPEGs.
+PROBE_BYTES = 64 * 1024
+
+
+def is_media(content_type):
+    ''' Check if content type (without parameters) is a media type titled by probe. '''
+    return content_type.lower().startswith(MEDIA_CONTENT_TYPES)
+
+
+def has_media_extension(url):
+    ''' Check if url looks like a link to a media file: 'http://example.com/cat.JPG' -> True. '''
+    filename = urlsplit(url).path.rpartition('/')[2]
+    _, dot, extension = filename.rpartition('.')
+    return bool(dot) and extension.lower() in MEDIA_EXTENSIONS
+
+
+def get_range_size(content_range):
+    ''' Get total size from Content-Range header value: 'bytes 0-65535/2411724' -> 2411724, None if it's unknown. '''
+    total = (content_range or '').rpartition('/')[2]
+    return int(total) if total.isdigit() else None
+
+
+def _get_png_size(data):
+    if data[12:16] == b'IHDR' and len(data) >= 24:
+        return struct.unpack('>II', data[16:24])
+
+
+def _get_gif_size(data):
+    if len(data) >= 10:
+        return struct.unpack('<HH', data[6:10])
+
+
+def _get_bmp_size(data):
+    if len(data) >= 26:
+        width, height = struct.unpack('<ii', data[18:26])
+        return width, abs(height)
+
+
+def _get_webp_size(data):
+    chunk = data[12:16]
+    if chunk == b'VP8 ' and len(data) >= 30:
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3fff, height & 0x3fff
+    if chunk == b'VP8L' and len(data) >= 25:
+        bits = struct.unpack('<I', data[21:25])[0]
+        return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+    if chunk == b'VP8X' and len(data) >= 30:
+        return (int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1)
+
+
+def _get_jpeg_size(data):
+    # Walk the markers until a start of frame, which has the dimensions.
+    position = 2
+    while position + 9 < len(data):
+        if data[position] != 0xff:
+            return None
+        marker = data[position + 1]
+        if marker == 0xff:
+            # Fill byte.
+            position += 1
+            continue
+        if marker in (0xd8, 0x01) or 0xd0 <= marker <= 0xd7:
+            position += 2
+            continue
+        if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+            height, width = struct.unpack('>HH', data[position + 5:position + 9])
+            return width, height
+        position += 2 + struct.unpack('>H', data[position + 2:position + 4])[0]
+    return None
+
+
+IMAGE_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', _get_png_size),
+    (b'GIF87a', _get_gif_size),
+    (b'GIF89a', _get_gif_size),
+    (b'\xff\xd8', _get_jpeg_size),
+    (b'BM', _get_bmp_size),
+]
+
+
+def get_image_size(data):
+    ''' Get (width, height) of PNG, GIF, JPEG, WebP or BMP image from the start of its data, None if it can't be read. '''
+    try:
+        if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+            return _get_webp_size(data)
+        for signature, get_size in IMAGE_SIGNATURES:
+            if data.startswith(signature):
+                return get_size(data)
+    except struct.error:
+        pass
+    return None
+
+
+def get_media_title(content_type, size=None, data=b''):
+    ''' Get title for media file: '[image/png 1920x1080, 2.3 MB]'. '''
+    content_type = content_type.split(';')[0].strip().lower()
+    description = content_type
+    if content_type.startswith('image/'):
+        dimensions = get_image_size(data)
+        if dimensions:
+            description += ' %ix%i' % dimensions
+    if size:
+        description += ', %s' % get_size_string(size)
+    return '[%s]' % description
+
+
+def read_media_title(response, max_bytes=PROBE_BYTES):
+    '''
+    Get title for media from streamed requests response, reading at most max_bytes of it.
+    The size is taken from Content-Range for ranged requests, Content-Length otherwise.
+    '''
+    content_type = response.headers.get('content-type', '')
+    if response.status_code == 206:
+        size = get_range_size(response.headers.get('content-range'))
+    else:
+        size = response.headers.get('content-length')
+
+    data = bytearray()
+    try:
+        if content_type.lower().startswith('image/'):
+            for chunk in response.iter_content(min(16384, max_bytes)):
+                data.extend(chunk)
+                if len(data) >= max_bytes or get_image_size(bytes(data)):
+                    break
+    finally:
+        response.close()
+    return get_media_title(content_type, int(size) if size and str(size).isdigit() else None, bytes(data))
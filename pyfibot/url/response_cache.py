@@ -0,0 +1,346 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+# Only complete, successful responses are stored.
+CACHEABLE_STATUS_CODES = {200, 203}
+# Headers not describing the stored content, which requests has already decoded.
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive', 'set-cookie'}
+
+
+def parse_cache_control(value):
+    ''' Parse Cache-Control header value to dict of lowercase directives, 'max-age=60, public' -> {'max-age': '60', 'public': None}. '''
+    directives = {}
+    for directive in (value or '').split(','):
+        key, _, argument = directive.partition('=')
+        key = key.strip().lower()
+        if key:
+            directives[key] = argument.strip().strip('"') if argument else None
+    return directives
+
+
+def parse_http_date(value):
+    ''' Parse HTTP date to timestamp, None if it's missing or invalid. '''
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def parse_seconds(value):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def get_freshness_lifetime(headers, now, heuristic_max=3600):
+    '''
+    Get seconds the response is fresh for after it was received, as in RFC 7234 section 4.2.
+    Returns None if the response must not be stored.
+    '''
+    cache_control = parse_cache_control(headers.get('cache-control'))
+    if 'no-store' in cache_control or headers.get('vary', '').strip() == '*':
+        return None
+    if 'no-cache' in cache_control:
+        return 0
+
+    date = parse_http_date(headers.get('date')) or now
+    age = parse_seconds(headers.get('age')) or 0
+
+    max_age = parse_seconds(cache_control.get('max-age'))
+    if max_age is not None:
+        return max(0, max_age - age)
+
+    expires = headers.get('expires')
+    if expires is not None:
+        # Invalid dates, like 0, mean already expired.
+        expires = parse_http_date(expires) or 0
+        return max(0, expires - date - age)
+
+    # Without explicit freshness, use 10% of the time since the last modification.
+    last_modified = parse_http_date(headers.get('last-modified'))
+    if last_modified is not None and last_modified < date:
+        return min(heuristic_max, (date - last_modified) / 10)
+    return 0
+
+
+def build_response(url, status_code, headers, content, from_cache=False):
+    ''' Build requests response with content already read, for responses not fetched with requests. '''
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response.reason = 'OK' if status_code < 400 else None
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = content
+    response._content_consumed = True
+    response.from_cache = from_cache
+    return response
+
+
+class CachedResponse(object):
+    ''' Stored response, with the validators for revalidating it once it's stale. '''
+    __slots__ = ('url', 'status_code', 'headers', 'content', 'expires', 'stored')
+
+    def __init__(self, url, status_code, headers, content, expires, stored):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.expires = expires
+        self.stored = stored
+
+    @property
+    def etag(self):
+        return self.headers.get('etag')
+
+    @property
+    def last_modified(self):
+        return self.headers.get('last-modified')
+
+    @property
+    def size(self):
+        return len(self.content)
+
+    def is_fresh(self, now):
+        return self.expires > now
+
+    def can_revalidate(self):
+        return bool(self.etag or self.last_modified)
+
+    def get_conditional_headers(self):
+        ''' Get headers for asking the server if the stored response is still valid. '''
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_response(self):
+        ''' Build requests response with the stored content, usable like a fetched one. '''
+        return build_response(self.url, self.status_code, self.headers, self.content, from_cache=True)
+
+
+class ResponseCache(object):
+    '''
+    HTTP response cache following the freshness rules of RFC 7234, for URL.get_url and the fetches built on it.
+
+    Responses are fresh for the time Cache-Control or Expires allow, or 10% of the time since Last-Modified
+    (at most `heuristic_max` seconds) without them. Stale responses with an ETag or Last-Modified are
+    revalidated with a conditional request instead of fetched again.
+
+    Up to `max_entries` responses and `max_bytes` of content are kept in memory, evicting the least recently
+    used ones. Larger responses than `max_entry_bytes` are not stored. When `path` is given, responses are
+    also stored in an SQLite database to survive restarts.
+
+    Thread-safe, as fetches are done in executor threads.
+    '''
+    # Entries stale for longer than STALE_KEEP seconds are removed from the database after this many writes.
+    PRUNE_INTERVAL = 500
+    STALE_KEEP = 7 * 24 * 3600
+
+    def __init__(self, max_entries=512, max_bytes=16 * 1024 * 1024, max_entry_bytes=1024 * 1024, heuristic_max=3600,
+                 path=None, clock=time.time):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self.max_entry_bytes = max(1, int(max_entry_bytes))
+        self.heuristic_max = float(heuristic_max)
+        self.path = path
+        self.clock = clock
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._connection = None
+        self._writes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.stale = 0
+        self.revalidated = 0
+        self.misses = 0
+
+        if path:
+            self._open()
+
+    @classmethod
+    def from_configuration(cls, configuration, path=None):
+        return cls(
+            max_entries=configuration.get('max_entries', 512),
+            max_bytes=configuration.get('max_bytes', 16 * 1024 * 1024),
+            max_entry_bytes=configuration.get('max_entry_bytes', 1024 * 1024),
+            heuristic_max=configuration.get('heuristic_max', 3600),
+            path=path,
+        )
+
+    @property
+    def log(self):
+        return logging.getLogger(self.__class__.__name__)
+
+    def _open(self):
+        try:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS responses '
+                '(key TEXT PRIMARY KEY, url TEXT, status INTEGER, headers TEXT, content BLOB, expires REAL, stored REAL)'
+            )
+            self._prune_disk()
+            self._connection.commit()
+        except sqlite3.Error as e:
+            self.log.error('Failed to open response cache "%s": %s' % (self.path, e))
+            self._connection = None
+
+    def get(self, key):
+        ''' Get stored response for key, fresh or not, None if there's none. '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+                return entry
+
+            entry = self._get_disk(key)
+            if entry:
+                self._set_memory(key, entry)
+            return entry
+
+    def get_fresh(self, key):
+        ''' Get stored response for key if it's fresh. Returns tuple (fresh response or None, stale entry to revalidate or None). '''
+        entry = self.get(key)
+        if entry is None:
+            self.misses += 1
+            return None, None
+        if entry.is_fresh(self.clock()):
+            self.hits += 1
+            return entry.to_response(), None
+        if entry.can_revalidate():
+            self.stale += 1
+            return None, entry
+        self.misses += 1
+        return None, None
+
+    def is_storable(self, response, ttl=None):
+        ''' Check if response can be stored, with ttl overriding the freshness given by its headers. '''
+        if response.status_code not in CACHEABLE_STATUS_CODES:
+            return False
+        if ttl is not None:
+            return ttl > 0
+        lifetime = get_freshness_lifetime(response.headers, self.clock(), self.heuristic_max)
+        if lifetime is None:
+            return False
+        return lifetime > 0 or bool(response.headers.get('etag') or response.headers.get('last-modified'))
+
+    def store(self, key, response, content, ttl=None):
+        ''' Store response with its already read content, with ttl overriding the freshness given by its headers. '''
+        if len(content) > self.max_entry_bytes:
+            return
+        now = self.clock()
+        headers = dict((k.lower(), v) for k, v in response.headers.items() if k.lower() not in DROPPED_HEADERS)
+        if ttl is None:
+            ttl = get_freshness_lifetime(headers, now, self.heuristic_max)
+            if ttl is None:
+                return
+        entry = CachedResponse(response.url, response.status_code, headers, content, now + ttl, now)
+        with self._lock:
+            self._set_memory(key, entry)
+            self._set_disk(key, entry)
+
+    def revalidated_entry(self, key, entry, response, ttl=None):
+        '''
+        Update stale entry after the server answered 304 Not Modified to a conditional request,
+        returning the stored response. The headers of the 304 response replace the stored ones.
+        '''
+        headers = dict(entry.headers)
+        headers.update((k.lower(), v) for k, v in response.headers.items() if k.lower() not in DROPPED_HEADERS)
+        now = self.clock()
+        if ttl is None:
+            ttl = get_freshness_lifetime(headers, now, self.heuristic_max) or 0
+        entry = CachedResponse(entry.url, entry.status_code, headers, entry.content, now + ttl, now)
+        with self._lock:
+            self._set_memory(key, entry)
+            self._set_disk(key, entry)
+        self.revalidated += 1
+        return entry.to_response()
+
+    def _set_memory(self, key, entry):
+        previous = self._entries.pop(key, None)
+        if previous:
+            self._bytes -= previous.size
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+
+    def _get_disk(self, key):
+        if not self._connection:
+            return None
+        try:
+            row = self._connection.execute(
+                'SELECT url, status, headers, content, expires, stored FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.log.warning('Failed to read response cache: %s' % e)
+            return None
+        if not row:
+            return None
+        self.disk_hits += 1
+        url, status, headers, content, expires, stored = row
+        return CachedResponse(url, status, json.loads(headers), bytes(content), expires, stored)
+
+    def _set_disk(self, key, entry):
+        if not self._connection:
+            return
+        try:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO responses (key, url, status, headers, content, expires, stored) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, entry.url, entry.status_code, json.dumps(entry.headers), entry.content, entry.expires, entry.stored)
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_INTERVAL == 0:
+                self._prune_disk()
+            self._connection.commit()
+        except sqlite3.Error as e:
+            self.log.warning('Failed to write response cache: %s' % e)
+
+    def _prune_disk(self):
+        self._connection.execute('DELETE FROM responses WHERE expires < ?', (self.clock() - self.STALE_KEEP,))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._connection:
+                self._connection.execute('DELETE FROM responses')
+                self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            if self._connection:
+                self._connection.close()
+                self._connection = None
+
+    def get_stats(self):
+        lookups = self.hits + self.stale + self.misses
+        stats = {
+            'entries': '%i/%i' % (len(self._entries), self.max_entries),
+            'size': '%ikB' % (self._bytes // 1024),
+            'hits': self.hits,
+            'revalidated': self.revalidated,
+            'misses': self.misses,
+            'hit_rate': '%.0f%%' % (100.0 * (self.hits + self.revalidated) / lookups if lookups else 0),
+        }
+        if self.path:
+            stats['disk_hits'] = self.disk_hits
+        return stats
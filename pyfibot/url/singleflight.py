@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import functools
+
+
+class SingleFlight(object):
+    '''
+    Shares one call among threads making it at the same time.
+
+    The first caller for a key runs the function. Callers arriving with the same key while it's
+    running wait for it and get the same result, or the same exception raised. Results are not
+    kept after the call has finished, caching them is up to the caller.
+    '''
+    class Call(object):
+        def __init__(self):
+            self.event = threading.Event()
+            self.result = None
+            self.exception = None
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, function, *args, **kwargs):
+        leader = False
+        with self._lock:
+            call = self._calls.get(key)
+            if call:
+                self.coalesced += 1
+            else:
+                call = self._calls[key] = self.Call()
+                self.calls += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.exception:
+                raise call.exception
+            return call.result
+
+        try:
+            call.result = function(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.exception = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def get_stats(self):
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+        }
+
+
+class AsyncSingleFlight(object):
+    ''' SingleFlight for coroutines, to be used from the event loop. '''
+    def __init__(self):
+        self._calls = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, function, *args, **kwargs):
+        future = self._calls.get(key)
+        if future:
+            self.coalesced += 1
+        else:
+            future = self._calls[key] = asyncio.ensure_future(function(*args, **kwargs))
+            future.add_done_callback(functools.partial(self._done, key))
+            self.calls += 1
+        # Don't let one waiter being cancelled cancel the call for everyone.
+        return await asyncio.shield(future)
+
+    def _done(self, key, future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
+
+    def get_stats(self):
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+        }
@@ -0,0 +1,172 @@
+import re
+import time
+import codecs
+from html.parser import HTMLParser
+
+
+# Content types titles are looked for in.
+HTML_CONTENT_TYPES = ['text/html', 'text/xml', 'application/xhtml+xml']
+# Bytes scanned for <meta charset>, like browsers do.
+CHARSET_PRESCAN_BYTES = 1024
+META_CHARSET_REGEX = re.compile(br'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_:.-]+)', re.IGNORECASE)
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+]
+
+
+def get_charset(content_type):
+    ''' Get charset from Content-Type header value. '''
+    for parameter in content_type.split(';')[1:]:
+        key, _, value = parameter.partition('=')
+        if key.strip().lower() == 'charset' and value.strip():
+            return value.strip().strip('"\'')
+    return None
+
+
+def sniff_charset(content):
+    ''' Get charset of HTML from byte order mark or <meta> in the start of the content. '''
+    for bom, charset in BOMS:
+        if content.startswith(bom):
+            return charset
+
+    match = META_CHARSET_REGEX.search(content[:CHARSET_PRESCAN_BYTES])
+    if match:
+        return match.group(1).decode('ascii')
+    return None
+
+
+def get_codec(charset):
+    ''' Get codec name for charset, None if Python doesn't know it. '''
+    try:
+        return codecs.lookup(charset).name
+    except (LookupError, TypeError):
+        return None
+
+
+class TitleParser(HTMLParser):
+    '''
+    Incremental HTML parser looking for <title>, og:title and the AJAX crawling fragment meta tag.
+    Parsing is done once both titles are found or the head of the document ends.
+    '''
+    def __init__(self):
+        super(TitleParser, self).__init__(convert_charrefs=True)
+        self.title = None
+        self.og_title = None
+        self.fragment = None
+        self.done = False
+        self._title_parts = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'title' and self.title is None:
+            self._title_parts = []
+        elif tag == 'meta':
+            attrs = dict(attrs)
+            if attrs.get('property') == 'og:title' and self.og_title is None:
+                self.og_title = attrs.get('content')
+            elif attrs.get('name') == 'fragment':
+                self.fragment = attrs.get('content')
+        elif tag == 'body':
+            self.done = True
+
+    def handle_endtag(self, tag):
+        if tag == 'title' and self._title_parts is not None:
+            self.title = ''.join(self._title_parts)
+            self._title_parts = None
+            if self.og_title is not None:
+                self.done = True
+        elif tag == 'head':
+            self.done = True
+
+    def handle_data(self, data):
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+
+    def get_title(self):
+        ''' Get og:title, or the <title> if there's none, with whitespace normalized. '''
+        title = self.og_title or self.title
+        if title is None and self._title_parts:
+            # Document ended in the middle of the title.
+            title = ''.join(self._title_parts)
+        if title is None:
+            return None
+        return ' '.join(title.split())
+
+
+class TitleReader(object):
+    '''
+    Reads titles from HTML fed in chunks of bytes, decoding it with the charset from the Content-Type header,
+    byte order mark or <meta> tag. Without any, the content is decoded as UTF-8, falling back to Windows-1252
+    if it turns out not to be.
+    '''
+    def __init__(self, content_type=''):
+        self.charset = get_codec(get_charset(content_type))
+        self.parser = TitleParser()
+        self._content = bytearray()
+        self._decoder = None
+
+    @property
+    def done(self):
+        return self.parser.done
+
+    def _start(self):
+        declared = self.charset or get_codec(sniff_charset(bytes(self._content)))
+        if declared:
+            self._restart(declared, 'replace')
+        else:
+            self._restart('utf-8', 'strict')
+
+    def _restart(self, charset, errors):
+        self.charset = charset
+        self._decoder = codecs.getincrementaldecoder(charset)(errors=errors)
+        self.parser = TitleParser()
+        self._feed(bytes(self._content))
+
+    def _feed(self, chunk, final=False):
+        try:
+            self.parser.feed(self._decoder.decode(chunk, final))
+        except UnicodeDecodeError:
+            # Guessed UTF-8 wrong, start over.
+            self._restart('cp1252', 'replace')
+
+    def feed(self, chunk):
+        self._content.extend(chunk)
+        if self._decoder is None:
+            # Without a charset in the headers, wait for the bytes browsers would look for <meta charset> in.
+            if self.charset or len(self._content) >= CHARSET_PRESCAN_BYTES or sniff_charset(bytes(self._content)):
+                self._start()
+            return
+        self._feed(chunk)
+
+    def close(self):
+        ''' Call when all content has been fed. '''
+        if self._decoder is None:
+            self._start()
+        self._feed(b'', final=True)
+        self.parser.close()
+
+
+def read_title(response, max_bytes, timeout, chunk_size=16384):
+    '''
+    Read title from streamed response of HTTPClient.get, stopping once it's found, or after max_bytes
+    or timeout seconds, whatever the headers say. Returns the TitleParser, or None if the response isn't HTML.
+    '''
+    content_type = response.headers.get('content-type', '')
+    if content_type.split(';')[0].strip() not in HTML_CONTENT_TYPES:
+        response.close()
+        return None
+
+    reader = TitleReader(content_type)
+    deadline = time.monotonic() + timeout
+    read = 0
+    try:
+        for chunk in response.iter_content_until(min(chunk_size, max_bytes), deadline):
+            reader.feed(chunk)
+            read += len(chunk)
+            if reader.done or read >= max_bytes or time.monotonic() > deadline:
+                break
+        reader.close()
+    finally:
+        response.close()
+    return reader.parser
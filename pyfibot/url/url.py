@@ -1,31 +1,60 @@
-import re
 import os
+import json
+import asyncio
 import traceback
 import logging
 import functools
-from fnmatch import fnmatch
+import concurrent.futures
+from collections import OrderedDict
 from inspect import getmembers, isfunction
 from urllib.parse import urlsplit, urlunsplit, parse_qs
 from pluginbase import PluginBase
 from datetime import datetime
 from dateutil.tz import tzutc
+import aiohttp
 import requests
 from bs4 import BeautifulSoup
-import youtube_dl
+from pyfibot.url.http import HTTPClient
+from pyfibot.url.breaker import CircuitOpenError, DomainBusyError
+from pyfibot.url.cache import TitleCache, normalize_url
+from pyfibot.url.response_cache import ResponseCache
+from pyfibot.url.singleflight import SingleFlight, AsyncSingleFlight
+from pyfibot.url.dispatch import HandlerIndex
+from pyfibot.url.video import VideoInfoExtractor
+from pyfibot.url.title import read_title
+from pyfibot.url.extract import URL_REGEX, extract_urls
+from pyfibot.url.probe import PROBE_BYTES, is_media, has_media_extension, read_media_title
 from pyfibot.utils import get_duration_string, get_views_string, get_relative_time_string, parse_datetime
 
 
+# Responses larger than this are not fetched.
+MAX_CONTENT_BYTES = 2 * 1024 * 1024
+
+
 class URL(object):
-    # http://stackoverflow.com/a/30408189
-    url_regex = re.compile(
-        r'(?:(?:https?|ftp)://)(?:\S+(?::\S*)?@)?(?:(?:[1-9]\d?|1\d\d|2[01]\d|22[0-3])' +
-        r'(?:\.(?:1?\d{1,2}|2[0-4]\d|25[0-5])){2}(?:\.(?:[1-9]\d?|1\d\d|2[0-4]\d|25[0-4]))|' +
-        r'(?:(?:[a-z\u00a1-\uffff0-9]+-?)*[a-z\u00a1-\uffff0-9]+)(?:\.(?:[a-z\u00a1-\uffff0-9]+-?)' +
-        r'*[a-z\u00a1-\uffff0-9]+)*(?:\.(?:[a-z\u00a1-\uffff]{2,})))(?::\d{2,5})?(?:/[^\s]*)?'
-    )
+    url_regex = URL_REGEX
 
     handlers = {}
+    handler_index = HandlerIndex()
     log = logging.getLogger('URL')
+    # Limits for reading titles from HTML pages.
+    TITLE_MAX_BYTES = 512 * 1024
+    TITLE_TIMEOUT = 10
+    # Seconds coroutine handlers are given, unless they set their own timeout.
+    HANDLER_TIMEOUT = 10
+    # Seconds more a blocking caller waits for them, in case the event loop is stuck.
+    HANDLER_GRACE = 5
+
+    # Shared by all bots, replaced by URL.configure.
+    http = HTTPClient()
+    title_cache = TitleCache()
+    response_cache = ResponseCache()
+    video_extractor = None
+    # Share fetches between concurrent callers.
+    title_flight = SingleFlight()
+    title_flight_async = AsyncSingleFlight()
+    json_flight = SingleFlight()
+    json_flight_async = AsyncSingleFlight()
 
     def __init__(self, url):
         self.url = url
@@ -39,13 +68,17 @@ class URL(object):
         self.get_url = functools.partial(URL.get_url, url=self.url)
         self.get_bs = functools.partial(URL.get_bs, url=self.url)
         self.get_json = functools.partial(URL.get_json, url=self.url)
+        self.get_url_async = functools.partial(URL.get_url_async, url=self.url)
+        self.get_bs_async = functools.partial(URL.get_bs_async, url=self.url)
+        self.get_json_async = functools.partial(URL.get_json_async, url=self.url)
 
     def __repr__(self):
         return '<URL "%s">' % self.url
 
     @classmethod
     def get_urls(cls, string):
-        return [URL(url) for url in set(re.findall(cls.url_regex, string))]
+        ''' Get urls in string, without duplicates, in the order they are in the string. See extract_urls. '''
+        return [URL(url) for url in OrderedDict.fromkeys(extract_urls(string))]
 
     @classmethod
     def discover_handlers(cls):
@@ -56,6 +89,7 @@ class URL(object):
         cls.plugin_source = cls.plugin_base.make_plugin_source(searchpath=[os.path.join(here, 'handlers')])
 
         URL.handlers = {}
+        URL.handler_index = HandlerIndex()
         for plugin_name in cls.plugin_source.list_plugins():
             try:
                 plugin = cls.plugin_source.load_plugin(plugin_name)
@@ -71,35 +105,105 @@ class URL(object):
 
                 if getattr(func, '_is_urlhandler', False) is True:
                     URL.handlers[func._url_matcher] = func
+                    URL.handler_index.add(func)
 
         return URL.handlers
 
     def get_title(self, bot, check_reduntant=False):
-        title = None
+        ''' Get title for the url, from the title cache if it has been fetched recently. '''
+        found, title = self.title_cache.get(self.url)
+        if found:
+            return title
 
-        for matcher, handler in self.handlers.items():
-            if handler._is_regex:
-                match = matcher.match(self.clean_url)
-                if not match:
-                    continue
-                return handler(bot, self, match)
+        # Links are often posted to several channels at once, fetch the title only once.
+        return self.title_flight.do(normalize_url(self.url), self._fetch_and_cache_title, bot, check_reduntant)
+
+    def _fetch_and_cache_title(self, bot, check_reduntant):
+        title = self.fetch_title(bot, check_reduntant=check_reduntant)
+        self.title_cache.set(self.url, title)
+        return title
+
+    async def get_title_async(self, bot, check_reduntant=False, executor=None):
+        '''
+        Get title for the url in a coroutine, from the title cache if it has been fetched recently.
+        Coroutine handlers are run on the event loop, with their timeout. Other handlers and the generic
+        title fetching block, so they're run in executor (the loop's default executor if None).
+        '''
+        found, title = self.title_cache.get(self.url)
+        if found:
+            return title
+
+        return await self.title_flight_async.do(
+            normalize_url(self.url), self._fetch_and_cache_title_async, bot, check_reduntant, executor
+        )
+
+    async def _fetch_and_cache_title_async(self, bot, check_reduntant, executor):
+        handler, match = self.handler_index.find(self.clean_url)
+        if handler and handler._is_async:
+            title = await self.run_handler_async(handler, bot, match)
+        else:
+            loop = asyncio.get_event_loop()
+            title = await loop.run_in_executor(executor, functools.partial(self.fetch_title, bot, check_reduntant=check_reduntant))
+        self.title_cache.set(self.url, title)
+        return title
 
-            if fnmatch(self.clean_url, matcher):
-                return handler(bot, self)
+    def get_handler_call(self, handler, bot, match):
+        if handler._is_regex:
+            return handler(bot, self, match)
+        return handler(bot, self)
+
+    async def run_handler_async(self, handler, bot, match):
+        ''' Run coroutine handler, returning None if it doesn't finish in time. '''
+        timeout = handler._timeout or self.HANDLER_TIMEOUT
+        try:
+            return await asyncio.wait_for(self.get_handler_call(handler, bot, match), timeout)
+        except asyncio.TimeoutError:
+            self.log.warning('Handler %s timed out for %s.' % (handler.__name__, self.url))
+            return None
+
+    def run_handler_threadsafe(self, handler, bot, match):
+        ''' Run coroutine handler on the bot's event loop from another thread, returning None if it doesn't finish in time. '''
+        loop = bot.core.loop
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            # Waiting for the loop on the loop would never finish.
+            raise RuntimeError('Blocking call for the coroutine handler %s on the event loop, use get_title_async.' % handler.__name__)
+
+        future = asyncio.run_coroutine_threadsafe(self.run_handler_async(handler, bot, match), loop)
+        try:
+            return future.result((handler._timeout or self.HANDLER_TIMEOUT) + self.HANDLER_GRACE)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            self.log.warning('Event loop did not run handler %s in time for %s.' % (handler.__name__, self.url))
+            return None
+
+    def fetch_title(self, bot, check_reduntant=False):
+        title = None
+
+        handler, match = self.handler_index.find(self.clean_url)
+        if handler:
+            if handler._is_async:
+                return self.run_handler_threadsafe(handler, bot, match)
+            return self.get_handler_call(handler, bot, match)
 
         title = self.get_video_info()
         if title:
             return title
 
         # Fallback to generic handler
-        bs = self.get_bs()
-        if not bs:
-            # If fetching BS failed, return False
-            # log.debug("No BS available, returning")
+        r = self.probe()
+        if not r:
             return
+        if is_media(r.headers.get('content-type', '')):
+            return read_media_title(r)
 
-        bs = self.get_fragment(bs)
-        title = self.get_generic_title(bs)
+        page = self.get_fragment(read_title(r, self.TITLE_MAX_BYTES, self.TITLE_TIMEOUT))
+        if not page:
+            return
+        title = page.get_title()
 
         if check_reduntant and self.check_reduntant(title):
             return
@@ -108,31 +212,9 @@ class URL(object):
 
     def get_video_info(self):
         ''' Gets (possible) video information using YoutubeDL. '''
-
-        class YoutubeDLlogger(object):
-            ''' Class to drop all youtube-dl log messages to debug level. '''
-            def debug(self, *args, **kwargs):
-                URL.log.getChild('youtube-dl').debug(*args, **kwargs)
-
-            def warning(self, *args, **kwargs):
-                self.debug(*args, **kwargs)
-
-            def error(self, *args, **kwargs):
-                self.debug(*args, **kwargs)
-
-            def critical(self, *args, **kwargs):
-                self.debug(*args, **kwargs)
-
-        youtube_dl_options = {
-            'extract_flat': True,
-            'logger': YoutubeDLlogger(),
-        }
-
-        with youtube_dl.YoutubeDL(youtube_dl_options) as ydl:
-            try:
-                info = ydl.extract_info(self.url, download=False)
-            except youtube_dl.utils.DownloadError:
-                return None
+        info = self.get_video_extractor().extract_info(self.url)
+        if not info:
+            return None
 
         video_title = info.get('title')
         if not video_title:
@@ -215,45 +297,97 @@ class URL(object):
 
         return URL(urlunsplit((url.scheme, url.netloc, url.path, query, '')))
 
-    def get_fragment(self, bs):
+    def get_fragment(self, page):
         # According to Google's Making AJAX Applications Crawlable specification
-        fragment = bs.find('meta', {'name': 'fragment'})
-        if fragment and fragment.get('content') == '!':
+        if page and page.fragment == '!':
             # log.debug("Fragment meta tag on page, getting non-ajax version")
-            url = self.__escaped_fragment(meta=True)
-            bs = URL(url).get_bs()
-        return bs
+            page = self.__escaped_fragment(meta=True).get_page_titles()
+        return page
+
+    def get_page_titles(self):
+        '''
+        Get titles of the HTML page, reading it only until <title> and og:title are found or the head ends.
+        Returns TitleParser with the titles, or None if the url isn't an HTML page.
+        '''
+        r = self.probe()
+        if not r:
+            return None
+        return read_title(r, self.TITLE_MAX_BYTES, self.TITLE_TIMEOUT)
 
-    def get_generic_title(self, bs):
-        title = bs.find('meta', {'property': 'og:title'})
-        if not title:
-            title = bs.find('title')
-            # no title attribute
-            if not title:
-                # log.debug("No title found, returning")
-                return
-            title = title.text
-        else:
-            title = title['content']
-        return title
+    def probe(self):
+        '''
+        Start fetching the url for its title, returning the streamed response with only the headers read.
+        Urls which look like links to media files are requested with a range, to only get the start of the file.
+        '''
+        headers = {'Range': 'bytes=0-%i' % (PROBE_BYTES - 1)} if has_media_extension(self.url) else None
+        # Titles are cached on their own, and readers of the response limit how much of it they read.
+        return self.get_url(cache_ttl=0, max_size=None, headers=headers)
 
     def is_redundant(self, title):
         ''' Returns True if the url and title are similar enough. '''
         return
 
     @classmethod
-    def get_url(cls, url, **kwargs):
-        ''' Fetch url. '''
-        # TODO: clean-up, straight copy from original pyfibot
-        #       possibly add raise_for_status?
-        s = requests.session()
-        s.stream = True  # Don't fetch content unless asked
+    def configure(cls, configuration, configuration_path):
+        '''
+        Configure the HTTP client, title and response caches and youtube-dl extractor shared by all bots, from the
+        `http`, `title_cache`, `response_cache` and `video_info` sections of the core configuration. See HTTPClient,
+        TitleCache, ResponseCache and VideoInfoExtractor for the options.
+        '''
+        previous, cls.http = cls.http, HTTPClient.from_configuration(configuration.get('http', {}))
+        previous.close_later()
+
+        cache_configuration = configuration.get('title_cache', {})
+        path = cache_configuration.get('path')
+        if path:
+            path = os.path.join(configuration_path, os.path.expanduser(path))
+        previous, cls.title_cache = cls.title_cache, TitleCache.from_configuration(cache_configuration, path=path)
+        previous.close()
+
+        cache_configuration = configuration.get('response_cache', {})
+        path = cache_configuration.get('path')
+        if path:
+            path = os.path.join(configuration_path, os.path.expanduser(path))
+        previous, cls.response_cache = cls.response_cache, ResponseCache.from_configuration(cache_configuration, path=path)
+        previous.close()
+
+        if cls.video_extractor:
+            cls.video_extractor.shutdown()
+        cls.video_extractor = VideoInfoExtractor.from_configuration(configuration.get('video_info', {}))
 
-        # Fake headers, as some sites don't respond well to bots...
-        s.headers.update({'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; WOW64; rv:43.0) Gecko/20100101 Firefox/43.0'})
+    @classmethod
+    def get_video_extractor(cls):
+        ''' Get the shared youtube-dl extractor, created on first use as it takes a while. '''
+        if cls.video_extractor is None:
+            cls.video_extractor = VideoInfoExtractor()
+        return cls.video_extractor
 
+    @classmethod
+    def get_url(cls, url, cache_ttl=None, max_size=MAX_CONTENT_BYTES, **kwargs):
+        '''
+        Fetch url, from the response cache if a fresh enough response is stored.
+
+        Responses are cached for the time their Cache-Control or Expires headers allow, and
+        revalidated with ETag or Last-Modified once stale. `cache_ttl` overrides the time
+        responses are cached for in seconds, 0 skips the cache.
+        Responses with Content-Length larger than `max_size` are not fetched, None allows any size.
+        Cached responses, and responses read for caching, have their content already read.
+        '''
+        key, stale = None, None
+        if cache_ttl != 0:
+            key = ' '.join(cls.get_request_key(url, kwargs))
+            cached, stale = cls.response_cache.get_fresh(key)
+            if cached:
+                return cached
+            if stale:
+                kwargs['headers'] = dict(kwargs.get('headers') or {}, **stale.get_conditional_headers())
+
+        # TODO: possibly add raise_for_status?
         try:
-            r = s.get(url, **kwargs)
+            r = cls.http.get(url, **kwargs)
+        except (CircuitOpenError, DomainBusyError) as e:
+            cls.log.warning('Not fetching %s: %s' % (url, e))
+            return None
         except requests.exceptions.InvalidSchema:
             cls.log.error("Invalid schema in URI: %s" % url)
             return None
@@ -263,48 +397,171 @@ class URL(object):
         except requests.exceptions.ConnectionError:
             cls.log.error("Connection error when connecting to %s" % url)
             return None
+        except requests.exceptions.Timeout:
+            cls.log.error("Timeout when fetching %s" % url)
+            return None
+
+        if stale and r.status_code == 304:
+            r.close()
+            return cls.response_cache.revalidated_entry(key, stale, r, cache_ttl)
 
-        size = int(r.headers.get('Content-Length', 0)) // 1024
-        # log.debug("Content-Length: %dkB" % size)
-        if size > 2048:
-            cls.log.warn('Content too large, will not fetch: %skB %s' % (size, url))
+        size = int(r.headers.get('Content-Length', 0))
+        if max_size is not None and size > max_size:
+            cls.log.warn('Content too large, will not fetch: %skB %s' % (size // 1024, url))
+            r.close()
             return None
 
+        if key and cls.response_cache.is_storable(r, cache_ttl):
+            content = cls.read_content(r)
+            if content is None:
+                return None
+            r._content, r._content_consumed = content, True
+            cls.response_cache.store(key, r, content, cache_ttl)
+
         return r
 
     @classmethod
-    def get_bs(cls, url, **kwargs):
-        ''' Fetch BeautifulSoup from url. '''
-        # TODO: clean-up, straight copy from original pyfibot
-        r = cls.get_url(url=url, **kwargs)
-        if not r:
+    async def get_url_async(cls, url, cache_ttl=None, **kwargs):
+        '''
+        Fetch url in a coroutine, cached like get_url, sharing the cache with it.
+        Returns requests response with the content already read.
+        '''
+        key, stale = None, None
+        if cache_ttl != 0:
+            key = ' '.join(cls.get_request_key(url, kwargs))
+            cached, stale = cls.response_cache.get_fresh(key)
+            if cached:
+                return cached
+            if stale:
+                kwargs['headers'] = dict(kwargs.get('headers') or {}, **stale.get_conditional_headers())
+
+        try:
+            r = await cls.http.get_async(url, max_bytes=MAX_CONTENT_BYTES, **kwargs)
+        except CircuitOpenError as e:
+            cls.log.warning('Not fetching %s: %s' % (url, e))
+            return None
+        except asyncio.TimeoutError:
+            cls.log.error("Timeout when fetching %s" % url)
             return None
+        except aiohttp.ClientError as e:
+            cls.log.error("Error when fetching %s: %s" % (url, e))
+            return None
+
+        if r is None:
+            cls.log.warn('Content too large, will not fetch: %s' % url)
+            return None
+
+        if stale and r.status_code == 304:
+            return cls.response_cache.revalidated_entry(key, stale, r, cache_ttl)
+        if key and cls.response_cache.is_storable(r, cache_ttl):
+            cls.response_cache.store(key, r, r.content, cache_ttl)
+        return r
 
-        content_type = r.headers['content-type'].split(';')[0]
+    @classmethod
+    def is_parseable(cls, content_type):
+        ''' Check if content of content type can be parsed with BeautifulSoup. '''
+        content_type = content_type.split(';')[0]
         if content_type not in ['text/html', 'text/xml', 'application/xhtml+xml']:
             cls.log.debug("Content-type %s not parseable" % content_type)
+            return False
+        return True
+
+    @classmethod
+    def parse_bs(cls, content_type, content):
+        ''' Parse BeautifulSoup from content, if the content type is parseable. '''
+        if not cls.is_parseable(content_type):
             return None
 
-        if r.content:
-            return BeautifulSoup(r.content, 'html.parser')
+        if content:
+            return BeautifulSoup(content, 'html.parser')
         return None
 
+    @classmethod
+    def read_content(cls, r):
+        ''' Read content of a streamed response, None if it's larger than allowed even if Content-Length didn't tell. '''
+        content = bytearray()
+        try:
+            for chunk in r.iter_content(65536):
+                content.extend(chunk)
+                if len(content) > MAX_CONTENT_BYTES:
+                    cls.log.warn('Content too large, stopped fetching: %s' % r.url)
+                    return None
+        finally:
+            r.close()
+        return bytes(content)
+
+    @classmethod
+    def get_bs(cls, url, **kwargs):
+        ''' Fetch BeautifulSoup from url, cached like get_url. '''
+        r = cls.get_url(url=url, **kwargs)
+        if not r:
+            return None
+        # Don't download images and such only to find out they can't be parsed.
+        if not cls.is_parseable(r.headers.get('content-type', '')):
+            r.close()
+            return None
+        return cls.parse_bs(r.headers.get('content-type', ''), cls.read_content(r))
+
+    @classmethod
+    async def get_bs_async(cls, url, **kwargs):
+        ''' Fetch BeautifulSoup from url in a coroutine. '''
+        r = await cls.get_url_async(url=url, **kwargs)
+        if not r:
+            return None
+        return cls.parse_bs(r.headers.get('content-type', ''), r.content)
+
+    @classmethod
+    def get_request_key(cls, url, kwargs):
+        ''' Get key identifying a request, for sharing it between concurrent callers. '''
+        return url, json.dumps(kwargs, sort_keys=True, default=str)
+
     @classmethod
     def get_json(cls, url, **kwargs):
-        ''' Fetch JSON from url. '''
+        '''
+        Fetch JSON from url, cached like get_url.
+        Concurrent calls for the same url with the same arguments share the fetch and the returned object.
+        '''
+        return cls.json_flight.do(cls.get_request_key(url, kwargs), cls._get_json, url, **kwargs)
+
+    @classmethod
+    def _get_json(cls, url, **kwargs):
         r = cls.get_url(url=url, **kwargs)
         if not r:
             return None
 
+        content = cls.read_content(r)
+        if content is None:
+            return None
+
         try:
-            return r.json()
+            return json.loads(content)
+        except:
+            URL.log.warn('Failed to fetch JSON.')
+            return None
+
+    @classmethod
+    async def get_json_async(cls, url, **kwargs):
+        '''
+        Fetch JSON from url in a coroutine.
+        Concurrent calls for the same url with the same arguments share the fetch and the returned object.
+        '''
+        return await cls.json_flight_async.do(cls.get_request_key(url, kwargs), cls._get_json_async, url, **kwargs)
+
+    @classmethod
+    async def _get_json_async(cls, url, **kwargs):
+        r = await cls.get_url_async(url=url, **kwargs)
+        if not r:
+            return None
+
+        try:
+            return json.loads(r.content)
         except:
             URL.log.warn('Failed to fetch JSON.')
             return None
 
 
 class urlhandler(object):
-    '''
+    r'''
     Decorator to build urlhandlers for urltitle -plugin.
     url_matcher can either be a string following fnmatch -spec or a (compiled) regex-object.
 
@@ -315,6 +572,17 @@ class urlhandler(object):
     matchers more simple. So for example 'http://www.example.com' becomes 'example.com',
     when looking for a match.
 
+    Handlers are indexed by the domain at the start of the matcher, so only the handlers for
+    the domain of the url are tried. Matchers where the domain can't be read from the pattern
+    (for example regexes starting with a group) should list the domains they match in `domains`,
+    otherwise they are tried for every url. Domains starting with a dot match all subdomains.
+    When several handlers match, the one with the highest `priority` is used.
+
+    Handlers can also be coroutine functions, run on the event loop. They should use the
+    coroutine fetches (URL.get_json_async etc.) and can make several requests concurrently.
+    They're given `timeout` seconds, URL.HANDLER_TIMEOUT by default, after which they're
+    cancelled and no title is shown.
+
     The handler can return:
         - None (indicating no title was found and should fallback to default behaviour)
         - False (to indicate that this url doesn't need a title)
@@ -332,18 +600,37 @@ class urlhandler(object):
             imdb_id = match.group('imdb_id')
             return
 
+        @urlhandler(re.compile(r'(open|play)\.spotify\.com/.*'), domains=['open.spotify.com', 'play.spotify.com'])
+        def spotify(bot, url, match):
+            return
+
+        @urlhandler('areena.yle.fi/*', timeout=5)
+        async def areena(bot, url):
+            episode, series = await asyncio.gather(get_episode(url), get_series(url))
+            return episode or series
+
     '''
-    def __init__(self, url_matcher):
+    def __init__(self, url_matcher, priority=0, domains=None, timeout=None):
         self.url_matcher = url_matcher
+        self.priority = priority
+        self.domains = domains
+        self.timeout = timeout
 
     def __call__(self, func):
-        def handler_string(bot, url):
-            return func(bot, url)
+        if asyncio.iscoroutinefunction(func):
+            async def handler_string(bot, url):
+                return await func(bot, url)
+
+            async def handler_regex(bot, url, match):
+                return await func(bot, url, match)
+        else:
+            def handler_string(bot, url):
+                return func(bot, url)
 
-        def handler_regex(bot, url, match):
-            return func(bot, url, match)
+            def handler_regex(bot, url, match):
+                return func(bot, url, match)
 
-        if isinstance(self.url_matcher, re._pattern_type):
+        if not isinstance(self.url_matcher, str):
             handler_wrapper = handler_regex
             handler_wrapper._is_regex = True
         else:
@@ -352,4 +639,9 @@ class urlhandler(object):
 
         handler_wrapper._is_urlhandler = True
         handler_wrapper._url_matcher = self.url_matcher
+        handler_wrapper._priority = self.priority
+        handler_wrapper._domains = self.domains
+        handler_wrapper._timeout = self.timeout
+        handler_wrapper._is_async = asyncio.iscoroutinefunction(func)
+        handler_wrapper.__name__ = func.__name__
         return handler_wrapper
@@ -0,0 +1,194 @@
+import time
+import logging
+import threading
+import functools
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import youtube_dl
+from youtube_dl.extractor import gen_extractor_classes
+
+
+class YoutubeDLlogger(object):
+    ''' Class to drop all youtube-dl log messages to debug level. '''
+    def __init__(self, log):
+        self.log = log
+
+    def debug(self, *args, **kwargs):
+        self.log.debug(*args, **kwargs)
+
+    def warning(self, *args, **kwargs):
+        self.debug(*args, **kwargs)
+
+    def error(self, *args, **kwargs):
+        self.debug(*args, **kwargs)
+
+    def critical(self, *args, **kwargs):
+        self.debug(*args, **kwargs)
+
+
+class BudgetedYoutubeDL(youtube_dl.YoutubeDL):
+    '''
+    YoutubeDL with a deadline for extracting a url: requests after it fail, and the socket timeout
+    of each request is cut to the time left, so extraction can't go on much longer than the deadline.
+    '''
+    deadline = None
+
+    def urlopen(self, req):
+        if self.deadline is not None:
+            remaining = self.deadline - time.monotonic()
+            if remaining <= 0:
+                raise youtube_dl.utils.DownloadError('Ran out of time for extracting video information.')
+            self._socket_timeout = min(float(self.params.get('socket_timeout') or remaining), remaining)
+        return super(BudgetedYoutubeDL, self).urlopen(req)
+
+
+def get_domain_labels(domain):
+    ''' Get the labels of domain worth looking for in extractor patterns: 'www.youtube.com' -> ['youtube']. '''
+    host = domain.lower().rsplit('@', 1)[-1].split(':', 1)[0]
+    return [label for label in host.split('.')[:-1] if label != 'www' and len(label) > 1]
+
+
+class VideoInfoExtractor(object):
+    '''
+    Extracts video information with youtube-dl, reusing YoutubeDL instances between urls.
+
+    Only urls some youtube-dl extractor other than the generic one is suitable for are extracted, so
+    articles and other plain pages are skipped without any network requests. Finding the suitable
+    extractor only checks the extractors whose url pattern mentions the domain of the url, cached per
+    domain, and the extractor found is forced, skipping youtube-dl's own search.
+
+    Extraction is done in a pool of `pool_size` threads, each with its own YoutubeDL instance,
+    and given up after `timeout` seconds. The threads can't be stopped, so the requests youtube-dl
+    makes are limited to the same time, see BudgetedYoutubeDL, and urls are refused instead of
+    queued while all threads are busy.
+    '''
+    def __init__(self, pool_size=2, timeout=10, cache_size=1024):
+        self.pool_size = max(1, int(pool_size))
+        self.timeout = float(timeout)
+
+        self.extractors = [extractor for extractor in gen_extractor_classes() if extractor.ie_key() != 'Generic']
+        # Extractors whose patterns can't be narrowed down by domain are always checked.
+        self.indexed = []
+        self.unindexed = []
+        for extractor in self.extractors:
+            (self.indexed if self._is_indexable(extractor) else self.unindexed).append(extractor)
+        self.get_candidates = functools.lru_cache(maxsize=cache_size)(self._get_candidates)
+
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='youtube-dl')
+        self._local = threading.local()
+        self._busy = 0
+        self._busy_lock = threading.Lock()
+
+        self.extracted = 0
+        self.skipped = 0
+        self.timeouts = 0
+        self.refused = 0
+
+    @classmethod
+    def from_configuration(cls, configuration):
+        return cls(
+            pool_size=configuration.get('pool_size', 2),
+            timeout=configuration.get('timeout', 10),
+        )
+
+    @property
+    def log(self):
+        return logging.getLogger(self.__class__.__name__)
+
+    def _is_indexable(self, extractor):
+        '''
+        Check if the url pattern of the extractor mentions the domains it matches literally, using the urls
+        in the extractor's own tests. Patterns like r'kanal(?:5|9|11)play\\.se' don't.
+        '''
+        pattern = getattr(extractor, '_VALID_URL', None)
+        if not isinstance(pattern, str):
+            return False
+
+        pattern = pattern.lower()
+        tests = getattr(extractor, '_TESTS', None) or []
+        if getattr(extractor, '_TEST', None):
+            tests = tests + [extractor._TEST]
+        for test in tests:
+            url = test.get('url') or ''
+            if not url.startswith('http'):
+                continue
+            labels = get_domain_labels(urlsplit(url).netloc)
+            if not any(label in pattern for label in labels):
+                return False
+        return True
+
+    def _get_candidates(self, domain):
+        labels = get_domain_labels(domain)
+        if not labels:
+            return self.extractors
+        return self.unindexed + [
+            extractor
+            for extractor in self.indexed if any(label in extractor._VALID_URL.lower() for label in labels)
+        ]
+
+    def find_extractor(self, url):
+        ''' Find youtube-dl extractor suitable for url, None if only the generic extractor would be. '''
+        for extractor in self.get_candidates(urlsplit(url).netloc):
+            if extractor.suitable(url):
+                return extractor
+        return None
+
+    def _get_youtube_dl(self):
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            ydl = self._local.ydl = BudgetedYoutubeDL({
+                'extract_flat': True,
+                'socket_timeout': self.timeout,
+                'logger': YoutubeDLlogger(self.log.getChild('youtube-dl')),
+            })
+        return ydl
+
+    def _run(self, url, ie_key):
+        try:
+            return self._extract(url, ie_key)
+        finally:
+            with self._busy_lock:
+                self._busy -= 1
+
+    def _extract(self, url, ie_key):
+        ydl = self._get_youtube_dl()
+        ydl.deadline = time.monotonic() + self.timeout
+        try:
+            return ydl.extract_info(url, download=False, ie_key=ie_key)
+        except youtube_dl.utils.DownloadError:
+            return None
+
+    def extract_info(self, url):
+        ''' Extract video information for url, None if there's no suitable extractor or extraction failed or timed out. '''
+        extractor = self.find_extractor(url)
+        if not extractor:
+            self.skipped += 1
+            return None
+
+        with self._busy_lock:
+            if self._busy >= self.pool_size:
+                self.refused += 1
+                self.log.warning('Not extracting video information from %s, all workers are busy.' % url)
+                return None
+            self._busy += 1
+
+        self.extracted += 1
+        future = self._executor.submit(self._run, url, extractor.ie_key())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            self.timeouts += 1
+            self.log.warning('Extracting video information from %s timed out.' % url)
+            return None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def get_stats(self):
+        return {
+            'extracted': self.extracted,
+            'skipped': self.skipped,
+            'timeouts': self.timeouts,
+            'refused': self.refused,
+        }
@@ -140,3 +140,16 @@ def get_views_string(views):
         return '%.0f%s' % (views / 10 ** (3 * millidx), millnames[millidx])
     except ValueError:
         return '0'
+
+
+def get_size_string(size):
+    ''' Get human readable size for size in bytes: 2411724 -> '2.3 MB'. '''
+    size = int(size)
+    if size < 1024:
+        return '%i B' % size
+
+    for unit in ['kB', 'MB', 'GB']:
+        size /= 1024.0
+        if size < 1024:
+            break
+    return '%.1f %s' % (size, unit)
@@ -0,0 +1,74 @@
+import os
+import asyncio
+import threading
+import pytest
+from http.server import HTTPServer
+from socketserver import ThreadingMixIn
+from pyfibot.url import URL
+from pyfibot.url.http import HTTPClient
+
+
+class DummyCore(object):
+    ''' Minimal stand-in for pyfibot.core.Core, to create bots without a configuration file. '''
+    def __init__(self, path, configuration):
+        self.loop = asyncio.new_event_loop()
+        self.configuration = configuration
+        self.databases = {}
+        self.admins = self.configuration.get('admins', [])
+        self.ignores = self.configuration.get('ignore', [])
+        self.command_char = '.'
+        self.nickname = 'pyfibot'
+        self.realname = 'pyfibot'
+        self.configuration_path = str(path)
+        self.plugin_path = os.path.join(self.configuration_path, 'plugins')
+        os.makedirs(self.plugin_path)
+
+
+@pytest.fixture
+def core(tmp_path):
+    core = DummyCore(tmp_path, {
+        'bots': {
+            'dummy': {},
+            'irc': {'protocol': 'irc', 'server': 'localhost', 'channels': ['#pyfibot', ['#Secret[]', 'password']]},
+        },
+    })
+    yield core
+    core.loop.close()
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    ''' Local HTTP server for tests, counting connections. Handlers can record requests to `requests`. '''
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        super(Server, self).__init__(*args, **kwargs)
+        self.connections = 0
+        self.requests = []
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%i' % self.server_port
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super(Server, self).process_request(request, client_address)
+
+
+@pytest.fixture
+def server(request):
+    ''' Server for the request handler class the test is parametrized with, indirectly. '''
+    server = Server(('127.0.0.1', 0), request.param)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def http(monkeypatch):
+    ''' HTTP client of its own for URL. '''
+    http = HTTPClient(user_agent='pyfibot-test')
+    monkeypatch.setattr(URL, 'http', http)
+    yield http
+    http.close()
@@ -0,0 +1,23 @@
+from pyfibot.auth import HostmaskMatcher, Authorization
+
+
+def test_hostmask_matcher():
+    matcher = HostmaskMatcher(['*!*@*.example.com', 'nick[away]!user@host', 12345])
+    assert matcher.match('someone!user@irc.EXAMPLE.com')
+    assert not matcher.match('someone!user@example.com')
+    assert matcher.match('Nick[Away]!user@host')
+    assert not matcher.match('nicka!user@host')
+    assert matcher.match('12345')
+    assert not matcher.match('123456')
+    assert not matcher.match(None)
+    assert not HostmaskMatcher([]).match('anyone!user@host')
+
+
+def test_authorization():
+    authorization = Authorization(['admin!*@example.com'], ['*!*@example.com'])
+    assert authorization.is_admin('admin!user@example.com')
+    assert not authorization.is_ignored('admin!user@example.com')
+    assert authorization.is_ignored('spammer!user@example.com')
+    assert not authorization.is_admin('spammer!user@example.com')
+    assert not authorization.is_ignored('someone!user@example.org')
+    assert authorization.is_admin.cache_info().hits > 0
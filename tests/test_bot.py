@@ -0,0 +1,64 @@
+from pyfibot.bot.bot import Bot
+from pyfibot.plugin import Plugin
+
+
+class DummyBot(Bot):
+    def respond(self, message, raw_message):
+        pass
+
+
+class DummyPlugin(object):
+    @Plugin.listener()
+    def everything(self, sender, message, raw_message):
+        pass
+
+    @Plugin.listener(keywords=['://', 'www.'])
+    def urls(self, sender, message, raw_message):
+        pass
+
+    @Plugin.listener(pattern=r'spotify:\w+')
+    def spotify(self, sender, message, raw_message):
+        pass
+
+    @Plugin.listener(pattern=r'(?i)^hello')
+    def greeting(self, sender, message, raw_message):
+        pass
+
+    @Plugin.listener(pattern=r'(\w+) \1')
+    def repeat(self, sender, message, raw_message):
+        pass
+
+    @Plugin.listener(pattern=r'(unbalanced')
+    def broken(self, sender, message, raw_message):
+        pass
+
+
+def test_listener_prefilters(core):
+    bot = DummyBot(core, 'dummy')
+    plugin = DummyPlugin()
+    bot.register_listener(plugin.urls)
+    bot.register_listener(plugin.everything)
+    bot.register_listener(plugin.spotify)
+    bot.compile_listener_prefilters()
+
+    assert bot.get_listeners('hello world') == [plugin.everything]
+    # Keywords match in any case, and listeners are returned in the order they were registered.
+    assert bot.get_listeners('see WWW.example.com') == [plugin.urls, plugin.everything]
+    assert bot.get_listeners('spotify:track http://example.com') == [plugin.urls, plugin.everything, plugin.spotify]
+    assert bot.get_listeners('spotify: nothing') == [plugin.everything]
+
+
+def test_listener_prefilters_with_flags_and_groups(core):
+    bot = DummyBot(core, 'dummy')
+    plugin = DummyPlugin()
+    bot.register_listener(plugin.greeting)
+    bot.register_listener(plugin.broken)
+    bot.register_listener(plugin.repeat)
+    bot.register_listener(plugin.urls)
+    bot.compile_listener_prefilters()
+
+    # The invalid prefilter only drops its own listener.
+    assert bot.listeners == [plugin.greeting, plugin.repeat, plugin.urls]
+    assert bot.get_listeners('HELLO there') == [plugin.greeting]
+    assert bot.get_listeners('bye bye http://example.com') == [plugin.repeat, plugin.urls]
+    assert bot.get_listeners('bye now') == []
@@ -0,0 +1,109 @@
+import threading
+import pytest
+from pyfibot.url.breaker import CircuitBreaker, CircuitOpenError, DomainBusyError
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_circuit_opens_after_failures():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60, clock=clock)
+
+    for i in range(2):
+        breaker.acquire('example.com')
+        breaker.release('example.com', 0.1, failed=True)
+    # Success resets the consecutive failures.
+    breaker.acquire('example.com')
+    breaker.release('example.com', 0.1, failed=False)
+
+    for i in range(3):
+        breaker.acquire('example.com')
+        breaker.release('example.com', 0.1, failed=True)
+
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire('example.com')
+    # Other domains are not affected.
+    breaker.acquire('example.org')
+    breaker.release('example.org', 0.1, failed=False)
+
+    stats = breaker.get_stats()
+    assert stats['domains'] == 2
+    assert stats['requests'] == 7
+    assert stats['errors'] == 5
+    assert stats['rejected'] == 1
+    assert stats['open'] == 'example.com(60s)'
+    assert breaker.get_domain_stats('example.com')['state'] == 'open'
+
+
+def test_circuit_half_open():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=60, clock=clock)
+    breaker.record('example.com', 0.1, failed=True)
+
+    clock.now = 61
+    # One request is let through to try the domain after the cool-down...
+    breaker.acquire('example.com')
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire('example.com')
+    # ...and failing keeps it open for another.
+    breaker.release('example.com', 0.1, failed=True)
+    with pytest.raises(CircuitOpenError):
+        breaker.check('example.com')
+
+    clock.now = 122
+    breaker.acquire('example.com')
+    breaker.release('example.com', 0.1, failed=False)
+    breaker.check('example.com')
+    assert breaker.get_open_circuits() == {}
+
+
+def test_domain_busy():
+    breaker = CircuitBreaker(max_requests=2)
+    breaker.acquire('example.com')
+    breaker.acquire('example.com')
+    with pytest.raises(DomainBusyError):
+        breaker.acquire('example.com', timeout=0.05)
+
+    # Released request lets a waiting one through.
+    acquired = threading.Event()
+
+    def wait():
+        breaker.acquire('example.com', timeout=5)
+        acquired.set()
+
+    thread = threading.Thread(target=wait)
+    thread.start()
+    breaker.release('example.com', 0.1, failed=False)
+    thread.join()
+    assert acquired.is_set()
+    assert breaker.get_domain_stats('example.com')['active'] == 2
+
+
+def test_forget_domains():
+    breaker = CircuitBreaker(max_domains=2, failure_threshold=1)
+    breaker.record('open.example.com', 0.1, failed=True)
+    for domain in ['a.example.com', 'b.example.com', 'c.example.com']:
+        breaker.record(domain, 0.1, failed=False)
+    # Domains with an open circuit are kept.
+    assert breaker.get_domain_stats('open.example.com') is not None
+    assert breaker.get_domain_stats('a.example.com') is None
+    assert breaker.get_domain_stats('c.example.com') is not None
+
+
+def test_unlimited_requests_are_counted():
+    breaker = CircuitBreaker(max_requests=1, max_domains=1)
+    for i in range(2):
+        breaker.acquire('example.com', limit=False)
+    assert breaker.get_domain_stats('example.com')['active'] == 2
+    # Domains with requests in progress are not forgotten.
+    breaker.record('example.org', 0.1, failed=False)
+    assert breaker.get_domain_stats('example.com') is not None
+    for i in range(2):
+        breaker.release('example.com', 0.1, failed=False, limit=False)
+    assert breaker.get_domain_stats('example.com')['active'] == 0
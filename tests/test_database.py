@@ -0,0 +1,36 @@
+import threading
+import pytest
+from pyfibot import database
+from pyfibot.bot.bot import Bot
+
+
+class DummyBot(Bot):
+    def load_plugins(self):
+        pass
+
+
+def test_shared_connection(core, tmp_path):
+    # Left behind by a bot using the old lock file.
+    tmp_path.joinpath('database.lock').write_text('')
+    bot = DummyBot(core, 'dummy')
+
+    with database.Database(bot) as db:
+        db['test'].insert({'message': 'first'})
+        assert list(db.query('PRAGMA journal_mode'))[0]['journal_mode'] == 'wal'
+    assert not tmp_path.joinpath('database.lock').exists()
+
+    def insert(i):
+        with database.Database(bot) as db:
+            db['test'].insert({'message': 'thread %i' % i})
+
+    threads = [threading.Thread(target=insert, args=(i, )) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with database.Database(bot) as db:
+        assert db['test'].count() == 11
+    assert len(core.databases) == 1
+    for connection in core.databases.values():
+        connection.close()
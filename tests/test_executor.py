@@ -0,0 +1,84 @@
+import functools
+import asyncio
+from pyfibot.executor import BoundedExecutor
+
+
+def run_executor(policy, jobs=5):
+    loop = asyncio.new_event_loop()
+    finished = []
+    busy = []
+
+    async def job(i, release):
+        await release.wait()
+        finished.append(i)
+
+    async def run():
+        release = asyncio.Event()
+        executor = BoundedExecutor(loop, 'test', max_concurrency=1, queue_limit=2, policy=policy, on_busy=busy.append)
+        for i in range(jobs):
+            executor.submit(job, i, release, raw_message={'id': i})
+        assert executor.running == 1
+        assert executor.queued == 2
+        release.set()
+        while executor.running or executor.queued:
+            await asyncio.sleep(0)
+        return executor
+
+    try:
+        executor = loop.run_until_complete(run())
+    finally:
+        loop.close()
+    return executor, finished, busy
+
+
+def test_drop_policy():
+    executor, finished, busy = run_executor('drop')
+    assert finished == [0, 1, 2]
+    assert executor.rejected == 2
+    assert busy == []
+
+
+def test_drop_oldest_policy():
+    executor, finished, busy = run_executor('drop_oldest')
+    assert finished == [0, 3, 4]
+    assert executor.rejected == 2
+
+
+def test_busy_policy():
+    executor, finished, busy = run_executor('busy')
+    assert finished == [0, 1, 2]
+    assert busy == [{'id': 3}, {'id': 4}]
+
+
+def test_sync_callbacks_run_in_threads():
+    loop = asyncio.new_event_loop()
+    executor = BoundedExecutor(loop, 'test', max_concurrency=2)
+    try:
+        result = loop.run_until_complete(executor.submit(lambda a, b: a + b, 1, 2))
+    finally:
+        executor.shutdown()
+        loop.close()
+    assert result == 3
+    assert executor.completed == 1
+
+
+def test_on_rejected():
+    loop = asyncio.new_event_loop()
+    rejected = []
+
+    async def job():
+        await asyncio.sleep(0)
+
+    async def run(policy):
+        executor = BoundedExecutor(loop, 'test', max_concurrency=1, queue_limit=1, policy=policy)
+        for i in range(3):
+            executor.submit(job, on_rejected=functools.partial(rejected.append, (policy, i)))
+        executor.shutdown()
+
+    try:
+        loop.run_until_complete(run('drop'))
+        loop.run_until_complete(run('drop_oldest'))
+    finally:
+        loop.close()
+    # Dropping the oldest queued callback tells it, not the new one.
+    assert rejected == [('drop', 2), ('drop_oldest', 1)]
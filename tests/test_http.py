@@ -0,0 +1,142 @@
+import json
+import time
+import asyncio
+import pytest
+import requests
+from http.server import BaseHTTPRequestHandler
+from pyfibot.url import URL
+from pyfibot.url.breaker import CircuitOpenError, DomainBusyError
+from pyfibot.url.http import HTTPClient
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = json.dumps({'path': self.path, 'user_agent': self.headers.get('User-Agent')}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class SlowBodyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', '100')
+        self.end_headers()
+        self.wfile.write(b'<html>')
+        self.wfile.flush()
+        time.sleep(1)
+
+    def log_message(self, *args):
+        pass
+
+
+class ChunkedHandler(BaseHTTPRequestHandler):
+    ''' Endless chunked body, without Content-Length. '''
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            while True:
+                self.wfile.write(b'400\r\n' + b'x' * 1024 + b'\r\n')
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.mark.parametrize('server', [Handler], indirect=True)
+def test_connections_are_reused(server, http):
+    url = server.url + '/'
+    for i in range(3):
+        assert URL.get_json(url + str(i)) == {'path': '/%i' % i, 'user_agent': 'pyfibot-test'}
+    assert server.connections == 1
+
+
+@pytest.mark.parametrize('server', [Handler], indirect=True)
+def test_async_connections_are_reused(server, http):
+    url = server.url + '/'
+
+    async def fetch():
+        results = [await URL.get_json_async(url + str(i)) for i in range(3)]
+        await http.close_async()
+        return results
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(fetch())
+    finally:
+        loop.close()
+    assert [result['path'] for result in results] == ['/0', '/1', '/2']
+    assert server.connections == 1
+
+
+def test_timeout(http):
+    assert HTTPClient(connect_timeout=1, read_timeout=2).timeout == (1.0, 2.0)
+    # Nothing listens on the discard port, connecting fails instead of hanging.
+    assert URL.get_url('http://127.0.0.1:9/') is None
+
+
+@pytest.mark.parametrize('server', [SlowBodyHandler], indirect=True)
+def test_slow_body(server):
+    http = HTTPClient(max_connections_per_host=1, connect_timeout=0.1, read_timeout=0.3, failure_threshold=1)
+    response = http.get(server.url)
+    # The domain is in use until the body has been read...
+    assert http.breaker.get_domain_stats('127.0.0.1')['active'] == 1
+    with pytest.raises(DomainBusyError):
+        http.get(server.url)
+    # ...and timing out reading it is a failure.
+    with pytest.raises(requests.exceptions.ConnectionError):
+        response.content
+    assert http.breaker.get_domain_stats('127.0.0.1')['active'] == 0
+    with pytest.raises(CircuitOpenError):
+        http.get(server.url)
+    http.close()
+
+
+@pytest.mark.parametrize('server', [ChunkedHandler], indirect=True)
+def test_async_max_bytes_without_content_length(server, http):
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(http.get_async(server.url, max_bytes=100000)) is None
+        loop.run_until_complete(http.close_async())
+    finally:
+        loop.close()
+
+
+def test_close_later():
+    loop = asyncio.new_event_loop()
+    try:
+        # On the event loop, closing the aiohttp session is scheduled on it...
+        async def replace():
+            http = HTTPClient()
+            session = http.get_async_session()
+            http.close_later()
+            await asyncio.sleep(0)
+            return session
+        assert loop.run_until_complete(replace()).closed
+
+        # ...and from outside of it, the session is closed right away.
+        http = HTTPClient()
+
+        async def create():
+            return http.get_async_session()
+        session = loop.run_until_complete(create())
+        http.close_later()
+        assert session.closed
+    finally:
+        loop.close()
@@ -0,0 +1,82 @@
+from pyfibot.bot.ircbot import IRCbot, IRCChannel, irc_casefold
+
+
+def test_irc_casefold():
+    assert irc_casefold('Nick[Away]') == 'nick{away}'
+    assert irc_casefold('#Channel\\~') == '#channel|^'
+
+
+def test_user_index(core):
+    bot = IRCbot(core, 'irc')
+    pyfibot = bot.find_channel('#PYFIBOT')
+    secret = bot.find_channel('#secret{}')
+    assert pyfibot.name == '#pyfibot'
+    assert secret.password == 'password'
+
+    bot.add_channel_user(pyfibot, {'nick': 'Someone', 'user': 'some', 'host': 'example.com'})
+    bot.add_channel_user(secret, {
+        'channel': '#Secret[]', 'nick': 'someone', 'user': 'some', 'host': 'example.com', 'real_name': 'Some One', 'hg_code': 'H@'
+    })
+    bot.add_channel_user(secret, {'nick': 'other', 'user': 'other', 'host': 'example.com'})
+
+    user = bot.find_user('SOMEONE')
+    assert user is pyfibot.find_user('someone') is secret.find_user('Someone')
+    assert user.channels == {'#pyfibot', '#secret{}'}
+    assert user.real_name == 'Some One'
+    assert user.is_op('#Secret[]')
+    assert not user.is_op('#pyfibot')
+    assert user.host is bot.find_user('other').host
+
+    # Connections sharing a channel all see the nick change, only the first one gets True and runs handlers.
+    assert bot.rename_user('someone', 'Renamed') is True
+    assert bot.rename_user('someone', 'Renamed') is False
+    assert bot.find_user('someone') is None
+    assert secret.find_user('renamed') is user
+    assert user.nick == 'Renamed'
+
+    bot.remove_channel_user(pyfibot, 'renamed')
+    assert user.channels == {'#secret{}'}
+    assert bot.find_user('renamed') is user
+
+    assert bot.remove_user('renamed') is True
+    assert bot.remove_user('renamed') is False
+    assert bot.find_user('renamed') is None
+    assert list(secret.users.keys()) == ['other']
+
+    secret.on_bot_part(channel='#secret[]')
+    assert bot.users == {}
+
+
+class DummySendQueue(object):
+    def __init__(self):
+        self.messages = []
+
+    def send_message(self, target, message):
+        self.messages.append((target, message))
+
+
+def test_connection_sharding(core):
+    core.configuration['bots']['irc']['channels_per_connection'] = 1
+    bot = IRCbot(core, 'irc')
+    first, second = bot.connections
+    assert (first.nickname, second.nickname) == ('pyfibot', 'pyfibot2')
+    assert bot.find_channel('#pyfibot').connection is first
+    assert bot.find_channel('#secret[]').connection is second
+    assert bot.is_own_nick('PyFiBot2')
+    # Servers may echo the nick of a connection in another case.
+    assert second.is_own_nick('PYFIBOT2')
+    assert not first.is_own_nick('pyfibot2') and not first.is_own_nick(None)
+
+    for connection in bot.connections:
+        connection.send_queue = DummySendQueue()
+
+    bot.send_response('hello', {'nick': 'someone', 'target': '#Secret[]'})
+    bot.send_response('private', {'nick': 'someone', 'target': 'pyfibot2'})
+    bot.send_response('own', {'nick': 'pyfibot', 'target': '#pyfibot'})
+    assert first.send_queue.messages == []
+    assert second.send_queue.messages == [('#Secret[]', 'hello'), ('someone', 'private')]
+
+    # New channels get a new connection once the existing ones are full.
+    bot.add_channel(IRCChannel(bot, '#third'))
+    assert len(bot.connections) == 3
+    assert bot.find_channel('#third').connection is bot.connections[2]
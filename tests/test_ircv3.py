@@ -0,0 +1,58 @@
+from pyfibot.bot.ircbot import IRCbot
+from pyfibot.bot.ircv3 import split_tags, unpack_message, CapabilityNegotiation
+
+
+class DummyClient(object):
+    def __init__(self):
+        self.sent = []
+
+    def send_raw(self, line):
+        self.sent.append(line)
+
+
+def test_split_tags():
+    assert split_tags('PING :server') == ({}, 'PING :server')
+    tags, line = split_tags('@time=2018-01-01T00:00:00.000Z;account=nick;msg=a\\sb\\:c;flag :nick!user@host PRIVMSG #a :hi')
+    assert tags == {'time': '2018-01-01T00:00:00.000Z', 'account': 'nick', 'msg': 'a b;c', 'flag': ''}
+    assert line == ':nick!user@host PRIVMSG #a :hi'
+
+
+def test_unpack_message():
+    event, kwargs = unpack_message('@time=2018-01-01T00:00:00.000Z :nick!user@host PRIVMSG #a :hello world')
+    assert event == 'PRIVMSG'
+    assert kwargs['message'] == 'hello world'
+    assert kwargs['tags'] == {'time': '2018-01-01T00:00:00.000Z'}
+
+    event, kwargs = unpack_message(':server CAP * LS * :multi-prefix sasl=PLAIN')
+    assert event == 'CAP'
+    assert kwargs['subcommand'] == 'LS'
+    assert kwargs['more'] is True
+    assert kwargs['capabilities'] == ['multi-prefix', 'sasl=PLAIN']
+
+    event, kwargs = unpack_message(':nick!user@host JOIN #a account :Real Name')
+    assert event == 'JOIN'
+    assert (kwargs['channel'], kwargs['account'], kwargs['real_name']) == ('#a', 'account', 'Real Name')
+
+    event, kwargs = unpack_message(':server 354 pyfibot 152 #a user host nick H@ * :Real Name')
+    assert event == 'RPL_WHOSPCRPL'
+    assert kwargs['params'] == ['152', '#a', 'user', 'host', 'nick', 'H@', '*', 'Real Name']
+
+    event, kwargs = unpack_message(':server 315 pyfibot #a :End of /WHO list.')
+    assert (event, kwargs['name']) == ('RPL_ENDOFWHO', '#a')
+
+
+def test_capability_negotiation():
+    client = DummyClient()
+    negotiation = CapabilityNegotiation(client, ['multi-prefix', 'userhost-in-names', 'batch'])
+    negotiation.start()
+    negotiation.handle('LS', ['multi-prefix', 'sasl=PLAIN'], more=True)
+    negotiation.handle('LS', ['userhost-in-names'])
+    negotiation.handle('ACK', ['multi-prefix', 'userhost-in-names'])
+    assert client.sent == ['CAP LS 302', 'CAP REQ :multi-prefix userhost-in-names', 'CAP END']
+    assert negotiation.enabled == {'multi-prefix', 'userhost-in-names'}
+
+
+def test_parse_names_entry(core):
+    bot = IRCbot(core, 'irc')
+    assert bot.parse_names_entry('@+nick!user@host') == {'hg_code': '@+', 'nick': 'nick', 'user': 'user', 'host': 'host'}
+    assert bot.parse_names_entry('nick') == {'hg_code': '', 'nick': 'nick'}
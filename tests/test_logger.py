@@ -0,0 +1,169 @@
+import asyncio
+import pytest
+from pyfibot import database
+from pyfibot.bot.bot import Bot
+from pyfibot.plugins.available import logger
+
+
+class DummyBot(Bot):
+    def load_plugins(self):
+        self.init_callbacks()
+
+    def is_own_nick(self, nick):
+        return nick == 'pyfibot'
+
+
+@pytest.fixture
+def plugin(core):
+    core.configuration['plugin'] = {'logger': {'flush_interval': 60, 'flush_rows': 3}}
+    plugin = logger.Logger(DummyBot(core, 'dummy'))
+    yield plugin
+    for connection in core.databases.values():
+        connection.close()
+
+
+def log(plugin, message, target='#pyfibot'):
+    plugin.bot.core.loop.run_until_complete(plugin.save_message('someone', message, {'target': target}))
+
+
+def test_buffered_writes(plugin):
+    log(plugin, 'first')
+    log(plugin, 'private', target='pyfibot')
+    log(plugin, 'second', target='#other')
+    assert plugin.get_stats()['buffered'] == 2
+    assert plugin.written == 0
+
+    plugin.teardown()
+    assert plugin.get_stats()['buffered'] == 0
+    assert plugin.written == 2
+    assert plugin.flushes == 1
+
+    with database.Database(plugin.bot) as db:
+        assert [row['message'] for row in db['log-dummy-pyfibot'].all()] == ['first']
+        assert [row['message'] for row in db['log-dummy-other'].all()] == ['second']
+
+
+def test_flush_after_rows(plugin):
+    for i in range(3):
+        log(plugin, 'message %i' % i)
+    # The third message starts a flush in the executor of the plugin.
+    assert plugin.executor.running == 1
+
+    async def flushed():
+        while plugin.executor.running:
+            await asyncio.sleep(0.01)
+    plugin.bot.core.loop.run_until_complete(flushed())
+    assert plugin.written == 3
+    assert plugin.executor.completed == 1
+
+
+class RespondingBot(DummyBot):
+    def respond(self, message, raw_message):
+        self.responses.append(message)
+
+
+@pytest.fixture
+def search_plugin(core):
+    core.configuration['plugin'] = {'logger': {'flush_interval': 60}}
+    plugin = logger.Logger(RespondingBot(core, 'dummy'))
+    plugin.bot.responses = []
+    yield plugin
+    for connection in core.databases.values():
+        connection.close()
+
+
+def test_search(search_plugin):
+    # Nothing to backfill, new tables are indexed from their first rows.
+    search_plugin.backfill()
+    assert search_plugin.backfill_done
+    log(search_plugin, 'pizza at the usual place?')
+    log(search_plugin, 'no, pizzeria is closed')
+    log(search_plugin, 'pizza somewhere else', target='#other')
+
+    search_plugin.command_search('someone', 'pizza', {'target': '#pyfibot'})
+    assert search_plugin.bot.responses[-1].endswith('<someone> pizza at the usual place?')
+    search_plugin.command_search('someone', 'pizz*', {'target': '#pyfibot'})
+    assert search_plugin.bot.responses[-1].count(' | ') == 1
+    search_plugin.command_search('someone', '"pizza" OR NOT', {'target': '#pyfibot'})
+    assert search_plugin.bot.responses[-1] == 'Nothing found.'
+    search_plugin.command_search('someone', 'pizza', {'target': 'pyfibot'})
+    assert search_plugin.bot.responses[-1] == 'Search only works on channels.'
+
+
+def test_seen(search_plugin):
+    log(search_plugin, 'first')
+    log(search_plugin, 'last')
+
+    search_plugin.command_seen('someone', 'SOMEONE', {'target': '#pyfibot'})
+    assert search_plugin.bot.responses[-1].startswith('someone was last seen ')
+    assert search_plugin.bot.responses[-1].endswith(': last')
+    search_plugin.command_seen('someone', 'nobody', {'target': '#pyfibot'})
+    assert search_plugin.bot.responses[-1] == 'nobody has not been seen here.'
+
+
+def test_backfill(search_plugin):
+    with database.Database(search_plugin.bot) as db:
+        db['log-dummy-pyfibot'].insert_many([
+            {'time': '2016-01-01 12:00:00', 'sender': 'someone', 'target': '#pyfibot', 'message': 'old message %i' % i}
+            for i in range(3)
+        ])
+    search_plugin.backfill_rows = 2
+    search_plugin.backfill()
+    search_plugin.backfill()
+    search_plugin.backfill()
+    assert search_plugin.backfilled == 3
+    assert search_plugin.backfill_done
+
+    search_plugin.command_search('someone', 'old', {'target': '#pyfibot'})
+    assert search_plugin.bot.responses[-1].startswith('2016-01-01 12:00 <someone> old message')
+
+
+@pytest.fixture
+def retention_plugin(core):
+    core.configuration['plugin'] = {'logger': {
+        'flush_interval': 60,
+        'partition': 'monthly',
+        'retention_days': 365,
+        'retention_rows': 2,
+        'archive': True,
+        'quiet_time': 0,
+        'retention': {'dummy': {'channels': {'#Short': 30, '#forever': 0}}},
+    }}
+    plugin = logger.Logger(RespondingBot(core, 'dummy'))
+    plugin.bot.responses = []
+    yield plugin
+    for connection in core.databases.values():
+        connection.close()
+
+
+def test_retention_days(retention_plugin):
+    assert retention_plugin.get_retention_days('#pyfibot') == 365
+    assert retention_plugin.get_retention_days('#short') == 30
+    assert retention_plugin.get_retention_days('#forever') is None
+
+
+def test_retention(retention_plugin):
+    with database.Database(retention_plugin.bot) as db:
+        db['log-dummy-pyfibot-2016-01'].insert_many([
+            {'time': '2016-01-0%i 12:00:00' % (i + 1), 'sender': 'someone', 'target': '#pyfibot', 'message': 'old pizza %i' % i}
+            for i in range(3)
+        ])
+    retention_plugin.backfill()
+    log(retention_plugin, 'new pizza')
+    retention_plugin.flush()
+
+    # Two rows per run, the month is dropped once it's empty.
+    retention_plugin.retain()
+    assert retention_plugin.pruned == 2
+    retention_plugin.retain()
+    assert retention_plugin.pruned == 3
+    assert retention_plugin.partitions_dropped == 1
+    assert retention_plugin.maintenances == 1
+
+    with database.Database(retention_plugin.bot) as db:
+        assert 'log-dummy-pyfibot-2016-01' not in db.tables
+    with database.Database(retention_plugin.bot, 'log-archive') as archive:
+        assert [row['message'] for row in archive['log-dummy-pyfibot-2016-01'].all()] == ['old pizza 0', 'old pizza 1', 'old pizza 2']
+
+    retention_plugin.command_search('someone', 'pizza', {'target': '#pyfibot'})
+    assert retention_plugin.bot.responses[-1].endswith('<someone> new pizza')
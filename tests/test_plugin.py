@@ -0,0 +1,44 @@
+import asyncio
+import logging
+from pyfibot.plugin import Plugin
+
+
+class DummyPlugin(object):
+    log = logging.getLogger('test')
+
+
+def test_command_wrapper_keeps_coroutines():
+    @Plugin.command('sync')
+    def sync_command(plugin, sender, message, raw_message):
+        return message
+
+    @Plugin.command('async')
+    async def async_command(plugin, sender, message, raw_message):
+        return message
+
+    assert not asyncio.iscoroutinefunction(sync_command)
+    assert asyncio.iscoroutinefunction(async_command)
+
+    assert sync_command(DummyPlugin(), 'sender', 'message', {}) == 'message'
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(async_command(DummyPlugin(), 'sender', 'message', {})) == 'message'
+    finally:
+        loop.close()
+
+
+def test_wrapped_callbacks_swallow_exceptions():
+    @Plugin.listener()
+    def sync_listener(plugin, sender, message, raw_message):
+        raise ValueError('sync')
+
+    @Plugin.handler('JOIN')
+    async def async_handler(plugin, raw_message):
+        raise ValueError('async')
+
+    assert sync_listener(DummyPlugin(), 'sender', 'message', {}) is None
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(async_handler(DummyPlugin(), {})) is None
+    finally:
+        loop.close()
@@ -0,0 +1,70 @@
+import struct
+import pytest
+from http.server import BaseHTTPRequestHandler
+from pyfibot.url import URL
+from pyfibot.url.probe import get_image_size, get_media_title, get_range_size, has_media_extension, read_media_title
+
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00\x00\x00\rIHDR' + struct.pack('>II', 1920, 1080) + b'\x08\x02\x00\x00\x00'
+GIF = b'GIF89a' + struct.pack('<HH', 320, 200) + b'\x00' * 10
+# SOI, APP0 segment and baseline start of frame.
+JPEG = b'\xff\xd8' + b'\xff\xe0\x00\x10JFIF\x00' + b'\x00' * 9 + b'\xff\xc0\x00\x11\x08' + struct.pack('>HH', 600, 800) + b'\x03' + b'\x00' * 9
+WEBP = b'RIFF\x00\x00\x00\x00WEBPVP8X' + b'\x0a\x00\x00\x00' + b'\x00' * 4 + (639).to_bytes(3, 'little') + (479).to_bytes(3, 'little')
+
+
+def test_image_size():
+    assert get_image_size(PNG) == (1920, 1080)
+    assert get_image_size(GIF) == (320, 200)
+    assert get_image_size(JPEG) == (800, 600)
+    assert get_image_size(WEBP) == (640, 480)
+    # Truncated before the dimensions.
+    assert get_image_size(JPEG[:20]) is None
+    assert get_image_size(b'<html>') is None
+
+
+def test_media_title():
+    assert get_media_title('image/png', 2411724, PNG) == '[image/png 1920x1080, 2.3 MB]'
+    assert get_media_title('video/mp4; codecs="avc1"', 12 * 1024 * 1024) == '[video/mp4, 12.0 MB]'
+    assert get_media_title('application/pdf') == '[application/pdf]'
+    assert get_range_size('bytes 0-65535/2411724') == 2411724
+    assert get_range_size('bytes 0-65535/*') is None
+    assert has_media_extension('http://example.com/images/cat.JPG?size=large')
+    assert not has_media_extension('http://example.com/cat.jpg/comments')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # A large image, only the start of which should be read.
+    IMAGE = PNG + b'\x00' * (4 * 1024 * 1024)
+
+    def do_GET(self):
+        self.server.requests.append(self.headers.get('Range'))
+        body = self.IMAGE
+        if self.headers.get('Range') and self.path.endswith('.png'):
+            end = int(self.headers['Range'].rpartition('-')[2])
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes 0-%i/%i' % (end, len(body)))
+            body = body[:end + 1]
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.mark.parametrize('server', [Handler], indirect=True)
+def test_probe(server, http):
+    url = server.url
+
+    # Urls with image extensions are requested with a range.
+    assert read_media_title(URL(url + '/cat.png').probe()) == '[image/png 1920x1080, 4.0 MB]'
+    # Others find out they're images from the headers, and read only the start of them.
+    assert read_media_title(URL(url + '/cat').probe()) == '[image/png 1920x1080, 4.0 MB]'
+    assert server.requests == ['bytes=0-65535', None]
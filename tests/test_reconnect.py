@@ -0,0 +1,39 @@
+import asyncio
+import logging
+from pyfibot.bot.reconnect import ReconnectSupervisor
+
+
+def test_reconnect_supervisor():
+    loop = asyncio.new_event_loop()
+    connects = []
+    supervisor = ReconnectSupervisor(loop, lambda: connects.append(True), logging.getLogger('test'), delay=0.01, max_delay=0.04, stable_time=0.05)
+
+    try:
+        supervisor.connecting()
+        supervisor.connected()
+        assert supervisor.state == 'connected'
+
+        # Disconnect reported twice only reconnects once.
+        supervisor.disconnected()
+        supervisor.disconnected(ValueError('connection lost'))
+        assert supervisor.state == 'waiting'
+        loop.run_until_complete(asyncio.sleep(0.05))
+        assert len(connects) == 1
+        assert supervisor.state == 'connecting'
+        assert supervisor.attempts == 1
+
+        # Connection isn't stable yet, so backoff keeps growing.
+        supervisor.connected()
+        supervisor.disconnected()
+        assert supervisor.attempts == 2
+        assert all(0.01 <= supervisor.get_delay() <= 0.04 for _ in range(100))
+        supervisor.attempts = 10
+        assert all(0.02 <= supervisor.get_delay() <= 0.04 for _ in range(100))
+
+        loop.run_until_complete(asyncio.sleep(0.05))
+        supervisor.connected()
+        loop.run_until_complete(asyncio.sleep(0.1))
+        assert supervisor.attempts == 0
+        assert supervisor.reconnects == 2
+    finally:
+        loop.close()
@@ -0,0 +1,145 @@
+import json
+import asyncio
+import pytest
+from http.server import BaseHTTPRequestHandler
+from pyfibot.url import URL
+from pyfibot.url.response_cache import ResponseCache, get_freshness_lifetime, parse_cache_control
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Response headers per path.
+    HEADERS = {
+        '/max-age': {'Cache-Control': 'max-age=60'},
+        '/no-store': {'Cache-Control': 'no-store'},
+        '/etag': {'Cache-Control': 'no-cache', 'ETag': '"v1"'},
+        '/plain': {},
+    }
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get('If-None-Match')))
+        headers = self.HEADERS[self.path]
+        if headers.get('ETag') and self.headers.get('If-None-Match') == headers['ETag']:
+            self.send_response(304)
+            self.send_header('ETag', headers['ETag'])
+            self.end_headers()
+            return
+
+        body = json.dumps({'path': self.path, 'count': len(self.server.requests)}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ResponseCache()
+    monkeypatch.setattr(URL, 'response_cache', cache)
+    return cache
+
+
+def test_freshness_lifetime():
+    now = 1500000000
+    assert parse_cache_control('public, Max-Age="60"') == {'public': None, 'max-age': '60'}
+    assert get_freshness_lifetime({'cache-control': 'max-age=60', 'age': '10'}, now) == 50
+    assert get_freshness_lifetime({'cache-control': 'no-store, max-age=60'}, now) is None
+    assert get_freshness_lifetime({'cache-control': 'no-cache'}, now) == 0
+    assert get_freshness_lifetime({'date': 'Fri, 14 Jul 2017 02:40:00 GMT', 'expires': 'Fri, 14 Jul 2017 02:45:00 GMT'}, now) == 300
+    assert get_freshness_lifetime({'expires': '0'}, now) == 0
+    assert get_freshness_lifetime({'date': 'Fri, 14 Jul 2017 02:40:00 GMT', 'last-modified': 'Fri, 14 Jul 2017 01:40:00 GMT'}, now) == 360
+    assert get_freshness_lifetime({}, now) == 0
+
+
+@pytest.mark.parametrize('server', [Handler], indirect=True)
+def test_fresh_responses_are_cached(server, http, cache):
+    url, requests = server.url, server.requests
+    assert URL.get_json(url + '/max-age') == {'path': '/max-age', 'count': 1}
+    assert URL.get_json(url + '/max-age') == {'path': '/max-age', 'count': 1}
+    assert URL.get_url(url + '/max-age').from_cache
+
+    assert URL.get_json(url + '/no-store')['count'] == 2
+    assert URL.get_json(url + '/no-store')['count'] == 3
+    # Nothing tells how long it's fresh for, but the caller knows.
+    assert URL.get_json(url + '/plain')['count'] == 4
+    assert URL.get_json(url + '/plain', cache_ttl=60)['count'] == 5
+    assert URL.get_json(url + '/plain', cache_ttl=60)['count'] == 5
+    assert len(requests) == 5
+
+
+@pytest.mark.parametrize('server', [Handler], indirect=True)
+def test_revalidation(server, http, cache):
+    url, requests = server.url, server.requests
+    assert URL.get_json(url + '/etag') == {'path': '/etag', 'count': 1}
+    assert URL.get_json(url + '/etag') == {'path': '/etag', 'count': 1}
+    assert requests == [('/etag', None), ('/etag', '"v1"')]
+    assert cache.get_stats()['revalidated'] == 1
+
+    # Skipping the cache fetches it again.
+    assert URL.get_json(url + '/etag', cache_ttl=0)['count'] == 3
+
+
+@pytest.mark.parametrize('server', [Handler], indirect=True)
+def test_async_responses_are_cached(server, http, cache):
+    url, requests = server.url, server.requests
+
+    async def fetch():
+        results = [
+            await URL.get_json_async(url + '/max-age'),
+            await URL.get_json_async(url + '/max-age'),
+            await URL.get_json_async(url + '/etag'),
+            await URL.get_json_async(url + '/etag'),
+        ]
+        await http.close_async()
+        return results
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(fetch())
+    finally:
+        loop.close()
+    assert [result['count'] for result in results] == [1, 1, 2, 2]
+    assert requests == [('/max-age', None), ('/etag', None), ('/etag', '"v1"')]
+    # The cache is shared with synchronous fetches.
+    assert URL.get_json(url + '/max-age')['count'] == 1
+
+
+def test_eviction():
+    cache = ResponseCache(max_entries=10, max_bytes=100)
+
+    class Response(object):
+        status_code = 200
+        url = 'http://example.com/'
+        headers = {'Cache-Control': 'max-age=60'}
+
+    for key in ['a', 'b', 'c']:
+        cache.store(key, Response(), b'x' * 40)
+    assert cache.get('a') is None
+    assert cache.get('c').to_response().content == b'x' * 40
+    assert cache.get_stats()['entries'] == '2/10'
+
+
+def test_disk(tmpdir):
+    path = str(tmpdir.join('responses.sqlite'))
+
+    class Response(object):
+        status_code = 200
+        url = 'http://example.com/'
+        headers = {'Cache-Control': 'max-age=60', 'Content-Type': 'text/plain; charset=utf-8'}
+
+    cache = ResponseCache(path=path)
+    cache.store('key', Response(), 'hyvää'.encode('utf-8'))
+    cache.close()
+
+    cache = ResponseCache(path=path)
+    response, stale = cache.get_fresh('key')
+    assert response.text == 'hyvää'
+    assert response.headers['Content-Type'] == 'text/plain; charset=utf-8'
+    assert cache.get_stats()['disk_hits'] == 1
+    cache.close()
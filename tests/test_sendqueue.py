@@ -0,0 +1,79 @@
+import asyncio
+from pyfibot.bot.sendqueue import split_message, IRCSendQueue, TokenBucket
+
+
+class DummyClient(object):
+    def __init__(self):
+        self.sent = []
+
+    def send(self, command, **kwargs):
+        self.sent.append((command, kwargs.get('target') or kwargs.get('channel'), kwargs.get('message')))
+
+
+class DummyClock(object):
+    def __init__(self):
+        self.time = 0
+
+    def __call__(self):
+        return self.time
+
+
+def test_split_message():
+    assert split_message('short message', 100) == ['short message']
+    assert split_message('first line\nsecond line\n\n', 100) == ['first line', 'second line']
+    assert split_message('aaaa bbbb cccc', 10) == ['aaaa bbbb', 'cccc']
+    assert split_message('a' * 25, 10) == ['a' * 10, 'a' * 10, 'a' * 5]
+
+    # Multibyte characters must not be split.
+    lines = split_message('ä' * 10, 5)
+    assert lines == ['ää', 'ää', 'ää', 'ää', 'ää']
+    assert all(len(line.encode('utf-8')) <= 7 for line in split_message('aäöå€' * 20, 7))
+    assert ''.join(split_message('aäöå€' * 20, 7)) == 'aäöå€' * 20
+
+
+def test_token_bucket():
+    clock = DummyClock()
+    bucket = TokenBucket(rate=0.5, burst=2, clock=clock)
+    assert bucket.consume()
+    assert bucket.consume()
+    assert not bucket.consume()
+    assert bucket.delay() == 2
+    clock.time = 2
+    assert bucket.consume()
+
+
+def test_send_queue():
+    loop = asyncio.new_event_loop()
+    client = DummyClient()
+    clock = DummyClock()
+    queue = IRCSendQueue(client, loop, 'pyfibot', flood_rate=1, flood_burst=3, sendq_limit=2, clock=clock)
+
+    queue.send_message('#a', 'a1')
+    queue.send_message('#a', 'a1')
+    queue.send_message('#a', 'a2')
+    queue.send_message('#b', 'b1')
+    queue.send_command('JOIN', channel='#c')
+    assert queue.dropped == 1
+
+    try:
+        loop.run_until_complete(asyncio.sleep(0))
+        # Flood limit allows sending three lines at once, the command first.
+        assert client.sent == [('JOIN', '#c', None), ('PRIVMSG', '#a', 'a1'), ('PRIVMSG', '#b', 'b1')]
+        assert queue.pending == 1
+        clock.time = 1
+        queue._handle.cancel()
+        queue._drain()
+        assert client.sent[-1] == ('PRIVMSG', '#a', 'a2')
+    finally:
+        loop.close()
+
+
+def test_send_queue_limit():
+    loop = asyncio.new_event_loop()
+    queue = IRCSendQueue(DummyClient(), loop, 'pyfibot', sendq_limit=2)
+    for i in range(5):
+        queue.send_message('#a', 'message %i' % i)
+    loop.close()
+    assert [message for message, _, _ in queue._messages['#a']] == ['message 3', 'message 4']
+    assert queue.dropped == 3
+    assert queue.max_message_bytes('#a') < 512 - len('PRIVMSG #a :\r\n')
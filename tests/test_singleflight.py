@@ -0,0 +1,63 @@
+import time
+import asyncio
+import threading
+import pytest
+from pyfibot.url.singleflight import SingleFlight, AsyncSingleFlight
+
+
+def test_single_flight():
+    flight = SingleFlight()
+    calls = []
+
+    def fetch(value):
+        calls.append(value)
+        time.sleep(0.2)
+        return value * 2
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('key', fetch, 21))) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [42] * 5
+    assert calls == [21]
+    assert flight.get_stats() == {'calls': 1, 'coalesced': 4}
+
+    # Finished calls are not remembered.
+    assert flight.do('key', fetch, 1) == 2
+    assert calls == [21, 1]
+
+
+def test_single_flight_exception():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError('failed')
+
+    with pytest.raises(ValueError):
+        flight.do('key', fail)
+    assert flight._calls == {}
+
+
+def test_async_single_flight():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fetch(value):
+        calls.append(value)
+        await asyncio.sleep(0.1)
+        return value * 2
+
+    async def run():
+        return await asyncio.gather(*[flight.do('key', fetch, 21) for i in range(5)], flight.do('other', fetch, 1))
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(run()) == [42] * 5 + [2]
+    finally:
+        loop.close()
+    assert calls == [21, 1]
+    assert flight.get_stats() == {'calls': 2, 'coalesced': 4}
+    assert flight._calls == {}
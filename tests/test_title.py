@@ -0,0 +1,118 @@
+import time
+import pytest
+from http.server import BaseHTTPRequestHandler
+from pyfibot.url.http import HTTPClient
+from pyfibot.url.title import read_title, get_charset, sniff_charset
+
+
+class Response(object):
+    def __init__(self, chunks, content_type='text/html'):
+        self.headers = {'content-type': content_type}
+        self.chunks = chunks
+        self.read = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+    def iter_content_until(self, chunk_size, deadline):
+        return self.iter_content(chunk_size)
+
+    def close(self):
+        self.closed = True
+
+
+class DripHandler(BaseHTTPRequestHandler):
+    ''' Sends the page a byte every half a second, never getting to the title in time. '''
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'<html><head>' + b' ' * 100 + b'<title>Too late</title></head></html>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            for i in range(len(body)):
+                self.wfile.write(body[i:i + 1])
+                self.wfile.flush()
+                time.sleep(0.5)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def endless_body():
+    yield b'<html><head>' + b' ' * 2048
+    while True:
+        yield b'<p>' + b'x' * 1024 + b'</p>'
+
+
+def test_charsets():
+    assert get_charset('text/html; charset="ISO-8859-1"') == 'ISO-8859-1'
+    assert get_charset('text/html') is None
+    assert sniff_charset(b'<html><head><meta charset="windows-1252">') == 'windows-1252'
+    assert sniff_charset(b'<meta http-equiv="Content-Type" content="text/html; charset=utf-8">') == 'utf-8'
+
+
+def test_stops_after_head():
+    response = Response([
+        b'<html><head><title>\n  Some &amp; \n title </title>',
+        b'</head><body>',
+        b'never read',
+    ], 'text/html; charset=utf-8')
+    page = read_title(response, 1024 * 1024, 10)
+    assert page.get_title() == 'Some & title'
+    assert response.read == 2
+    assert response.closed
+
+
+def test_og_title():
+    response = Response([b'<head><meta charset="utf-8"><meta property="og:title" content="OG title"><title>Title</title>', b'<link>'])
+    page = read_title(response, 1024 * 1024, 10)
+    assert page.get_title() == 'OG title'
+    assert response.read == 1
+
+
+def test_encodings():
+    title = 'Hyvää päivää'
+    declared = Response([('<head><meta charset="iso-8859-1"><title>%s</title></head>' % title).encode('iso-8859-1')])
+    assert read_title(declared, 1024, 10).get_title() == title
+
+    header = Response([('<title>%s</title>' % title).encode('iso-8859-15')], 'text/html; charset=iso-8859-15')
+    assert read_title(header, 1024, 10).get_title() == title
+
+    undeclared = Response([('<title>%s</title>' % title).encode('cp1252')])
+    assert read_title(undeclared, 1024, 10).get_title() == title
+
+    utf8 = Response([('<title>%s</title>' % title).encode('utf-8')[:15], ('<title>%s</title>' % title).encode('utf-8')[15:]])
+    assert read_title(utf8, 1024, 10).get_title() == title
+
+
+def test_limits():
+    response = Response(endless_body())
+    assert read_title(response, 64 * 1024, 10).get_title() is None
+    assert response.read < 70
+
+    response = Response(endless_body())
+    assert read_title(response, 1024 * 1024 * 1024, 0).get_title() is None
+    assert response.read == 1
+
+    assert read_title(Response([b'{}'], 'application/json'), 1024, 10) is None
+
+
+@pytest.mark.parametrize('server', [DripHandler], indirect=True)
+def test_timeout_is_hard(server):
+    # Each byte arrives well within the read timeout, only the deadline stops reading.
+    http = HTTPClient(read_timeout=5)
+    started = time.monotonic()
+    assert read_title(http.get(server.url), 1024, 1.5).get_title() is None
+    assert time.monotonic() - started < 2.5
+    # Hitting the deadline isn't a failure of the server.
+    stats = http.breaker.get_domain_stats('127.0.0.1')
+    assert (stats['active'], stats['errors']) == (0, 0)
+    http.close()
@@ -0,0 +1,49 @@
+from pyfibot.url.cache import TitleCache, normalize_url
+
+
+class Clock(object):
+    def __init__(self):
+        self.time = 1000.0
+
+    def __call__(self):
+        return self.time
+
+
+def test_normalize_url():
+    assert normalize_url('https://www.Example.com/page?utm_source=x&id=1&fbclid=y#top') == 'example.com/page?id=1#top'
+    assert normalize_url('http://example.com/page?id=1') == normalize_url('https://www.example.com/page?id=1&utm_medium=social')
+
+
+def test_ttl_and_lru():
+    clock = Clock()
+    cache = TitleCache(ttl=60, negative_ttl=10, max_entries=2, clock=clock)
+    cache.set('http://a.com', 'A')
+    cache.set('http://b.com', None)
+    assert cache.get('https://www.a.com') == (True, 'A')
+    assert cache.get('http://b.com') == (True, None)
+
+    clock.time += 30
+    assert cache.get('http://a.com') == (True, 'A')
+    assert cache.get('http://b.com') == (False, None)
+
+    cache.set('http://b.com', 'B')
+    cache.set('http://c.com', False)
+    # a.com was the least recently used.
+    assert cache.get('http://a.com') == (False, None)
+    assert cache.get('http://c.com') == (True, False)
+    assert cache.get_stats()['hits'] == 4
+
+
+def test_persistence(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / 'titles.sqlite')
+    cache = TitleCache(path=path, clock=clock)
+    cache.set('http://a.com', 'A')
+    cache.set('http://b.com', False)
+    cache.close()
+
+    cache = TitleCache(path=path, clock=clock)
+    assert cache.get('http://a.com') == (True, 'A')
+    assert cache.get('http://b.com') == (True, False)
+    assert cache.get_stats()['disk_hits'] == 2
+    cache.close()
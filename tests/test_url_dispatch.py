@@ -0,0 +1,40 @@
+import re
+from pyfibot.url import urlhandler
+from pyfibot.url.dispatch import HandlerIndex, get_matcher_domains
+
+
+def make_handler(matcher, **kwargs):
+    return urlhandler(matcher, **kwargs)(lambda bot, url, match=None: None)
+
+
+def test_get_matcher_domains():
+    assert get_matcher_domains('github.com/*') == ['github.com']
+    assert get_matcher_domains('*.example.com/*') == ['.example.com']
+    assert get_matcher_domains('exa*.com/*') is None
+    assert get_matcher_domains(re.compile(r'imdb\.com/title/(?P<imdb_id>tt[0-9]+)/?')) == ['imdb.com']
+    assert get_matcher_domains(re.compile(r'(open|play)\.spotify\.com/')) is None
+
+
+def test_find():
+    index = HandlerIndex()
+    github = make_handler('github.com/*')
+    imdb = make_handler(re.compile(r'imdb\.com/title/(?P<imdb_id>tt[0-9]+)/?'))
+    subdomains = make_handler('*.example.com/*')
+    spotify = make_handler(re.compile(r'(open|play)\.spotify\.com/(?P<id>\w+)'), domains=['open.spotify.com', 'play.spotify.com'])
+    generic = make_handler(re.compile(r'.*/generic'))
+    preferred = make_handler('github.com/pyfibot/*', priority=10)
+    for handler in [github, imdb, subdomains, spotify, generic, preferred]:
+        index.add(handler)
+
+    assert index.find('github.com/lepinkainen') == (github, None)
+    assert index.find('github.com/pyfibot/pyfibot3') == (preferred, None)
+    assert index.find('gist.github.com/x') == (None, None)
+
+    handler, match = index.find('imdb.com/title/tt0111161/')
+    assert handler is imdb and match.group('imdb_id') == 'tt0111161'
+
+    assert index.find('a.b.example.com/page')[0] is subdomains
+    assert index.find('play.spotify.com/track')[0] is spotify
+    assert index.find('spotify.com/track') == (None, None)
+    assert index.find('other.com/generic')[0] is generic
+    assert index.find('github.com/generic')[0] is github
@@ -0,0 +1,96 @@
+import time
+import asyncio
+import threading
+import pytest
+from pyfibot.url import URL, urlhandler
+from pyfibot.url.cache import TitleCache
+from pyfibot.url.dispatch import HandlerIndex
+
+
+class DummyBot(object):
+    def __init__(self, loop):
+        self.core = type('Core', (object, ), {'loop': loop})
+
+
+@urlhandler('sync.example.com/*')
+def sync_handler(bot, url):
+    time.sleep(0.1)
+    return 'Sync'
+
+
+@urlhandler('async.example.com/*')
+async def async_handler(bot, url):
+    # Sub-requests run concurrently.
+    first, second = await asyncio.gather(asyncio.sleep(0.2, result='A'), asyncio.sleep(0.2, result='sync'))
+    return '%s%s' % (first, second)
+
+
+@urlhandler('slow.example.com/*', timeout=0.1)
+async def slow_handler(bot, url):
+    await asyncio.sleep(5)
+    return 'Slow'
+
+
+@pytest.fixture
+def loop(monkeypatch):
+    index = HandlerIndex()
+    for handler in [sync_handler, async_handler, slow_handler]:
+        index.add(handler)
+    monkeypatch.setattr(URL, 'handler_index', index)
+    monkeypatch.setattr(URL, 'title_cache', TitleCache())
+
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def test_async_handler(loop):
+    assert async_handler._is_async and not sync_handler._is_async
+    bot = DummyBot(loop)
+
+    async def get_titles():
+        return await asyncio.gather(
+            URL('http://async.example.com/').get_title_async(bot),
+            URL('http://sync.example.com/').get_title_async(bot),
+            URL('http://slow.example.com/').get_title_async(bot),
+        )
+
+    started = time.time()
+    titles = loop.run_until_complete(get_titles())
+    assert titles == ['Async', 'Sync', None]
+    assert time.time() - started < 0.5
+    # Titles are cached.
+    assert URL.title_cache.get('http://async.example.com/') == (True, 'Async')
+
+
+def test_async_handler_from_thread(loop):
+    ''' Blocking get_title runs coroutine handlers on the bot's loop. '''
+    bot = DummyBot(loop)
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    try:
+        assert URL('http://async.example.com/').get_title(bot) == 'Async'
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+
+def test_async_handler_from_loop(loop):
+    ''' Blocking get_title on the bot's loop would deadlock it, so it refuses. '''
+    bot = DummyBot(loop)
+
+    async def get_title():
+        return URL('http://async.example.com/').get_title(bot)
+
+    with pytest.raises(RuntimeError):
+        loop.run_until_complete(get_title())
+
+
+def test_async_handler_stuck_loop(loop, monkeypatch):
+    ''' Coroutine handlers are waited for only a while, even if the loop never runs them. '''
+    monkeypatch.setattr(URL, 'HANDLER_GRACE', 0.1)
+    started = time.time()
+    assert URL('http://slow.example.com/').get_title(DummyBot(loop)) is None
+    assert time.time() - started < 1
+    # Once running again, the loop drops the cancelled handler.
+    loop.run_until_complete(asyncio.sleep(0.01))
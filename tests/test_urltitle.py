@@ -0,0 +1,68 @@
+import time
+import asyncio
+import pytest
+from pyfibot.url import URL
+from pyfibot.bot.bot import Bot
+from pyfibot.plugins.available.urltitle import URLtitle
+
+
+class DummyBot(Bot):
+    def __init__(self, core, name):
+        self.responses = []
+        super(DummyBot, self).__init__(core, name)
+
+    def load_plugins(self):
+        self.init_callbacks()
+
+    def respond(self, message, raw_message):
+        self.responses.append(message)
+
+
+TITLES = {
+    'http://slow.example.com/': ('Slow', 0.3),
+    'http://fast.example.com/': ('Fast', 0),
+    'http://never.example.com/': ('Never', 2),
+    'http://none.example.com/': (None, 0),
+    'http://false.example.com/': (False, 0),
+}
+
+
+async def get_title_async(url, bot, check_reduntant=False, executor=None):
+    title, delay = TITLES[url.url]
+    await asyncio.sleep(delay)
+    return title
+
+
+@pytest.fixture
+def plugin(core, monkeypatch):
+    monkeypatch.setattr(URL, 'discover_handlers', lambda: {})
+    monkeypatch.setattr(URL, 'get_title_async', get_title_async)
+    core.configuration['plugin'] = {'urltitle': {'timeout': 1, 'titles_per_message': 2}}
+    plugin = URLtitle(DummyBot(core, 'dummy'))
+    yield plugin
+    plugin.teardown()
+
+
+def test_get_urls_keeps_order():
+    urls = URL.get_urls('b http://b.com/ a http://a.com/ b again http://b.com/ c https://c.com/x')
+    assert [url.url for url in urls] == ['http://b.com/', 'http://a.com/', 'https://c.com/x']
+
+
+def test_titles_in_message_order(plugin):
+    # Too many urls.
+    message = 'http://none.example.com/ http://slow.example.com/ http://never.example.com/ http://fast.example.com/'
+    plugin.bot.core.loop.run_until_complete(plugin.print_titles('someone', message, {}))
+    assert plugin.bot.responses == []
+
+    message = 'http://never.example.com/ http://slow.example.com/ http://fast.example.com/'
+    started = time.time()
+    plugin.bot.core.loop.run_until_complete(plugin.print_titles('someone', message, {}))
+    assert time.time() - started < 2
+    assert plugin.bot.responses == ['Title: Slow', 'Title: Fast']
+
+
+def test_no_titles(plugin):
+    plugin.bot.core.loop.run_until_complete(plugin.print_titles('someone', 'http://false.example.com/ http://none.example.com/', {}))
+    assert plugin.bot.responses == []
+    plugin.bot.core.loop.run_until_complete(plugin.print_titles('someone', 'http://none.example.com/', {}))
+    assert plugin.bot.responses == ['Detected 1 urls.']
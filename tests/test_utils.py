@@ -30,3 +30,11 @@ def test_get_relative_time_string():
     assert pyfibot.utils.get_relative_time_string(30) == 'in 30s'
     assert pyfibot.utils.get_relative_time_string(30, lang='fi') == '30s päästä'
     assert pyfibot.utils.get_relative_time_string(-30, lang='fi') == '30s sitten'
+
+
+def test_get_size_string():
+    assert pyfibot.utils.get_size_string(0) == '0 B'
+    assert pyfibot.utils.get_size_string(1023) == '1023 B'
+    assert pyfibot.utils.get_size_string(1536) == '1.5 kB'
+    assert pyfibot.utils.get_size_string(2411724) == '2.3 MB'
+    assert pyfibot.utils.get_size_string(5 * 1024 ** 4) == '5120.0 GB'
@@ -0,0 +1,65 @@
+import time
+import urllib.error
+import pytest
+import youtube_dl
+from pyfibot.url.video import BudgetedYoutubeDL, VideoInfoExtractor, get_domain_labels
+
+
+@pytest.fixture(scope='module')
+def extractor():
+    extractor = VideoInfoExtractor(timeout=0.1)
+    yield extractor
+    extractor.shutdown()
+
+
+def test_get_domain_labels():
+    assert get_domain_labels('www.youtube.com') == ['youtube']
+    assert get_domain_labels('user@m.example.co.uk:8080') == ['example', 'co']
+
+
+def test_find_extractor(extractor):
+    assert extractor.find_extractor('https://www.youtube.com/watch?v=dQw4w9WgXcQ').ie_key() == 'Youtube'
+    assert extractor.find_extractor('https://youtu.be/dQw4w9WgXcQ').ie_key() == 'Youtube'
+    # Pattern doesn't mention the domain literally.
+    assert extractor.find_extractor('http://www.kanal9play.se/#!/play/program/335032/video/246042').ie_key() == 'KanalPlay'
+    assert extractor.find_extractor('https://www.example.com/news/article.html') is None
+
+
+def test_extract_info_skips_articles(extractor, monkeypatch):
+    monkeypatch.setattr(extractor, '_extract', lambda url, ie_key: pytest.fail('Should not extract'))
+    assert extractor.extract_info('https://www.example.com/news/article.html') is None
+    assert extractor.skipped == 1
+
+
+def test_extract_info_timeout(extractor, monkeypatch):
+    monkeypatch.setattr(extractor, '_extract', lambda url, ie_key: time.sleep(0.5))
+    assert extractor.extract_info('https://www.youtube.com/watch?v=dQw4w9WgXcQ') is None
+    assert extractor.timeouts == 1
+
+
+def test_extract_info_refused_while_busy(monkeypatch):
+    extractor = VideoInfoExtractor(pool_size=1, timeout=0.1)
+    monkeypatch.setattr(extractor, '_extract', lambda url, ie_key: time.sleep(0.3) or {'title': 'Video'})
+    url = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+    assert extractor.extract_info(url) is None
+    # The stuck extraction isn't queued behind.
+    assert extractor.extract_info(url) is None
+    assert extractor.refused == 1
+
+    time.sleep(0.3)
+    monkeypatch.setattr(extractor, '_extract', lambda url, ie_key: {'title': 'Video'})
+    assert extractor.extract_info(url) == {'title': 'Video'}
+    extractor.shutdown()
+
+
+def test_youtube_dl_deadline():
+    ydl = BudgetedYoutubeDL({'socket_timeout': 10})
+    ydl.deadline = time.monotonic() - 1
+    with pytest.raises(youtube_dl.utils.DownloadError):
+        ydl.urlopen('http://127.0.0.1:9/')
+
+    # Requests get at most the time left.
+    ydl.deadline = time.monotonic() + 1
+    with pytest.raises(urllib.error.URLError):
+        ydl.urlopen('http://127.0.0.1:9/')
+    assert ydl._socket_timeout <= 1